@@ -0,0 +1,132 @@
+"""
+Benchmark for process_export.as_of: point-in-time queries while history grows.
+
+For every history depth, the same records are synced `depth` times (two fields change each
+time, one sync per simulated day) into a throw-away SQLite file, then as_of is timed at the
+oldest, middle and newest sync. Latency should stay roughly flat as depth grows, since each
+record costs one index seek regardless of how many versions it has. With --keep-versions,
+history is compacted first so older points are rebuilt from field deltas; --checkpoint-days
+keeps one full row per period, which bounds how many deltas a query replays.
+
+Usage:
+    python benchmarks/bench_as_of.py
+    python benchmarks/bench_as_of.py --rows 20000 --depths 1,10,50 --keep-versions 5 --checkpoint-days 7
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from bench_hot_paths import RESULTS_DIR, build_export_frame, git_commit, timed
+import process_export
+
+DEFAULT_ROWS = 10_000
+DEFAULT_DEPTHS = [1, 10, 50]
+
+
+def build_history(df, depth):
+    """Sync df `depth` times with STATUS/BUDGET changed on every row; returns each sync's (simulated) timestamp."""
+    conn = process_export.connect_db()
+    try:
+        process_export.ensure_schema(conn, list(df.columns))
+        stamps = []
+        for version in range(depth):
+            frame = df.assign(STATUS=f"v{version}", BUDGET=df["BUDGET"].map(lambda b: f"{b}.{version}"))
+            stamps.append(process_export.detect_and_sync_changes(conn, frame, f"bench_v{version}.csv", mode="sql")["sync_timestamp"])
+        return spread_over_days(conn, stamps)
+    finally:
+        conn.close()
+
+
+def spread_over_days(conn, stamps):
+    """Move sync number i to day i, as if the exports had arrived daily rather than seconds apart."""
+    start = datetime(2024, 1, 1)
+    days = [(start + timedelta(days=i)).isoformat() for i in range(len(stamps))]
+    conn.execute("CREATE TEMP TABLE bench_days (stamp TEXT PRIMARY KEY, day TEXT)")
+    conn.executemany("INSERT INTO bench_days VALUES (?, ?)", list(zip(stamps, days)))
+    for table, column in (("records_history", "changed_timestamp"), ("records_changes", "changed_timestamp"),
+                          ("records_current", "ingest_timestamp")):
+        conn.execute(f"UPDATE {table} SET {column} = (SELECT day FROM bench_days WHERE stamp = {column}) "
+                     f"WHERE {column} IN (SELECT stamp FROM bench_days)")
+    conn.execute("DROP TABLE bench_days")
+    conn.commit()
+    return days
+
+
+def run_depth(df, depth, work_dir, repeat, keep_versions, checkpoint_days):
+    db_path = os.path.join(work_dir, f"as_of_{depth}.sqlite")
+    process_export.DB_FILE = db_path
+    print(f"[bench] Building {depth} version(s) of {len(df)} rows", flush=True)
+    stamps = build_history(df, depth)
+    conn = process_export.connect_db()
+    try:
+        if keep_versions:
+            process_export.compact_history(conn, keep_versions=keep_versions, checkpoint_days=checkpoint_days)
+        history_rows = conn.execute("SELECT COUNT(*) FROM records_history").fetchone()[0]
+        results = []
+        for point, stamp in (("oldest", stamps[0]), ("middle", stamps[len(stamps) // 2]), ("newest", stamps[-1])):
+            seconds, frame = timed(lambda: process_export.as_of(conn, stamp), repeat)
+            print(f"[bench] depth {depth:>4}  history {history_rows:>9}  as_of {point:<6} {seconds:10.4f}s "
+                  f"({len(frame)} rows)", flush=True)
+            results.append({"depth": depth, "point": point, "history_rows": history_rows, "rows": len(frame),
+                            "seconds": seconds})
+        return results
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark point-in-time queries (process_export.as_of).")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS, help="Records per dataset")
+    parser.add_argument("--depths", default=",".join(str(d) for d in DEFAULT_DEPTHS),
+                        help="Comma-separated numbers of syncs (history depth) to test")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query; the best time is kept")
+    parser.add_argument("--keep-versions", type=int, default=0, help="Compact history to this many versions first")
+    parser.add_argument("--checkpoint-days", type=float, default=0,
+                        help="With --keep-versions: keep one full row per NOP per this many (simulated) days")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/as_of_<commit>_<timestamp>.json)")
+    args = parser.parse_args(argv)
+
+    depths = [int(d) for d in args.depths.split(",") if d.strip()]
+    df = build_export_frame(args.rows)
+    commit = git_commit()
+    original_db = process_export.DB_FILE
+    work_dir = tempfile.mkdtemp(prefix="bench_as_of_")
+    results = []
+    try:
+        for depth in depths:
+            results.extend(run_depth(df, depth, work_dir, args.repeat, args.keep_versions, args.checkpoint_days))
+    finally:
+        process_export.DB_FILE = original_db
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "rows": args.rows,
+        "keep_versions": args.keep_versions,
+        "checkpoint_days": args.checkpoint_days,
+        "results": results,
+    }
+    out_path = args.output
+    if not out_path:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out_path = os.path.join(RESULTS_DIR, f"as_of_{commit}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[bench] Results written to {out_path}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+"""
+Benchmark suite for the ingest, sync, load and export hot paths.
+
+Synthetic data comes from generate_test_data.generate_sample_data and is mapped onto the
+export schema used by process_export. Every stage runs against a throw-away SQLite file,
+so the project database and snapshots are never touched.
+
+Usage:
+    python benchmarks/bench_hot_paths.py                          # 1k, 10k, 100k, 1M rows
+    python benchmarks/bench_hot_paths.py --sizes 1000,10000 --repeat 3
+    python benchmarks/bench_hot_paths.py --compare benchmarks/results/<baseline>.json
+
+Results are written as JSON to benchmarks/results/ (or --output). With --compare, stages that
+are slower than the baseline by more than --threshold are reported and the exit code is 1.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import pandas as pd
+
+import process_export
+import web_app
+from generate_test_data import generate_sample_data
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+# Writing/reading xlsx is orders of magnitude slower than CSV; cap it so large runs stay practical.
+DEFAULT_MAX_XLSX_ROWS = 10_000
+
+STAGES = [
+    "read_export_file_csv",
+    "read_export_file_xlsx",
+    "compute_row_hash",
+    "detect_and_sync_changes_cold",
+    "detect_and_sync_changes_warm",
+    "detect_and_sync_changes_sql_warm",
+    "load_current",
+    "export_merged_snapshot",
+    "load_dataframe",
+    "dataframe_to_json_rows",
+]
+
+
+def build_export_frame(num_rows):
+    """Map generate_sample_data output onto the export schema, as strings like read_export_file returns."""
+    sample = generate_sample_data(num_rows, write_files=False)
+    df = pd.DataFrame({
+        "NOP": sample["ID"].map(lambda i: f"NOP-{i:07d}"),
+        "PROGRAM": sample["Nama"],
+        "KATEGORI": sample["Kota"],
+        "JUSTIFIKASI": "Benchmark",
+        "PROPOSAL": sample["Tanggal_Registrasi"].dt.strftime("%Y-%m-%d"),
+        "BUDGET": sample["Gaji"],
+        "REVENUE": sample["Rating"],
+        "COST": sample["Umur"],
+        "PROFIT": sample["Jumlah_Transaksi"],
+        "INCREMENTAL 1": sample["Jumlah_Transaksi"],
+        "INCREMENTAL 2": sample["Umur"],
+        "INCREMENTAL 3": sample["Rating"],
+        "STATUS": sample["Status"],
+        "PILOT": sample["Kota"],
+        "DRIVEN PROGRAM": sample["Status"],
+        "ASSIGN BY": "bench",
+        "APPROVED BY": sample["Terakhir_Login"].dt.strftime("%Y-%m-%d"),
+    })
+    return df.astype(object).where(df.notna(), None).applymap(lambda x: None if x is None else str(x))
+
+
+def timed(fn, repeat):
+    """Run fn `repeat` times and return (best seconds, last result)."""
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_size(num_rows, work_dir, repeat, max_xlsx_rows, skip):
+    print(f"[bench] Preparing {num_rows} rows", flush=True)
+    df = build_export_frame(num_rows)
+    db_path = os.path.join(work_dir, f"bench_{num_rows}.sqlite")
+    csv_path = os.path.join(work_dir, f"bench_{num_rows}.csv")
+    xlsx_path = os.path.join(work_dir, f"bench_{num_rows}.xlsx")
+    snapshot_path = os.path.join(work_dir, f"bench_{num_rows}_snapshot.xlsx")
+    df.to_csv(csv_path, index=False)
+
+    results = {}
+
+    def record(stage, fn, reps=repeat):
+        if stage in skip:
+            return None
+        seconds, value = timed(fn, reps)
+        results[stage] = seconds
+        print(f"[bench] {num_rows:>9} rows  {stage:<32} {seconds:10.4f}s", flush=True)
+        return value
+
+    record("read_export_file_csv", lambda: process_export.read_export_file(csv_path))
+    if num_rows <= max_xlsx_rows and "read_export_file_xlsx" not in skip:
+        df.to_excel(xlsx_path, index=False, engine="openpyxl")
+        record("read_export_file_xlsx", lambda: process_export.read_export_file(xlsx_path))
+
+    record("compute_row_hash", lambda: df.apply(process_export.compute_row_hash, axis=1))
+
+    original_db = process_export.DB_FILE
+    process_export.DB_FILE = db_path
+    try:
+        def sync_cold():
+            if os.path.exists(db_path):
+                os.remove(db_path)
+            conn = process_export.connect_db()
+            try:
+                process_export.ensure_schema(conn, list(df.columns))
+                return process_export.detect_and_sync_changes(conn, df, "bench_cold.csv")
+            finally:
+                conn.close()
+
+        def sync_warm(mode="pandas"):
+            conn = process_export.connect_db()
+            try:
+                return process_export.detect_and_sync_changes(conn, df, "bench_warm.csv", mode=mode)
+            finally:
+                conn.close()
+
+        def with_conn(fn):
+            conn = process_export.connect_db()
+            try:
+                return fn(conn)
+            finally:
+                conn.close()
+
+        # Cold sync populates the database used by every later stage, so it always runs.
+        seconds, _ = timed(sync_cold, repeat)
+        if "detect_and_sync_changes_cold" not in skip:
+            results["detect_and_sync_changes_cold"] = seconds
+            print(f"[bench] {num_rows:>9} rows  {'detect_and_sync_changes_cold':<32} {seconds:10.4f}s", flush=True)
+        record("detect_and_sync_changes_warm", sync_warm)
+        record("detect_and_sync_changes_sql_warm", lambda: sync_warm("sql"))
+        record("load_current", lambda: with_conn(process_export.load_current))
+        record("export_merged_snapshot", lambda: with_conn(lambda c: process_export.export_merged_snapshot(c, snapshot_path)))
+        loaded = record("load_dataframe", lambda: web_app.load_dataframe(db_path=db_path))
+        if loaded is None:
+            loaded = web_app.load_dataframe(db_path=db_path)
+        record("dataframe_to_json_rows", lambda: web_app.dataframe_to_json_rows(loaded))
+    finally:
+        process_export.DB_FILE = original_db
+
+    return [
+        {"size": num_rows, "stage": stage, "seconds": seconds, "rows_per_second": num_rows / seconds if seconds else None}
+        for stage, seconds in results.items()
+    ]
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+        return out.stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def compare(results, baseline_path, threshold):
+    """Return the stages that got slower than the baseline by more than `threshold` (fraction)."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    base = {(r["size"], r["stage"]): r["seconds"] for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = base.get((r["size"], r["stage"]))
+        if old and r["seconds"] > old * (1 + threshold):
+            regressions.append({"size": r["size"], "stage": r["stage"], "baseline": old, "current": r["seconds"],
+                                "change": r["seconds"] / old - 1})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ingest, sync, load and export hot paths.")
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="Comma-separated row counts")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the best time is kept")
+    parser.add_argument("--max-xlsx-rows", type=int, default=DEFAULT_MAX_XLSX_ROWS,
+                        help="Largest size for which the xlsx read stage is timed")
+    parser.add_argument("--skip", default="", help=f"Comma-separated stages to skip ({', '.join(STAGES)})")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/bench_<commit>_<timestamp>.json)")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="Compare against an earlier result file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before a stage counts as a regression")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+    commit = git_commit()
+
+    work_dir = tempfile.mkdtemp(prefix="bench_hot_paths_")
+    results = []
+    try:
+        for size in sizes:
+            results.extend(run_size(size, work_dir, args.repeat, args.max_xlsx_rows, skip))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.utcnow().isoformat(),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "results": results,
+    }
+    out_path = args.output
+    if not out_path:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        out_path = os.path.join(RESULTS_DIR, f"bench_{commit}_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"[bench] Results written to {out_path}", flush=True)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        for r in regressions:
+            print(f"[bench] REGRESSION {r['size']} rows {r['stage']}: {r['baseline']:.4f}s -> {r['current']:.4f}s "
+                  f"(+{r['change'] * 100:.0f}%)", flush=True)
+        if regressions:
+            sys.exit(1)
+        print("[bench] No regressions against baseline", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Server-Sent Events that tell open dashboards the served data changed.
+
+One poller thread per server process reads the data state (change_log seq + data file version)
+every interval and fans each change out to all open streams, so the database is polled once
+per interval however many dashboards are open. Polling rather than an in-process notification
+means a sync, rollback or reset committed by any process (the desktop importer, the folder
+watcher, another server worker) reaches every dashboard. A stream
+- starts with a 'hello' event carrying the current state (a reconnecting client compares it
+  with what it already has and catches up),
+- sends a 'data' event with per-operation counts whenever the state changes,
+- ends after max_seconds; EventSource reconnects on its own, which frees the server thread.
+Every stream holds a server thread, so at most max_streams are served at once; beyond that the
+client gets a single 'busy' event and falls back to polling.
+"""
+import queue
+import threading
+import time
+
+from export_jobs import HEARTBEAT_SECONDS, format_event
+
+DEFAULT_INTERVAL_SECONDS = 2.0
+DEFAULT_MAX_SECONDS = 300
+DEFAULT_MAX_STREAMS = 8
+RECONNECT_MS = 3000
+
+
+class DataEventHub:
+    """
+    read_state() -> {"seq": int, "version": str}; count_changes(since_seq) -> {op: count}.
+    The poller starts with the first subscriber and stops once the last one has left.
+    """
+
+    def __init__(self, read_state, count_changes, interval=DEFAULT_INTERVAL_SECONDS, max_streams=DEFAULT_MAX_STREAMS):
+        self.read_state = read_state
+        self.count_changes = count_changes
+        self.interval = interval
+        self.max_streams = max_streams
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._state = None
+        self._poller = None
+
+    @property
+    def stream_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def subscribe(self):
+        """(queue of SSE chunks, current state), or None when max_streams are already open."""
+        with self._lock:
+            if len(self._subscribers) >= self.max_streams:
+                return None
+            if self._poller is None:
+                self._state = self.read_state()
+                self._poller = threading.Thread(target=self._run, name="data-events", daemon=True)
+                self._poller.start()
+            subscriber = queue.Queue()
+            self._subscribers.add(subscriber)
+            return subscriber, dict(self._state)
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._subscribers:
+                    self._poller = None
+                    return
+                previous = self._state
+            try:
+                current = self.read_state()
+                if current == previous:
+                    continue
+                counts = self.count_changes(previous["seq"]) if current["seq"] != previous["seq"] else {}
+            except Exception as e:
+                print(f"[data_events] Poll failed: {e}", flush=True)
+                continue
+            event = format_event("data", dict(current, previous_seq=previous["seq"], counts=counts))
+            with self._lock:
+                self._state = current
+                for subscriber in self._subscribers:
+                    subscriber.put(event)
+
+    def stream(self, max_seconds=DEFAULT_MAX_SECONDS):
+        """Yields SSE text for one client until max_seconds have passed."""
+        yield f"retry: {RECONNECT_MS}\n\n"
+        subscription = self.subscribe()
+        if subscription is None:
+            yield format_event("busy", {"max_streams": self.max_streams})
+            return
+        subscriber, state = subscription
+        try:
+            yield format_event("hello", state)
+            deadline = time.monotonic() + max_seconds
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    yield subscriber.get(timeout=min(HEARTBEAT_SECONDS, remaining))
+                except queue.Empty:
+                    if time.monotonic() < deadline:
+                        yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
@@ -11,6 +11,7 @@ import subprocess
 import sys
 import webbrowser
 import shutil
+import export_formats
 try:
     import process_export
 except Exception:
@@ -22,6 +23,66 @@ logging.basicConfig(level=logging.DEBUG,
                     filename='excel_importer.log',
                     filemode='w')
 
+PROFILE_CHUNK_SIZE = 50000
+MIXED_INFERRED_TYPES = {"mixed", "mixed-integer", "mixed-integer-float"}
+
+
+def profile_dataframe(df, chunk_size=PROFILE_CHUNK_SIZE, progress_callback=None):
+    """
+    Single-pass column profile shared by validation and statistics.
+    Walks the frame in row chunks so temporary allocations stay bounded, and computes
+    per column: null count, inferred type(s) and mixed-type flag, plus min/max/mean for numeric columns.
+    progress_callback(rows_done, total_rows) is called after each chunk.
+    """
+    columns = list(df.columns)
+    total = len(df)
+    numeric_cols = [c for c in columns
+                    if pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+    object_cols = [c for c in columns if df[c].dtype == object]
+    # A categorical column's values are its categories: check their types once instead of per chunk
+    category_cols = [c for c in columns if isinstance(df[c].dtype, pd.CategoricalDtype)]
+
+    nulls = pd.Series(0, index=columns, dtype="int64")
+    inferred = {c: set() for c in object_cols}
+    for col in category_cols:
+        inferred[col] = {pd.api.types.infer_dtype(df[col].cat.categories, skipna=True)}
+    mins = maxs = sums = counts = None
+
+    for start in range(0, total, chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        nulls = nulls.add(chunk.isna().sum(), fill_value=0).astype("int64")
+        for col in object_cols:
+            inferred[col].add(pd.api.types.infer_dtype(chunk[col], skipna=True))
+        if numeric_cols:
+            agg = chunk[numeric_cols].agg(["min", "max", "sum", "count"])
+            if mins is None:
+                mins, maxs, sums, counts = agg.loc["min"], agg.loc["max"], agg.loc["sum"], agg.loc["count"]
+            else:
+                mins = pd.concat([mins, agg.loc["min"]], axis=1).min(axis=1)
+                maxs = pd.concat([maxs, agg.loc["max"]], axis=1).max(axis=1)
+                sums = sums + agg.loc["sum"]
+                counts = counts + agg.loc["count"]
+        if progress_callback is not None:
+            progress_callback(min(start + chunk_size, total), total)
+
+    profile = {"rows": total, "columns": {}}
+    for col in columns:
+        info = {"dtype": str(df[col].dtype), "missing": int(nulls[col])}
+        if col in inferred:
+            kinds = inferred[col] - {"empty"}
+            info["inferred"] = sorted(kinds)
+            info["mixed"] = len(kinds) > 1 or bool(kinds & MIXED_INFERRED_TYPES)
+        else:
+            info["inferred"] = [str(df[col].dtype)]
+            info["mixed"] = False
+        if col in numeric_cols and counts is not None and counts[col] > 0:
+            info["min"] = float(mins[col])
+            info["max"] = float(maxs[col])
+            info["mean"] = float(sums[col]) / float(counts[col])
+        profile["columns"][col] = info
+    return profile
+
+
 class ExcelImporterApp:
     def __init__(self, root):
         self.root = root
@@ -136,7 +197,12 @@ class ExcelImporterApp:
             self.current_file = file_path
             
             # Read Excel file
-            self.df = pd.read_excel(file_path, engine='openpyxl')
+            df = pd.read_excel(file_path, engine='openpyxl')
+            if process_export is not None:
+                df, report = process_export.optimize_dtypes(df)
+                logging.info(f"dtype optimisation saved {report['saved_bytes']} bytes "
+                             f"({report['before_bytes']} -> {report['after_bytes']}), converted: {report['converted']}")
+            self.df = df
             
             # Update UI in main thread
             self.root.after(0, self._file_loaded_successfully)
@@ -323,23 +389,60 @@ class ExcelImporterApp:
         # Real-time filtering could be implemented here
         pass
     
+    def run_profile(self, on_done):
+        """Profile the loaded data on a worker thread, reporting progress, then call on_done(profile) on the UI thread."""
+        if self.df is None:
+            return
+        df = self.df
+        total = max(len(df), 1)
+        self.status_var.set("Profiling data...")
+        self.progress.stop()
+        self.progress.configure(mode='determinate', maximum=total, value=0)
+
+        def report_progress(done, total_rows):
+            self.root.after(0, lambda: self._profile_progress(done, total_rows))
+
+        def worker():
+            try:
+                profile = profile_dataframe(df, progress_callback=report_progress)
+                self.root.after(0, lambda: self._profile_finished(profile, on_done))
+            except Exception as e:
+                logging.error(f"Profiling failed: {e}")
+                self.root.after(0, lambda: self._profile_failed(str(e)))
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def _profile_progress(self, done, total_rows):
+        self.progress['value'] = done
+        self.status_var.set(f"Profiling data... {done}/{total_rows} rows")
+
+    def _profile_finished(self, profile, on_done):
+        self.progress.configure(mode='indeterminate', value=0)
+        self.status_var.set(f"Profiling finished: {profile['rows']} rows")
+        on_done(profile)
+
+    def _profile_failed(self, error_msg):
+        self.progress.configure(mode='indeterminate', value=0)
+        self.status_var.set("Profiling failed")
+        messagebox.showerror("Error", f"Profiling failed:\n{error_msg}")
+
     def validate_data(self):
         if self.df is None:
             return
-        
+        self.run_profile(self._show_validation_results)
+
+    def _show_validation_results(self, profile):
         validation_results = []
         
         # Check for missing values
-        missing_values = self.df.isnull().sum()
-        for col, count in missing_values.items():
-            if count > 0:
-                validation_results.append(f"{col}: {count} missing values")
+        for col, info in profile["columns"].items():
+            if info["missing"] > 0:
+                validation_results.append(f"{col}: {info['missing']} missing values")
         
         # Check data types consistency
-        for col in self.df.columns:
-            unique_types = self.df[col].apply(type).nunique()
-            if unique_types > 1:
-                validation_results.append(f"{col}: Mixed data types detected")
+        for col, info in profile["columns"].items():
+            if info["mixed"]:
+                validation_results.append(f"{col}: Mixed data types detected ({', '.join(info['inferred'])})")
         
         # Show results
         if validation_results:
@@ -362,16 +465,33 @@ class ExcelImporterApp:
             )
         file_path = filedialog.asksaveasfilename(
             defaultextension=".xlsx",
-            filetypes=[("Excel files", "*.xlsx"), ("All files", "*.*")],
+            filetypes=[
+                ("Excel files", "*.xlsx"),
+                ("CSV files (fast)", "*.csv"),
+                ("Parquet files (fast, needs pyarrow)", "*.parquet"),
+                ("All files", "*.*"),
+            ],
             title="Save Export File"
         )
         if not file_path:
             return
+        export_format = export_formats.format_for_path(file_path)
+        if export_format == "parquet" and not export_formats.parquet_available():
+            messagebox.showerror("Error", "Parquet export requires pyarrow (pip install pyarrow)")
+            return
         try:
-            self._write_excel_with_metadata(data_to_export, file_path)
+            if export_format == "csv":
+                export_formats.write_csv(data_to_export, file_path)
+            elif export_format == "parquet":
+                export_formats.write_parquet(data_to_export, file_path)
+            else:
+                self._write_excel_with_metadata(data_to_export, file_path)
             self.merge_to_dashboard_excel(data_to_export)
             merged_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "merged_current.xlsx")
-            if process_export is not None:
+            if export_format == "parquet":
+                # The data is already synced by merge_to_dashboard_excel; the file pipeline reads xlsx/csv only
+                logging.info(f"Merge pipeline skipped for parquet export: {file_path}")
+            elif process_export is not None:
                 try:
                     process_export.process(file_path)
                     logging.info(f"Merge pipeline updated from: {file_path}")
@@ -435,13 +555,15 @@ class ExcelImporterApp:
                 conn.close()
                 
                 # Show notification if modifications occurred
-                if sync_results["modifications"]:
-                    change_count = len(sync_results["modifications"])
+                if sync_results["modification_count"]:
+                    change_count = sync_results["modification_count"]
                     msg = f"SYNC ALERT: {change_count} field modifications detected and synchronized.\n\n"
                     for mod in sync_results["modifications"][:5]: # Show first 5
                         msg += f"- [{mod['nop']}] {mod['field']}: {mod['old']} -> {mod['new']}\n"
                     if change_count > 5:
-                        msg += f"... and {change_count - 5} more."
+                        msg += f"... and {change_count - 5} more.\n"
+                        top_fields = sorted(sync_results["field_change_counts"].items(), key=lambda kv: kv[1], reverse=True)[:5]
+                        msg += "\nChanges per field: " + ", ".join(f"{field} ({count})" for field, count in top_fields)
                     
                     messagebox.showwarning("Data Sync Alert", msg)
                     logging.info(f"SYNC: {change_count} modifications detected during export.")
@@ -510,7 +632,9 @@ class ExcelImporterApp:
     def show_statistics(self):
         if self.df is None:
             return
-        
+        self.run_profile(self._show_statistics_window)
+
+    def _show_statistics_window(self, profile):
         stats_window = tk.Toplevel(self.root)
         stats_window.title("Data Statistics")
         stats_window.geometry("600x400")
@@ -519,17 +643,17 @@ class ExcelImporterApp:
         text_area.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
         
         stats_text = f"Data Statistics\n{'='*50}\n"
-        stats_text += f"Total rows: {len(self.df)}\n"
-        stats_text += f"Total columns: {len(self.df.columns)}\n\n"
+        stats_text += f"Total rows: {profile['rows']}\n"
+        stats_text += f"Total columns: {len(profile['columns'])}\n\n"
         
         stats_text += f"Column Information:\n{'='*50}\n"
-        for col in self.df.columns:
-            stats_text += f"{col}: {self.df[col].dtype}\n"
-            stats_text += f"  Missing values: {self.df[col].isnull().sum()}\n"
-            if pd.api.types.is_numeric_dtype(self.df[col]):
-                stats_text += f"  Min: {self.df[col].min():.2f}\n"
-                stats_text += f"  Max: {self.df[col].max():.2f}\n"
-                stats_text += f"  Mean: {self.df[col].mean():.2f}\n"
+        for col, info in profile["columns"].items():
+            stats_text += f"{col}: {info['dtype']}\n"
+            stats_text += f"  Missing values: {info['missing']}\n"
+            if "mean" in info:
+                stats_text += f"  Min: {info['min']:.2f}\n"
+                stats_text += f"  Max: {info['max']:.2f}\n"
+                stats_text += f"  Mean: {info['mean']:.2f}\n"
             stats_text += "\n"
         
         text_area.insert(tk.END, stats_text)
@@ -0,0 +1,96 @@
+"""
+On-disk cache for generated export files (xlsx, csv, ...).
+
+Entries are keyed by whatever identifies an export (data version, route, filter parameters)
+and stored as <sha1 of key><ext> in one directory. A hit only touches the file's mtime, which
+doubles as the LRU clock: after every put the least recently used files are deleted until the
+directory fits in max_bytes. Files are written to a temporary name and renamed into place, so
+concurrent readers (and other worker processes) never see a partial file.
+"""
+import os
+import json
+import hashlib
+import threading
+
+import metrics
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ExportCache:
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_name(key) -> str:
+        return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _path(self, key, ext):
+        return os.path.join(self.cache_dir, self.key_name(key) + ext)
+
+    def get(self, key, ext=".xlsx"):
+        """Path of the cached file for key, or None. Marks the entry as recently used."""
+        if self.max_bytes <= 0:
+            return None
+        path = self._path(key, ext)
+        try:
+            os.utime(path)
+        except OSError:
+            metrics.inc("export_cache_requests_total", result="miss")
+            return None
+        metrics.inc("export_cache_requests_total", result="hit")
+        return path
+
+    def put(self, key, data: bytes, ext=".xlsx"):
+        """Store data for key and return its path (None when caching is disabled)."""
+        if self.max_bytes <= 0 or len(data) > self.max_bytes:
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key, ext)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self.evict()
+        return path
+
+    def entries(self):
+        out = []
+        if not os.path.isdir(self.cache_dir):
+            return out
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and not entry.name.endswith(".tmp"):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                out.append((st.st_mtime, st.st_size, entry.path))
+        return out
+
+    def total_bytes(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Delete least recently used files until the cache fits in max_bytes."""
+        with self._lock:
+            entries = sorted(self.entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    metrics.inc("export_cache_evictions_total")
+                except OSError:
+                    # e.g. still open for a download on Windows; try again on the next put
+                    pass
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,85 @@
+"""
+Export writers shared by the dashboard and the desktop importer.
+
+xlsx stays the default everywhere; csv and parquet skip openpyxl entirely:
+- csv is produced in chunks (iter_csv) so web responses can stream it,
+- parquet needs `pyarrow` (listed in requirements.txt; the import stays optional).
+"""
+import io
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+DEFAULT_FORMAT = "xlsx"
+# format -> (file extension, mimetype)
+FORMATS = {
+    "xlsx": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (".csv", "text/csv"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+CSV_CHUNK_ROWS = 5000
+
+
+def normalize_format(value) -> str:
+    fmt = (value or DEFAULT_FORMAT).strip().lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {value} (expected one of {', '.join(FORMATS)})")
+    return fmt
+
+
+def format_for_path(path: str) -> str:
+    """Export format implied by a file name, defaulting to xlsx."""
+    lower = path.lower()
+    for fmt, (ext, _) in FORMATS.items():
+        if lower.endswith(ext):
+            return fmt
+    return DEFAULT_FORMAT
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+def iter_csv(df: pd.DataFrame, chunk_rows: int = CSV_CHUNK_ROWS):
+    """Yield df as CSV text, chunk_rows rows at a time (header in the first chunk)."""
+    if df.empty:
+        yield df.to_csv(index=False)
+        return
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(index=False, header=start == 0)
+
+
+def write_csv(df: pd.DataFrame, path: str):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        for chunk in iter_csv(df):
+            f.write(chunk)
+
+
+def arrow_safe_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Arrow needs one type per column; mixed object columns (e.g. from Excel) are sent as text."""
+    df = df.copy()
+    for col in df.columns:
+        if df[col].dtype == object and pd.api.types.infer_dtype(df[col], skipna=True) not in ("string", "empty"):
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+    return df
+
+
+def to_parquet_bytes(df: pd.DataFrame) -> bytes:
+    if pq is None:
+        raise RuntimeError("Parquet export requires pyarrow (pip install pyarrow)")
+    table = pa.Table.from_pandas(arrow_safe_frame(df), preserve_index=False)
+    sink = io.BytesIO()
+    pq.write_table(table, sink, compression="snappy")
+    return sink.getvalue()
+
+
+def write_parquet(df: pd.DataFrame, path: str):
+    data = to_parquet_bytes(df)
+    with open(path, "wb") as f:
+        f.write(data)
@@ -0,0 +1,314 @@
+"""
+Background export jobs with progress reporting.
+
+ExportJobManager builds export files on a small thread pool, so the request that starts an
+export returns immediately. A job is identified by a hash of its key (data version + export
+parameters) and keeps its state in <cache_dir>/<job_id>.json next to the finished file, so
+- any worker process can report progress or serve the download, and
+- an identical export requested again before the file expires is served from the cache
+  instead of being rebuilt.
+Before building, a job is claimed with an O_EXCL lock file (<job_id>.lock), so of several
+processes submitting the same export only one builds it. Until the job has finished, a
+heartbeat thread in the owning process refreshes its state and lock files every
+STATE_HEARTBEAT_SECONDS, also while it waits for a worker or sits in a long call that reports
+no progress (a Parquet write, an xlsx save); a job whose heartbeat stopped for STALE_SECONDS is
+treated as dead and may be claimed again.
+Finished files older than ttl_seconds are removed on the next submit.
+
+stream_events() reports a job's state as Server-Sent Events until it is done or failed.
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from openpyxl import Workbook
+
+import export_formats
+
+DEFAULT_TTL_SECONDS = 600
+DEFAULT_WORKERS = 2
+PROGRESS_EVERY_ROWS = 1000
+# A queued/running job whose heartbeat has stopped for this long is treated as dead
+# (e.g. the worker process that owned it was restarted) and is started again.
+STALE_SECONDS = 120
+STATE_HEARTBEAT_SECONDS = 10
+HEARTBEAT_SECONDS = 15
+
+
+def job_id_for(key) -> str:
+    return hashlib.sha1(json.dumps(key, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:20]
+
+
+def _cell(value):
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    if hasattr(value, "item"):
+        # numpy scalars -> plain Python values
+        return value.item()
+    return value
+
+
+def write_xlsx(df: pd.DataFrame, path: str, progress=None, sheet_name: str = "Data",
+               every: int = PROGRESS_EVERY_ROWS):
+    """Write df row by row with a write-only workbook, calling progress(rows_written) every `every` rows."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(sheet_name)
+    ws.append([str(c) for c in df.columns])
+    written = 0
+    for row in df.itertuples(index=False, name=None):
+        ws.append([_cell(v) for v in row])
+        written += 1
+        if progress is not None and written % every == 0:
+            progress(written)
+    wb.save(path)
+    if progress is not None:
+        progress(written)
+
+
+def write_export(df: pd.DataFrame, path: str, fmt: str, progress=None):
+    """Write df in the given export format (see export_formats.FORMATS), reporting rows written."""
+    if fmt == "xlsx":
+        write_xlsx(df, path, progress=progress)
+        return
+    if fmt == "csv":
+        written = 0
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            for chunk in export_formats.iter_csv(df):
+                f.write(chunk)
+                written = min(written + export_formats.CSV_CHUNK_ROWS, len(df))
+                if progress is not None:
+                    progress(written)
+        return
+    export_formats.write_parquet(df, path)
+    if progress is not None:
+        progress(len(df))
+
+
+class ExportJobManager:
+    def __init__(self, cache_dir=None, ttl_seconds=DEFAULT_TTL_SECONDS, max_workers=DEFAULT_WORKERS):
+        self.cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "dashboard_export_jobs")
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export-job")
+        self._lock = threading.Lock()
+        # Jobs this process has claimed and not finished: job_id -> (state, lock around its saves)
+        self._owned = {}
+        self._heartbeat = None
+
+    def _state_path(self, job_id):
+        return os.path.join(self.cache_dir, job_id + ".json")
+
+    def _lock_path(self, job_id):
+        return os.path.join(self.cache_dir, job_id + ".lock")
+
+    def _claim(self, job_id):
+        """Create the job's lock file; False while another live process holds it."""
+        path = self._lock_path(job_id)
+        for _ in range(2):
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return True
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(path) < STALE_SECONDS:
+                        return False
+                    # The owner stopped beating without releasing the lock
+                    os.remove(path)
+                except OSError:
+                    pass
+        return False
+
+    def _release(self, job_id):
+        try:
+            os.remove(self._lock_path(job_id))
+        except OSError:
+            pass
+
+    def file_path(self, state):
+        return os.path.join(self.cache_dir, state["job_id"] + state.get("ext", ".xlsx"))
+
+    def get(self, job_id):
+        if not job_id.isalnum():
+            return None
+        try:
+            with open(self._state_path(job_id), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save(self, state):
+        state["updated"] = time.time()
+        path = self._state_path(state["job_id"])
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp, path)
+
+    def _reusable(self, state):
+        now = time.time()
+        if state["status"] == "done":
+            return os.path.exists(self.file_path(state)) and now - state["finished"] < self.ttl_seconds
+        if state["status"] in ("queued", "running"):
+            return now - state["updated"] < STALE_SECONDS
+        return False
+
+    def submit(self, key, rows_total, build, ext=".xlsx", filename=None):
+        """
+        Start build(path, progress) in the background unless an identical job is already running
+        or finished and not expired. Returns (state, reused).
+        """
+        self.purge_expired()
+        job_id = job_id_for(key)
+        with self._lock:
+            state = self.get(job_id)
+            if state is not None and self._reusable(state):
+                return state, True
+            now = time.time()
+            claimed = self._claim(job_id)
+            if not claimed:
+                # Another process is building it; its state file appears once it has saved it
+                state = self.get(job_id)
+                if state is not None and self._reusable(state):
+                    return state, True
+            state = {
+                "job_id": job_id,
+                "status": "queued",
+                "rows_total": int(rows_total),
+                "rows_written": 0,
+                "eta_seconds": None,
+                "created": now,
+                "started": None,
+                "finished": None,
+                "error": None,
+                "ext": ext,
+                "filename": filename or f"export{ext}",
+            }
+            if not claimed:
+                return state, True
+            self._save(state)
+            owned = dict(state)
+            self._owned[job_id] = (owned, threading.Lock())
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(target=self._beat, name="export-heartbeat", daemon=True)
+                self._heartbeat.start()
+        self._executor.submit(self._run, owned, build)
+        return state, False
+
+    def _update(self, job_id, **changes):
+        state, save_lock = self._owned[job_id]
+        with save_lock:
+            state.update(changes)
+            self._save(state)
+
+    def _beat(self):
+        while True:
+            time.sleep(STATE_HEARTBEAT_SECONDS)
+            with self._lock:
+                if not self._owned:
+                    self._heartbeat = None
+                    return
+                job_ids = list(self._owned)
+            for job_id in job_ids:
+                try:
+                    self._update(job_id)
+                    os.utime(self._lock_path(job_id))
+                except (KeyError, OSError):
+                    # Finished meanwhile
+                    pass
+
+    def _run(self, state, build):
+        job_id = state["job_id"]
+        path = self.file_path(state)
+        part = path + ".part"
+
+        def progress(rows_written):
+            elapsed = time.time() - state["started"]
+            remaining = max(state["rows_total"] - rows_written, 0)
+            eta = round(elapsed / rows_written * remaining, 1) if rows_written else None
+            self._update(job_id, rows_written=rows_written, eta_seconds=eta)
+
+        self._update(job_id, status="running", started=time.time())
+        try:
+            build(part, progress)
+            os.replace(part, path)
+            self._update(job_id, status="done", finished=time.time(), eta_seconds=0, size_bytes=os.path.getsize(path))
+        except Exception as e:
+            print(f"[export_jobs] Job {job_id} failed: {e}", flush=True)
+            self._update(job_id, status="error", finished=time.time(), error=str(e))
+            if os.path.exists(part):
+                os.remove(part)
+        finally:
+            with self._lock:
+                self._owned.pop(job_id, None)
+            self._release(job_id)
+
+    def purge_expired(self):
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            state = self.get(name[:-5])
+            if state is None:
+                continue
+            finished = state.get("finished")
+            expired = (finished is not None and now - finished >= self.ttl_seconds) or (
+                finished is None and now - state["updated"] >= STALE_SECONDS
+            )
+            if not expired:
+                continue
+            paths = [self.file_path(state), self._state_path(state["job_id"])]
+            if finished is None:
+                # Its heartbeat stopped, so the lock is as stale as the state
+                paths.append(self._lock_path(state["job_id"]))
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def public_state(state):
+    keys = ("job_id", "status", "rows_total", "rows_written", "eta_seconds", "error", "size_bytes")
+    out = {k: state.get(k) for k in keys}
+    total = state.get("rows_total") or 0
+    out["percent"] = 100.0 if state.get("status") == "done" else (
+        round(100.0 * state.get("rows_written", 0) / total, 1) if total else 0.0
+    )
+    return out
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_events(manager, job_id, interval=0.5):
+    """Yield 'progress' events while the job runs and a final 'done' or 'error' event."""
+    last = None
+    last_sent = time.monotonic()
+    while True:
+        state = manager.get(job_id)
+        if state is None:
+            yield format_event("error", {"job_id": job_id, "status": "error", "error": "Unknown export job"})
+            return
+        public = public_state(state)
+        if state["status"] in ("done", "error"):
+            yield format_event(state["status"], public)
+            return
+        if public != last:
+            yield format_event("progress", public)
+            last = public
+            last_sent = time.monotonic()
+        elif time.monotonic() - last_sent >= HEARTBEAT_SECONDS:
+            yield ": keep-alive\n\n"
+            last_sent = time.monotonic()
+        time.sleep(interval)
@@ -4,8 +4,9 @@ from datetime import datetime, timedelta
 import random
 import os
 
-def generate_sample_data(num_rows=100000):
-    """Generate sample test data with various data types"""
+def generate_sample_data(num_rows=100000, write_files=True):
+    """Generate sample test data with various data types.
+    Returns the generated DataFrame; set write_files=False to skip writing the sample .xlsx files."""
     
     print(f"Generating {num_rows} rows of sample data...")
     
@@ -30,6 +31,9 @@ def generate_sample_data(num_rows=100000):
     
     df = pd.DataFrame(data)
     
+    if not write_files:
+        return df
+    
     # Create different test files
     
     # 1. Complete data
@@ -66,6 +70,7 @@ def generate_sample_data(num_rows=100000):
     print("- sample_data_small.xlsx (Small dataset for quick testing)")
     if num_rows > 50000:
         print("- sample_data_large.xlsx (Large dataset for performance testing)")
+    return df
 
 def generate_corrupted_file():
     """Generate a corrupted Excel file for testing error handling"""
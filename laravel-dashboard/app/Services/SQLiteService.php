@@ -57,6 +57,19 @@ public function execute($sql, $params = [])
         return $stmt->execute();
     }
 
+    /**
+     * Incremental sync: change_log entries after $seq (see process_export.get_changes_since).
+     * Each entry has seq, NOP, op (insert|update|delete|rollback|reset) and changed_timestamp;
+     * an op of "reset" means records_current was wiped and must be re-read in full.
+     */
+    public function changesSince($seq, $limit = 1000)
+    {
+        return $this->query(
+            'SELECT seq, "NOP", op, changed_timestamp FROM change_log WHERE seq > :seq ORDER BY seq LIMIT :limit',
+            [':seq' => (int) $seq, ':limit' => (int) $limit]
+        );
+    }
+
     public function getColumns($table)
     {
         $res = $this->db->query("PRAGMA table_info(\"$table\")");
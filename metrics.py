@@ -0,0 +1,144 @@
+"""
+Lightweight in-process metrics for the data pipeline and dashboard.
+
+- timer("parse") / @timed("parse") record stage durations into the
+  pipeline_stage_seconds histogram (label: stage).
+- inc() / observe() update arbitrary counters and histograms.
+- collect() captures the stage timings of the current thread, e.g. for one ingestion run.
+- render_prometheus() returns everything in the Prometheus text exposition format.
+
+Metrics live in the current process only; web workers each expose their own numbers.
+"""
+import time
+import threading
+from contextlib import contextmanager
+from functools import wraps
+from typing import Dict, Tuple
+
+STAGE_METRIC = "pipeline_stage_seconds"
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+HELP = {
+    STAGE_METRIC: "Time spent in each pipeline stage",
+    "pipeline_rows_total": "Rows processed per pipeline stage",
+    "http_request_seconds": "Dashboard request latency per endpoint",
+    "export_cache_requests_total": "Export artifact cache lookups by result (hit/miss)",
+    "export_cache_evictions_total": "Export files evicted from the artifact cache",
+}
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, Tuple], float] = {}
+_histograms: Dict[Tuple[str, Tuple], list] = {}
+_local = threading.local()
+
+
+def _key(name: str, labels: Dict) -> Tuple[str, Tuple]:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + value
+
+
+def observe(name: str, value: float, **labels):
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = [[0] * len(DEFAULT_BUCKETS), 0.0, 0]
+        for i, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                hist[0][i] += 1
+        hist[1] += value
+        hist[2] += 1
+    if name == STAGE_METRIC:
+        for collected in getattr(_local, "collectors", ()):
+            stage = labels.get("stage")
+            collected[stage] = collected.get(stage, 0.0) + value
+
+
+@contextmanager
+def timer(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(STAGE_METRIC, time.perf_counter() - start, stage=stage)
+
+
+def timed(stage: str):
+    def decorator(fn):
+        @wraps(fn)
+        def wrapped(*args, **kwargs):
+            with timer(stage):
+                return fn(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+@contextmanager
+def collect():
+    """Yield a dict that accumulates {stage: seconds} for stages timed in this thread while active."""
+    collected: Dict[str, float] = {}
+    stack = getattr(_local, "collectors", None)
+    if stack is None:
+        stack = _local.collectors = []
+    stack.append(collected)
+    try:
+        yield collected
+    finally:
+        stack.remove(collected)
+
+
+def record_timings(timings: Dict[str, float]):
+    """Feed stage timings measured elsewhere (e.g. in a worker process) into this process."""
+    for stage, seconds in timings.items():
+        observe(STAGE_METRIC, seconds, stage=stage)
+
+
+def format_timings(timings: Dict[str, float]) -> str:
+    return " ".join(f"{stage}={seconds:.3f}s" for stage, seconds in timings.items())
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _format_labels(labels: Tuple, extra: Tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in pairs)
+    return "{" + body + "}"
+
+
+def render_prometheus() -> str:
+    with _lock:
+        counters = dict(_counters)
+        histograms = {k: (list(v[0]), v[1], v[2]) for k, v in _histograms.items()}
+
+    lines = []
+    for name in sorted({k[0] for k in counters}):
+        if name in HELP:
+            lines.append(f"# HELP {name} {HELP[name]}")
+        lines.append(f"# TYPE {name} counter")
+        for (n, labels), value in sorted(counters.items()):
+            if n == name:
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+    for name in sorted({k[0] for k in histograms}):
+        if name in HELP:
+            lines.append(f"# HELP {name} {HELP[name]}")
+        lines.append(f"# TYPE {name} histogram")
+        for (n, labels), (buckets, total, count) in sorted(histograms.items()):
+            if n != name:
+                continue
+            for bound, bucket_count in zip(DEFAULT_BUCKETS, buckets):
+                lines.append(f"{name}_bucket{_format_labels(labels, (('le', f'{bound:g}'),))} {bucket_count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
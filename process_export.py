@@ -1,16 +1,51 @@
 import os
 import sys
+import glob
 import sqlite3
 import logging
 import hashlib
-from datetime import datetime
-from typing import List, Tuple, Dict
+import json
+import argparse
+import time
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple, Dict, Optional
 
+import numpy as np
 import pandas as pd
 
+import metrics
+
 
 DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_pipeline.sqlite")
 LOG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_pipeline.log")
+SNAPSHOT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "merged_current.xlsx")
+EXPORT_EXTENSIONS = (".xlsx", ".xls", ".csv")
+WATCH_INTERVAL_SECONDS = 5.0
+WATCH_SETTLE_SECONDS = 10.0
+# A file that failed to ingest is retried after this delay, doubled per failed attempt up to the maximum
+WATCH_RETRY_SECONDS = 30.0
+WATCH_RETRY_MAX_SECONDS = 900.0
+SYNC_MODES = ("pandas", "sql")
+# "pandas" diffs against records_current loaded into memory; "sql" diffs inside SQLite via a staging table
+SYNC_MODE = os.environ.get("PIPELINE_SYNC_MODE", "pandas")
+# Every field change goes to the records_changes table; the sync summary keeps counts plus this many examples
+MODIFICATION_SAMPLE_SIZE = 100
+MODIFICATION_LOG_LIMIT = 20
+# History retention (0 = keep everything). Compaction runs from the folder watcher or --compact.
+HISTORY_KEEP_VERSIONS = int(os.environ.get("PIPELINE_HISTORY_KEEP_VERSIONS", "0"))
+HISTORY_MAX_AGE_DAYS = float(os.environ.get("PIPELINE_HISTORY_MAX_AGE_DAYS", "0"))
+# Versions beyond HISTORY_KEEP_VERSIONS still keep one full row per NOP per period as an as_of checkpoint
+HISTORY_CHECKPOINT_DAYS = float(os.environ.get("PIPELINE_HISTORY_CHECKPOINT_DAYS", "30"))
+# Turn full history rows into field-level deltas in records_changes before deleting them
+HISTORY_STORE_DELTAS = os.environ.get("PIPELINE_HISTORY_DELTAS", "1") != "0"
+CHANGES_MAX_AGE_DAYS = float(os.environ.get("PIPELINE_CHANGES_MAX_AGE_DAYS", "0"))
+CHANGE_LOG_MAX_AGE_DAYS = float(os.environ.get("PIPELINE_CHANGE_LOG_MAX_AGE_DAYS", "0"))
+COMPACT_INTERVAL_SECONDS = float(os.environ.get("PIPELINE_COMPACT_INTERVAL", "3600"))
+COMPACT_BATCH_ROWS = 5000
+COMPACT_PAGE_NOPS = 1000
+COMPACT_BUDGET_SECONDS = 5.0
 
 
 def setup_logging():
@@ -32,13 +67,16 @@ def read_export_file(path: str) -> pd.DataFrame:
     if not os.path.exists(path):
         raise FileNotFoundError(f"File not found: {path}")
     ext = os.path.splitext(path)[1].lower()
-    if ext == ".csv":
-        df = pd.read_csv(path, dtype=str, keep_default_na=False)
-    else:
-        df = pd.read_excel(path, dtype=str, engine="openpyxl")
-    df.columns = [normalize_column_name(c) for c in df.columns]
-    df = df.applymap(lambda x: None if pd.isna(x) or (isinstance(x, str) and x.strip() == "") else x)
-    df = handle_duplicate_columns(df)
+    with metrics.timer("parse"):
+        if ext == ".csv":
+            df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        else:
+            df = pd.read_excel(path, dtype=str, engine="openpyxl")
+    with metrics.timer("normalise"):
+        df.columns = [normalize_column_name(c) for c in df.columns]
+        df = df.applymap(lambda x: None if pd.isna(x) or (isinstance(x, str) and x.strip() == "") else x)
+        df = handle_duplicate_columns(df)
+    metrics.inc("pipeline_rows_total", len(df), stage="parse")
     return df
 
 
@@ -95,13 +133,116 @@ def compute_row_hash(row: pd.Series) -> str:
     return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 
-def connect_db() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_FILE)
+LOW_CARDINALITY_RATIO = 0.5
+_NUMERIC_TEXT_PATTERN = r"^-?(?:0|[1-9][0-9]{0,14})(?:\.[0-9]+)?$"
+
+
+def _frame_memory(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True).sum())
+
+
+def optimize_dtypes(df: pd.DataFrame, category_ratio: float = LOW_CARDINALITY_RATIO,
+                    exclude: Tuple[str, ...] = ("NOP",)) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Downcast a frame to compact dtypes.
+    - Text that is entirely numeric becomes the smallest int/float dtype that holds it losslessly
+      and prints back to the same text.
+    - Remaining text with few distinct values (unique/non-null <= category_ratio) becomes `category`;
+      columns mixing text with other types (e.g. numbers from Excel) stay object.
+    Columns in `exclude` (identifiers) are left untouched.
+    Returns the optimised frame and a report with memory usage before/after in bytes.
+    """
+    before = _frame_memory(df)
+    out = df.copy()
+    converted: Dict[str, str] = {}
+    for col in out.columns:
+        if col in exclude:
+            continue
+        s = out[col]
+        if pd.api.types.is_integer_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            down = pd.to_numeric(s, downcast="integer")
+            if down.dtype != s.dtype:
+                out[col] = down
+                converted[col] = str(down.dtype)
+            continue
+        if pd.api.types.is_float_dtype(s):
+            down = pd.to_numeric(s, downcast="float")
+            if down.dtype != s.dtype and (down.astype("float64") == s).where(s.notna(), True).all():
+                out[col] = down
+                converted[col] = str(down.dtype)
+            continue
+        if s.dtype != object:
+            continue
+        non_null = s.dropna()
+        if non_null.empty:
+            continue
+        if non_null.map(type).eq(str).all() and non_null.str.strip().str.match(_NUMERIC_TEXT_PATTERN).all():
+            text = non_null.str.strip()
+            num = pd.to_numeric(s.str.strip(), errors="coerce")
+            # Only convert when every value prints back exactly as the original text, so str() of
+            # a cell (used by compute_row_hash and the sync diff) is unchanged, e.g. "100" with
+            # missing values would become 100.0 and is therefore left as text.
+            if (num[non_null.index].astype(str) == text).all():
+                down = pd.to_numeric(num, downcast="integer")
+                if pd.api.types.is_float_dtype(down):
+                    down = pd.to_numeric(num, downcast="float")
+                    if not (down.astype("float64") == num).where(num.notna(), True).all():
+                        down = num
+                out[col] = down
+                converted[col] = str(down.dtype)
+                continue
+        # Only uniform text: categories mixing str and numbers (Excel cells) cannot go to Arrow/Parquet
+        if non_null.map(type).eq(str).all() and non_null.nunique() <= category_ratio * len(non_null):
+            cat = s.astype("category")
+            if cat.memory_usage(deep=True) < s.memory_usage(deep=True):
+                out[col] = cat
+                converted[col] = "category"
+    after = _frame_memory(out)
+    report = {
+        "before_bytes": before,
+        "after_bytes": after,
+        "saved_bytes": before - after,
+        "converted": converted,
+    }
+    return out, report
+
+
+class CatalogueConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that looks table columns up in the process-wide schema catalogue.
+
+    Catalogues are shared by all connections to the same file (see get_table_columns) and are
+    valid until PRAGMA schema_version changes, which SQLite bumps on every CREATE, ALTER or DROP
+    from any connection; per call, a lookup costs one read of that header field.
+    """
+
+    def __init__(self, database, *args, **kwargs):
+        super().__init__(database, *args, **kwargs)
+        path = os.fspath(database)
+        self.db_path = os.path.abspath(path) if path and path != ":memory:" and not path.startswith("file:") else None
+        self.catalogue_version = None
+        self.catalogue: Dict[str, List[str]] = {}
+
+
+# db path -> (schema_version, schema fingerprint, catalogue), shared by every CatalogueConnection
+_schema_catalogues: Dict[str, Tuple[int, str, Dict[str, List[str]]]] = {}
+_schema_catalogues_lock = threading.Lock()
+
+
+def connect_db(path: Optional[str] = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or DB_FILE, factory=CatalogueConnection)
+    # Only takes effect on a new database (or after VACUUM): lets compact_history hand freed pages back
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
     return conn
 
 
 def ensure_schema(conn: sqlite3.Connection, columns: List[str]):
     col_defs = ", ".join([f'"{c}" TEXT' for c in columns])
+    current_columns = columns + ["row_hash", "ingest_timestamp", "source_file"]
+    history_columns = columns + ["row_hash", "changed_timestamp", "source_file", "change_type", "ingest_timestamp"]
+    # Create and widen both tables in one transaction; DDL does not open one implicitly
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
     conn.execute(
         f"""
         CREATE TABLE IF NOT EXISTS records_current (
@@ -121,149 +262,604 @@ def ensure_schema(conn: sqlite3.Connection, columns: List[str]):
             row_hash TEXT NOT NULL,
             changed_timestamp TEXT NOT NULL,
             source_file TEXT NOT NULL,
-            change_type TEXT NOT NULL
+            change_type TEXT NOT NULL,
+            ingest_timestamp TEXT
         )
         """
     )
+    migrate_schema(conn, "records_current", current_columns, commit=False)
+    migrate_schema(conn, "records_history", history_columns, commit=False)
     conn.commit()
-    migrate_schema(conn, "records_current", columns + ["row_hash", "ingest_timestamp", "source_file"])
-    migrate_schema(conn, "records_history", columns + ["row_hash", "changed_timestamp", "source_file", "change_type"])
+    ensure_history_indexes(conn)
+    ensure_changes_table(conn)
+    ensure_change_log(conn)
+
+
+def ensure_history_indexes(conn: sqlite3.Connection):
+    """Per-record and by-time lookups into records_history (rollback, conflict checks)."""
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_records_history_nop ON records_history ("NOP", changed_timestamp)')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_records_history_ts ON records_history (changed_timestamp)")
+    conn.commit()
+
+
+def ensure_changes_table(conn: sqlite3.Connection):
+    """records_changes: one row per field-level modification detected by the sync engine."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS records_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            "NOP" TEXT NOT NULL,
+            field TEXT NOT NULL,
+            old_value TEXT,
+            new_value TEXT,
+            changed_timestamp TEXT NOT NULL,
+            source_file TEXT NOT NULL
+        )
+        """
+    )
+    # Per-record, time-ordered lookups (as_of, compaction); supersedes the earlier ("NOP") index
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_records_changes_nop_ts ON records_changes ("NOP", changed_timestamp)')
+    conn.execute("DROP INDEX IF EXISTS idx_records_changes_nop")
+    conn.commit()
+
+
+def ensure_change_log(conn: sqlite3.Connection):
+    """
+    change_log: change-data-capture feed of records_current with a monotonic sequence number.
+    Triggers append one entry per inserted, updated or deleted row, so writes from any client
+    (sync engine, rollback, the Laravel dashboard) are captured; rollback_record relabels its
+    entry as 'rollback' and a dashboard reset leaves a single 'reset' marker.
+    """
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            "NOP" TEXT NOT NULL,
+            op TEXT NOT NULL,
+            changed_timestamp TEXT NOT NULL
+        )
+        """
+    )
+    now = "strftime('%Y-%m-%dT%H:%M:%f', 'now')"
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS change_log_insert AFTER INSERT ON records_current
+        BEGIN
+            INSERT INTO change_log ("NOP", op, changed_timestamp) VALUES (NEW."NOP", 'insert', {now});
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS change_log_update AFTER UPDATE ON records_current
+        BEGIN
+            INSERT INTO change_log ("NOP", op, changed_timestamp)
+            SELECT OLD."NOP", 'delete', {now} WHERE OLD."NOP" IS NOT NEW."NOP";
+            INSERT INTO change_log ("NOP", op, changed_timestamp) VALUES (NEW."NOP", 'update', {now});
+        END
+        """
+    )
+    conn.execute(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS change_log_delete AFTER DELETE ON records_current
+        BEGIN
+            INSERT INTO change_log ("NOP", op, changed_timestamp) VALUES (OLD."NOP", 'delete', {now});
+        END
+        """
+    )
+    conn.commit()
+
+
+def get_latest_seq(conn: sqlite3.Connection) -> int:
+    if not get_table_columns(conn, "change_log"):
+        return 0
+    return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+
+
+def log_reset(conn: sqlite3.Connection):
+    """
+    Replace the change log with a single 'reset' marker after records_current was wiped
+    (part of the caller's transaction; the caller commits).
+    """
+    conn.execute("DELETE FROM change_log")
+    conn.execute("INSERT INTO change_log (\"NOP\", op, changed_timestamp) VALUES ('', 'reset', ?)", (datetime.utcnow().isoformat(),))
+
+
+def count_changes_since(conn: sqlite3.Connection, since: int = 0) -> Dict[str, int]:
+    """Number of change log entries per op ('insert', 'update', 'delete', 'rollback', 'reset') after since."""
+    if not get_table_columns(conn, "change_log"):
+        return {}
+    rows = conn.execute("SELECT op, COUNT(*) FROM change_log WHERE seq > ? GROUP BY op", (since,)).fetchall()
+    return {op: count for op, count in rows}
+
+
+def get_changes_since(conn: sqlite3.Connection, since: int = 0, limit: int = 1000) -> Dict:
+    """
+    Change log entries with seq > since (oldest first, at most `limit`), each with the current
+    version of its record (None once the record is gone).
+    `reset` is True when records_current was wiped in that range (log_reset removes all earlier
+    entries, so the marker is always the first entry a stale consumer sees) or when entries after
+    since were already removed by compact_history: do a full reload.
+    """
+    latest = get_latest_seq(conn)
+    result = {"since": since, "last_seq": since, "latest_seq": latest, "has_more": False, "reset": False, "changes": []}
+    if latest <= since:
+        return result
+    oldest = conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+    if since < oldest - 1:
+        result["reset"] = True
+    entries = conn.execute(
+        'SELECT seq, "NOP", op, changed_timestamp FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?', (since, limit)
+    ).fetchall()
+    nops = list({nop for _, nop, op, _ in entries if op != "reset"})
+    records = {}
+    for start in range(0, len(nops), 500):
+        chunk = nops[start:start + 500]
+        cur = conn.execute(f'SELECT * FROM records_current WHERE "NOP" IN ({", ".join(["?"] * len(chunk))})', chunk)
+        cols = [d[0] for d in cur.description]
+        for row in cur.fetchall():
+            record = dict(zip(cols, row))
+            records[record["NOP"]] = record
+    for seq, nop, op, ts in entries:
+        if op == "reset":
+            result["reset"] = True
+        result["changes"].append({"seq": seq, "nop": nop, "op": op, "changed_timestamp": ts, "record": records.get(nop)})
+    result["last_seq"] = entries[-1][0]
+    result["has_more"] = result["last_seq"] < latest
+    return result
+
+
+def read_schema_catalogue(conn: sqlite3.Connection) -> Dict[str, List[str]]:
+    """Column names of every table in the main database, in declaration order, from a single query."""
+    cur = conn.execute(
+        """
+        SELECT m.name, p.name FROM sqlite_master m, pragma_table_info(m.name) p
+        WHERE m.type = 'table' ORDER BY m.name, p.cid
+        """
+    )
+    catalogue: Dict[str, List[str]] = {}
+    for table, column in cur.fetchall():
+        catalogue.setdefault(table, []).append(column)
+    return catalogue
+
+
+def _shared_catalogue(conn: CatalogueConnection, version: int) -> Dict[str, List[str]]:
+    if conn.db_path is None:
+        return read_schema_catalogue(conn)
+    # A deleted and recreated file can reach the same schema_version with other tables; the table
+    # definitions themselves tell them apart (ALTER TABLE rewrites the stored CREATE statement)
+    definitions = "\n".join(row[0] or "" for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' ORDER BY name"))
+    fingerprint = hashlib.sha1(definitions.encode("utf-8")).hexdigest()
+    with _schema_catalogues_lock:
+        cached = _schema_catalogues.get(conn.db_path)
+    if cached is not None and cached[:2] == (version, fingerprint):
+        return cached[2]
+    catalogue = read_schema_catalogue(conn)
+    with _schema_catalogues_lock:
+        _schema_catalogues[conn.db_path] = (version, fingerprint, catalogue)
+    return catalogue
 
 
 def get_table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
-    cur = conn.execute(f'PRAGMA table_info("{table}")')
-    return [row[1] for row in cur.fetchall()]
+    if not isinstance(conn, CatalogueConnection):
+        cur = conn.execute(f'PRAGMA table_info("{table}")')
+        return [row[1] for row in cur.fetchall()]
+    version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    if version != conn.catalogue_version:
+        conn.catalogue = _shared_catalogue(conn, version)
+        conn.catalogue_version = version
+    return list(conn.catalogue.get(table, []))
 
 
-def migrate_schema(conn: sqlite3.Connection, table: str, desired_columns: List[str]):
+def migrate_schema(conn: sqlite3.Connection, table: str, desired_columns: List[str], commit: bool = True):
     existing = set(get_table_columns(conn, table))
-    added = []
-    for col in desired_columns:
-        if col not in existing:
-            conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}" TEXT')
-            added.append(col)
+    added = [col for col in desired_columns if col not in existing]
+    for col in added:
+        conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{col}" TEXT')
     if added:
         logging.info(f"Schema migration on {table}: added columns {added}")
-        conn.commit()
+        if commit:
+            conn.commit()
 
 
-def load_current(conn: sqlite3.Connection) -> pd.DataFrame:
+def load_current(conn: sqlite3.Connection, optimize: bool = False) -> pd.DataFrame:
     try:
         df = pd.read_sql_query("SELECT * FROM records_current", conn)
         df = df.applymap(lambda x: None if pd.isna(x) else x)
+        if optimize:
+            df, report = optimize_dtypes(df, exclude=("NOP", "row_hash", "ingest_timestamp"))
+            logging.info(f"load_current: dtype optimisation saved {report['saved_bytes']} bytes "
+                         f"({report['before_bytes']} -> {report['after_bytes']})")
         return df
     except Exception:
         return pd.DataFrame()
 
 
-def detect_and_sync_changes(conn: sqlite3.Connection, df_new: pd.DataFrame, source_file: str) -> Dict:
+def compute_file_hash(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+INGEST_RUN_COLUMNS = [
+    "file_hash", "source_file", "ingest_timestamp", "row_count", "new_records", "updated_records",
+    "unchanged_records", "duration_seconds", "summary", "sync_timestamp",
+]
+
+
+def ensure_ingest_ledger(conn: sqlite3.Connection):
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ingest_runs (
+            file_hash TEXT PRIMARY KEY,
+            source_file TEXT NOT NULL,
+            ingest_timestamp TEXT NOT NULL,
+            row_count INTEGER,
+            new_records INTEGER,
+            updated_records INTEGER,
+            unchanged_records INTEGER,
+            duration_seconds REAL,
+            summary TEXT,
+            sync_timestamp TEXT
+        )
+        """
+    )
+    conn.commit()
+    migrate_schema(conn, "ingest_runs", INGEST_RUN_COLUMNS)
+
+
+def is_file_ingested(conn: sqlite3.Connection, file_hash: str) -> bool:
+    ensure_ingest_ledger(conn)
+    cur = conn.execute("SELECT 1 FROM ingest_runs WHERE file_hash=?", (file_hash,))
+    return cur.fetchone() is not None
+
+
+def summarize_sync(summary: Dict) -> Dict:
+    """Compact, JSON-serialisable view of a detect_and_sync_changes summary."""
+    return {
+        "new_records": summary["new_records"],
+        "updated_records": summary["updated_records"],
+        "unchanged_records": summary["unchanged_records"],
+        "modifications": summary.get("modification_count", len(summary["modifications"])),
+        "field_change_counts": summary.get("field_change_counts", {}),
+        "errors": summary["errors"][:20],
+        "error_count": len(summary["errors"]),
+        "timings": summary.get("timings", {}),
+        "sync_timestamp": summary.get("sync_timestamp"),
+    }
+
+
+def record_ingest_run(conn: sqlite3.Connection, file_hash: str, source_file: str, row_count: Optional[int] = None,
+                      summary: Optional[Dict] = None, duration_seconds: Optional[float] = None):
+    ensure_ingest_ledger(conn)
+    compact = summarize_sync(summary) if summary else {}
+    conn.execute(
+        f"INSERT OR REPLACE INTO ingest_runs ({', '.join(INGEST_RUN_COLUMNS)}) VALUES ({', '.join(['?'] * len(INGEST_RUN_COLUMNS))})",
+        (
+            file_hash,
+            source_file,
+            datetime.utcnow().isoformat(),
+            row_count,
+            compact.get("new_records"),
+            compact.get("updated_records"),
+            compact.get("unchanged_records"),
+            duration_seconds,
+            json.dumps(compact) if compact else None,
+            compact.get("sync_timestamp"),
+        ),
+    )
+    conn.commit()
+
+
+def get_ingest_runs(conn: sqlite3.Connection, limit: int = 50) -> List[Dict]:
+    ensure_ingest_ledger(conn)
+    cur = conn.execute(
+        f"SELECT {', '.join(INGEST_RUN_COLUMNS)} FROM ingest_runs ORDER BY ingest_timestamp DESC LIMIT ?", (limit,)
+    )
+    runs = []
+    for row in cur.fetchall():
+        run = dict(zip(INGEST_RUN_COLUMNS, row))
+        run["summary"] = json.loads(run["summary"]) if run["summary"] else None
+        runs.append(run)
+    return runs
+
+
+def detect_and_sync_changes(conn: sqlite3.Connection, df_new: pd.DataFrame, source_file: str,
+                            mode: Optional[str] = None) -> Dict:
     """
     Detailed field-level diff detection and synchronization engine.
     Returns a summary of changes detected and synchronized.
+    mode: "pandas" or "sql" (see detect_and_sync_changes_sql); defaults to SYNC_MODE.
     """
+    mode = mode or SYNC_MODE
+    if mode == "sql":
+        return detect_and_sync_changes_sql(conn, df_new, source_file)
+    if mode != "pandas":
+        raise ValueError(f"Unknown sync mode: {mode} (expected one of {', '.join(SYNC_MODES)})")
+    diff_started = time.perf_counter()
     df_current = load_current(conn)
     sync_summary = {
         "new_records": 0,
         "updated_records": 0,
         "unchanged_records": 0,
-        "modifications": [],  # List of {nop, field, old, new}
+        "modifications": [],  # Sample of {nop, field, old, new}, at most MODIFICATION_SAMPLE_SIZE
+        "modification_count": 0,
+        "field_change_counts": {},  # field -> number of changes
         "errors": []
     }
     
     ts = datetime.utcnow().isoformat()
-    df_new = df_new.copy()
-    df_new["row_hash"] = df_new.apply(compute_row_hash, axis=1)
+    # Shared by the history, change and inserted rows of this run; identifies it for rollback_batch
+    sync_summary["sync_timestamp"] = ts
+    df_new = df_new[df_new["NOP"].notna()]
+    duplicated = df_new["NOP"].duplicated(keep="last")
+    if duplicated.any():
+        sync_summary["errors"].append(f"{int(duplicated.sum())} duplicate NOP row(s) in {source_file}; last occurrence kept")
+        df_new = df_new[~duplicated]
+    hash_started = time.perf_counter()
+    df_new = df_new.assign(row_hash=df_new.apply(compute_row_hash, axis=1) if not df_new.empty else [])
+    hash_seconds = time.perf_counter() - hash_started
+    metrics.observe(metrics.STAGE_METRIC, hash_seconds, stage="hash")
+    write_seconds = 0.0
     
     cursor = conn.cursor()
     current_cols = set(get_table_columns(conn, "records_current"))
-    
-    for _, row in df_new.iterrows():
-        nop = row.get("NOP")
-        if nop is None:
-            continue
-            
-        existing = None
-        if not df_current.empty:
-            match = df_current[df_current["NOP"] == nop]
-            if not match.empty:
-                existing = match.iloc[0]
-                
-        if existing is None:
-            # Insert new record (already handled by upsert_records logic, but we integrate it here)
-            cols_to_insert = [c for c in df_new.columns if c in current_cols and c != "row_hash"]
-            data_cols = ", ".join([f'"{c}"' for c in cols_to_insert] + ["row_hash", "ingest_timestamp", "source_file"])
-            placeholders = ", ".join(["?"] * (len(cols_to_insert) + 3))
-            values = [row.get(c) for c in cols_to_insert] + [row["row_hash"], ts, source_file]
-            
-            try:
-                cursor.execute(f'INSERT INTO records_current ({data_cols}) VALUES ({placeholders})', values)
-                sync_summary["new_records"] += 1
-            except Exception as e:
-                sync_summary["errors"].append(f"Error inserting {nop}: {e}")
-        else:
-            # Detect changes
-            if existing["row_hash"] == row["row_hash"]:
-                sync_summary["unchanged_records"] += 1
-                continue
-                
-            # Field-level comparison
-            field_changes = []
-            cols_to_compare = [c for c in df_new.columns if c in current_cols and c not in ["row_hash", "ingest_timestamp", "source_file", "NOP"]]
-            
-            for col in cols_to_compare:
-                old_val = existing.get(col)
-                new_val = row.get(col)
-                
-                # Normalize for comparison
-                old_norm = "" if pd.isna(old_val) else str(old_val).strip()
-                new_norm = "" if pd.isna(new_val) else str(new_val).strip()
-                
-                if old_norm != new_norm:
-                    field_changes.append({
-                        "field": col,
-                        "old": old_norm,
-                        "new": new_norm
-                    })
-                    sync_summary["modifications"].append({
-                        "nop": nop,
-                        "field": col,
-                        "old": old_norm,
-                        "new": new_norm
-                    })
-            
-            if field_changes:
-                # Log modification
-                for change in field_changes:
-                    logging.info(f"SYNC: [{nop}] Field '{change['field']}' changed: '{change['old']}' -> '{change['new']}'")
-                
-                # Update record
-                update_cols = [c for c in df_new.columns if c in current_cols and c != "NOP"]
-                set_clause = ", ".join([f'"{c}"=?' for c in update_cols])
-                values = [row.get(c) for c in update_cols] + [nop]
-                
-                try:
-                    # Keep history for rollback
-                    # Include NOP in history record
-                    hist_data_cols = [c for c in df_new.columns if c in current_cols]
-                    hist_cols_str = ", ".join([f'"{c}"' for c in hist_data_cols] + ["change_type", "changed_timestamp", "source_file"])
-                    hist_placeholders = ", ".join(["?"] * (len(hist_data_cols) + 3))
-                    
-                    # Store OLD values in history before update
-                    old_hist_values = [existing.get(c) for c in hist_data_cols] + ["sync_update_old", ts, source_file]
-                    cursor.execute(f'INSERT INTO records_history ({hist_cols_str}) VALUES ({hist_placeholders})', old_hist_values)
-                    
-                    # Perform update (already has NOP in WHERE clause)
-                    update_cols = [c for c in df_new.columns if c in current_cols and c != "NOP"]
-                    set_clause = ", ".join([f'"{c}"=?' for c in update_cols])
-                    update_values = [row.get(c) for c in update_cols] + [nop]
-                    cursor.execute(f'UPDATE records_current SET {set_clause} WHERE "NOP"=?', update_values)
-                    sync_summary["updated_records"] += 1
-                except Exception as e:
-                    sync_summary["errors"].append(f"Error updating {nop}: {e}")
-            else:
-                sync_summary["unchanged_records"] += 1
-                
+    data_cols = [c for c in df_new.columns if c in current_cols and c not in ("row_hash", "ingest_timestamp", "source_file")]
+    compare_cols = [c for c in data_cols if c != "NOP"]
+
+    # Align incoming rows with their current version by NOP
+    if df_current.empty:
+        is_existing = pd.Series(False, index=df_new.index)
+        current = df_current
+    else:
+        current = df_current.set_index("NOP", drop=False)
+        is_existing = df_new["NOP"].isin(current.index)
+    inserts = df_new[~is_existing]
+    incoming = df_new[is_existing]
+    previous = current.loc[incoming["NOP"]] if len(incoming) else pd.DataFrame(columns=data_cols + ["row_hash"])
+
+    # Field-level comparison, column-wise over all rows whose hash changed
+    hash_changed = incoming["row_hash"].to_numpy() != previous["row_hash"].to_numpy()
+    incoming, previous = incoming[hash_changed], previous[hash_changed]
+    new_norm = _normalise_for_diff(incoming, compare_cols)
+    old_norm = _normalise_for_diff(previous, compare_cols)
+    diff_mask = new_norm != old_norm
+    changed = diff_mask.any(axis=1)
+    row_pos, col_pos = np.nonzero(diff_mask)
+    modifications = pd.DataFrame({
+        "NOP": incoming["NOP"].to_numpy()[row_pos],
+        "field": np.array(compare_cols, dtype=object)[col_pos],
+        "old": old_norm[row_pos, col_pos],
+        "new": new_norm[row_pos, col_pos],
+    })
+    sync_summary["unchanged_records"] = int(is_existing.sum() - changed.sum())
+    sync_summary["modification_count"] = len(modifications)
+    sync_summary["field_change_counts"] = {k: int(v) for k, v in modifications["field"].value_counts(sort=False).items()}
+    sync_summary["modifications"] = [
+        {"nop": nop, "field": field, "old": old, "new": new}
+        for nop, field, old, new in modifications.head(MODIFICATION_SAMPLE_SIZE).itertuples(index=False, name=None)
+    ]
+
+    write_started = time.perf_counter()
+    ensure_changes_table(conn)
+    cursor.executemany(
+        'INSERT INTO records_changes ("NOP", field, old_value, new_value, changed_timestamp, source_file) VALUES (?, ?, ?, ?, ?, ?)',
+        ((nop, field, old, new, ts, source_file) for nop, field, old, new in modifications.itertuples(index=False, name=None)),
+    )
+    # Insert new records
+    insert_cols = ", ".join([f'"{c}"' for c in data_cols] + ["row_hash", "ingest_timestamp", "source_file"])
+    insert_sql = f'INSERT INTO records_current ({insert_cols}) VALUES ({", ".join(["?"] * (len(data_cols) + 3))})'
+    for nop, values, row_hash in zip(inserts["NOP"], _db_rows(inserts, data_cols), inserts["row_hash"]):
+        try:
+            cursor.execute(insert_sql, values + (row_hash, ts, source_file))
+            sync_summary["new_records"] += 1
+        except Exception as e:
+            sync_summary["errors"].append(f"Error inserting {nop}: {e}")
+
+    # Update changed records, keeping their old values in history for rollback
+    hist_data_cols = data_cols + ["row_hash"]
+    hist_cols_str = ", ".join([f'"{c}"' for c in hist_data_cols] + ["change_type", "changed_timestamp", "source_file"])
+    hist_sql = f'INSERT INTO records_history ({hist_cols_str}) VALUES ({", ".join(["?"] * (len(hist_data_cols) + 3))})'
+    update_cols = compare_cols + ["row_hash"]
+    update_sql = f'UPDATE records_current SET {", ".join([f"{chr(34)}{c}{chr(34)}=?" for c in update_cols])} WHERE "NOP"=?'
+    updates, olds = incoming[changed], previous[changed]
+    for nop, new_values, old_values in zip(updates["NOP"], _db_rows(updates, update_cols), _db_rows(olds, hist_data_cols)):
+        try:
+            cursor.execute(hist_sql, old_values + ("sync_update_old", ts, source_file))
+            cursor.execute(update_sql, new_values + (nop,))
+            sync_summary["updated_records"] += 1
+        except Exception as e:
+            sync_summary["errors"].append(f"Error updating {nop}: {e}")
     conn.commit()
+    write_seconds += time.perf_counter() - write_started
+    _log_modifications(sync_summary)
+    metrics.observe(metrics.STAGE_METRIC, write_seconds, stage="db_write")
+    metrics.observe(metrics.STAGE_METRIC, time.perf_counter() - diff_started - hash_seconds - write_seconds, stage="diff")
+    metrics.inc("pipeline_rows_total", len(df_new), stage="sync")
+    return sync_summary
+
+
+def _log_modifications(sync_summary: Dict):
+    """Log at most MODIFICATION_LOG_LIMIT individual field changes plus one line with per-field counts."""
+    for mod in sync_summary["modifications"][:MODIFICATION_LOG_LIMIT]:
+        logging.info(f"SYNC: [{mod['nop']}] Field '{mod['field']}' changed: '{mod['old']}' -> '{mod['new']}'")
+    count = sync_summary["modification_count"]
+    if count > MODIFICATION_LOG_LIMIT:
+        logging.info(f"SYNC: {count} field changes in total ({count - MODIFICATION_LOG_LIMIT} not logged individually, "
+                     f"see records_changes); per field: {sync_summary['field_change_counts']}")
+
+
+def _normalise_for_diff(df: pd.DataFrame, columns: List[str]) -> np.ndarray:
+    """Cells as compared by the sync engine: missing -> "", otherwise str(value).strip(); as a 2D array."""
+    if df.empty or not columns:
+        return np.empty((len(df), len(columns)), dtype=object)
+    values = df[columns].astype(object)
+    values = values.where(values.notna(), "")
+    return np.column_stack([values[c].astype(str).str.strip().to_numpy(dtype=object) for c in columns])
+
+
+def _db_rows(df: pd.DataFrame, columns: List[str]):
+    """Rows of df[columns] as tuples of plain Python values (None for missing) for sqlite3."""
+    values = df[columns].astype(object)
+    return values.where(values.notna(), None).itertuples(index=False, name=None)
+
+
+def _quote(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _normalise_value(value) -> str:
+    """One cell as compared by the sync engine (see _normalise_for_diff); registered as sync_norm() in SQL."""
+    return "" if value is None else str(value).strip()
+
+
+def _sql_norm(expr: str) -> str:
+    # Python's own str.strip, so Unicode whitespace (NBSP, \x0b, ...) is handled exactly like the pandas diff
+    return f"sync_norm({expr})"
+
+
+def _sql_differs(stored: str, normalised: str) -> str:
+    # The raw stored value usually already equals the normalised input: only call into Python when not
+    return f"({stored} IS NOT {normalised} AND {_sql_norm(stored)} <> {normalised})"
+
+
+def detect_and_sync_changes_sql(conn: sqlite3.Connection, df_new: pd.DataFrame, source_file: str) -> Dict:
+    """
+    Set-based variant of detect_and_sync_changes that never loads records_current into memory.
+    The incoming rows are bulk-loaded into a TEMP staging table; new, changed and unchanged NOPs
+    are then found with JOINs, old versions are copied to records_history with INSERT ... SELECT
+    and the changes are applied with INSERT ... ON CONFLICT("NOP") DO UPDATE, all in one transaction.
+    Duplicate NOPs in the input keep their last occurrence. Returns the same summary shape.
+    """
+    diff_started = time.perf_counter()
+    sync_summary = {
+        "new_records": 0,
+        "updated_records": 0,
+        "unchanged_records": 0,
+        "modifications": [],  # Sample of {nop, field, old, new}, at most MODIFICATION_SAMPLE_SIZE
+        "modification_count": 0,
+        "field_change_counts": {},  # field -> number of changes
+        "errors": []
+    }
+    ts = datetime.utcnow().isoformat()
+    # Shared by the history, change and inserted rows of this run; identifies it for rollback_batch
+    sync_summary["sync_timestamp"] = ts
+    df_new = df_new[df_new["NOP"].notna()]
+
+    hash_started = time.perf_counter()
+    hashes = df_new.apply(compute_row_hash, axis=1) if not df_new.empty else pd.Series(dtype=object)
+    hash_seconds = time.perf_counter() - hash_started
+    metrics.observe(metrics.STAGE_METRIC, hash_seconds, stage="hash")
+
+    current_cols = set(get_table_columns(conn, "records_current"))
+    data_cols = [c for c in df_new.columns if c in current_cols and c not in ("row_hash", "ingest_timestamp", "source_file")]
+    compare_cols = [c for c in data_cols if c != "NOP"]
+    # Incoming values are normalised here, with the pandas engine's function, so SQL compares finished text
+    norm_cols = [_quote(f"__norm_{i}") for i in range(len(compare_cols))]
+    ensure_changes_table(conn)
+    conn.create_function("sync_norm", 1, _normalise_value, deterministic=True)
+    staging_cols = ", ".join(_quote(c) for c in data_cols)
+    write_seconds = 0.0
+
+    cur = conn.cursor()
+    if not conn.in_transaction:
+        cur.execute("BEGIN")
+    try:
+        write_started = time.perf_counter()
+        cur.execute("DROP TABLE IF EXISTS temp.sync_staging")
+        cur.execute("DROP TABLE IF EXISTS temp.sync_changed")
+        cur.execute(
+            f"CREATE TEMP TABLE sync_staging ({', '.join(_quote(c) + ' TEXT' for c in data_cols)}, "
+            f"{''.join(c + ' TEXT, ' for c in norm_cols)}"
+            f'row_hash TEXT NOT NULL, PRIMARY KEY ("NOP"))'
+        )
+        # astype(object) turns numpy scalars into plain Python values sqlite3 can bind
+        values = df_new[data_cols].astype(object).where(df_new[data_cols].notna(), None)
+        normalised = _normalise_for_diff(df_new, compare_cols).tolist()
+        cur.executemany(
+            f"INSERT OR REPLACE INTO sync_staging ({staging_cols}, {''.join(c + ', ' for c in norm_cols)}row_hash) "
+            f"VALUES ({', '.join(['?'] * (len(data_cols) + len(norm_cols) + 1))})",
+            (list(row) + norm + [h] for row, norm, h in zip(values.itertuples(index=False, name=None), normalised, hashes)),
+        )
+        staged = cur.execute("SELECT COUNT(*) FROM sync_staging").fetchone()[0]
+        if staged < len(df_new):
+            sync_summary["errors"].append(f"{len(df_new) - staged} duplicate NOP row(s) in {source_file}; last occurrence kept")
+        write_seconds += time.perf_counter() - write_started
+
+        # Changed = hash differs and at least one compared field differs after normalisation
+        differs = " OR ".join(_sql_differs("c." + _quote(c), "s." + n) for c, n in zip(compare_cols, norm_cols)) or "0"
+        cur.execute(
+            f'CREATE TEMP TABLE sync_changed AS SELECT s."NOP" AS "NOP" FROM sync_staging s '
+            f'JOIN records_current c ON c."NOP" = s."NOP" WHERE s.row_hash IS NOT c.row_hash AND ({differs})'
+        )
+        new_count = cur.execute(
+            'SELECT COUNT(*) FROM sync_staging s WHERE NOT EXISTS (SELECT 1 FROM records_current c WHERE c."NOP" = s."NOP")'
+        ).fetchone()[0]
+        changed_count = cur.execute("SELECT COUNT(*) FROM sync_changed").fetchone()[0]
+
+        write_started = time.perf_counter()
+        # Field changes go straight from the JOIN into records_changes; only counts and a sample come back
+        if changed_count and compare_cols:
+            field_diffs = " UNION ALL ".join(
+                f"SELECT s.rowid AS pos, {i} AS field_pos, s.\"NOP\" AS nop, '{c.replace(chr(39), chr(39) * 2)}' AS field, "
+                f"{_sql_norm('c.' + _quote(c))} AS old, s.{norm_cols[i]} AS new "
+                f'FROM sync_changed x JOIN sync_staging s ON s."NOP" = x."NOP" JOIN records_current c ON c."NOP" = x."NOP" '
+                f"WHERE {_sql_differs('c.' + _quote(c), 's.' + norm_cols[i])}"
+                for i, c in enumerate(compare_cols)
+            )
+            first_id = cur.execute("SELECT COALESCE(MAX(id), 0) FROM records_changes").fetchone()[0]
+            cur.execute(
+                'INSERT INTO records_changes ("NOP", field, old_value, new_value, changed_timestamp, source_file) '
+                f"SELECT nop, field, old, new, ?, ? FROM ({field_diffs}) ORDER BY pos, field_pos",
+                (ts, source_file),
+            )
+            for field, count in cur.execute("SELECT field, COUNT(*) FROM records_changes WHERE id > ? GROUP BY field", (first_id,)):
+                sync_summary["field_change_counts"][field] = count
+            sync_summary["modification_count"] = sum(sync_summary["field_change_counts"].values())
+            sync_summary["modifications"] = [
+                {"nop": nop, "field": field, "old": old, "new": new}
+                for nop, field, old, new in cur.execute(
+                    'SELECT "NOP", field, old_value, new_value FROM records_changes WHERE id > ? ORDER BY id LIMIT ?',
+                    (first_id, MODIFICATION_SAMPLE_SIZE),
+                )
+            ]
+
+        # Keep history for rollback: old versions of the changed rows
+        hist_cols = ", ".join([_quote(c) for c in data_cols] + ["row_hash"])
+        cur.execute(
+            f"INSERT INTO records_history ({hist_cols}, change_type, changed_timestamp, source_file) "
+            f"SELECT {', '.join('c.' + _quote(c) for c in data_cols)}, c.row_hash, 'sync_update_old', ?, ? "
+            f'FROM records_current c JOIN sync_changed x ON x."NOP" = c."NOP"',
+            (ts, source_file),
+        )
+        # New rows are inserted; changed rows keep their ingest_timestamp/source_file like in pandas mode
+        update_set = ", ".join([f"{_quote(c)}=excluded.{_quote(c)}" for c in compare_cols] + ["row_hash=excluded.row_hash"])
+        cur.execute(
+            f"INSERT INTO records_current ({staging_cols}, row_hash, ingest_timestamp, source_file) "
+            f"SELECT {', '.join('s.' + _quote(c) for c in data_cols)}, s.row_hash, ?, ? FROM sync_staging s "
+            f'WHERE s."NOP" IN (SELECT "NOP" FROM sync_changed) '
+            f'OR NOT EXISTS (SELECT 1 FROM records_current c WHERE c."NOP" = s."NOP") '
+            f'ON CONFLICT("NOP") DO UPDATE SET {update_set}',
+            (ts, source_file),
+        )
+        cur.execute("DROP TABLE temp.sync_staging")
+        cur.execute("DROP TABLE temp.sync_changed")
+        conn.commit()
+        write_seconds += time.perf_counter() - write_started
+    except Exception:
+        conn.rollback()
+        raise
+
+    sync_summary["new_records"] = new_count
+    sync_summary["updated_records"] = changed_count
+    sync_summary["unchanged_records"] = staged - new_count - changed_count
+    _log_modifications(sync_summary)
+    metrics.observe(metrics.STAGE_METRIC, write_seconds, stage="db_write")
+    metrics.observe(metrics.STAGE_METRIC, time.perf_counter() - diff_started - hash_seconds - write_seconds, stage="diff")
+    metrics.inc("pipeline_rows_total", len(df_new), stage="sync")
     return sync_summary
 
 def rollback_record(conn: sqlite3.Connection, nop: str) -> bool:
@@ -280,21 +876,45 @@ def rollback_record(conn: sqlite3.Connection, nop: str) -> bool:
         return False
         
     # Get column names for records_history
-    cursor.execute('PRAGMA table_info(records_history)')
-    hist_cols = [c[1] for c in cursor.fetchall()]
+    hist_cols = get_table_columns(conn, "records_history")
     
     # Map row values to columns
     record_data = dict(zip(hist_cols, row))
     
     # Columns to restore in records_current
     current_cols = set(get_table_columns(conn, "records_current"))
-    restore_cols = [c for c in record_data.keys() if c in current_cols and c not in ["id", "change_type", "changed_timestamp"]]
+    restore_cols = [c for c in record_data.keys() if c in current_cols and c not in ["id", "change_type", "changed_timestamp", "ingest_timestamp"]]
     
     set_clause = ", ".join([f'"{c}"=?' for c in restore_cols])
     values = [record_data[c] for c in restore_cols] + [nop]
+    previous = cursor.execute(f'SELECT {", ".join(_quote(c) for c in restore_cols)} FROM records_current WHERE "NOP"=?', (nop,)).fetchone()
+    if previous is None:
+        logging.warning(f"No current record to roll back for NOP: {nop}")
+        return False
+    # Like rollback_batch: keep the replaced values as 'rollback_old' (and as deltas) so as_of still sees them
+    ts = datetime.utcnow().isoformat()
+    label = f"rollback:{nop}"
+    audit_cols = [c for c in get_table_columns(conn, "records_current") if c in hist_cols and c not in ("ingest_timestamp", "source_file")]
+    quoted = ", ".join(_quote(c) for c in audit_cols)
     
     try:
+        ensure_changes_table(conn)
+        cursor.execute(
+            f"""INSERT INTO records_history ({quoted}, change_type, changed_timestamp, source_file)
+                SELECT {quoted}, 'rollback_old', ?, ? FROM records_current WHERE "NOP"=?""",
+            (ts, label, nop),
+        )
+        cursor.executemany(
+            'INSERT INTO records_changes ("NOP", field, old_value, new_value, changed_timestamp, source_file) VALUES (?, ?, ?, ?, ?, ?)',
+            [(nop, c, old, new, ts, label) for c, old, new in zip(restore_cols, previous, values)
+             if c not in ("NOP", "row_hash", "source_file", "ingest_timestamp") and old != new],
+        )
         cursor.execute(f'UPDATE records_current SET {set_clause} WHERE "NOP"=?', values)
+        if get_table_columns(conn, "change_log"):
+            cursor.execute(
+                """UPDATE change_log SET op='rollback' WHERE seq=(SELECT MAX(seq) FROM change_log WHERE "NOP"=? AND op='update')""",
+                (nop,),
+            )
         # Log rollback
         logging.info(f"ROLLBACK: [{nop}] Restored to previous state.")
         conn.commit()
@@ -304,6 +924,412 @@ def rollback_record(conn: sqlite3.Connection, nop: str) -> bool:
         conn.rollback()
         return False
 
+def normalize_timestamp(value: str) -> str:
+    """A user-supplied timestamp in the format the sync engine stores (naive UTC isoformat)."""
+    parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed.isoformat()
+
+
+def rollback_batch(conn: sqlite3.Connection, source_file: Optional[str] = None, file_hash: Optional[str] = None,
+                   to_timestamp: Optional[str] = None) -> Dict:
+    """
+    Undo many syncs at once, selected by exactly one of:
+    - source_file: every sync of that file,
+    - file_hash: one ingest run from the ingest_runs ledger,
+    - to_timestamp: every sync after that moment (point-in-time restore).
+    Updated records get the values they had before the first selected sync, records inserted by the
+    selection are deleted. Records changed afterwards by a sync outside the selection are left alone
+    and reported as conflicts. Runs as set-based SQL in one transaction; the values replaced are kept
+    in records_history as 'rollback_old' and, per field, in records_changes.
+    """
+    if sum(x is not None for x in (source_file, file_hash, to_timestamp)) != 1:
+        raise ValueError("Specify exactly one of source_file, file_hash or to_timestamp")
+    if file_hash is not None:
+        ensure_ingest_ledger(conn)
+        run = conn.execute("SELECT source_file, sync_timestamp FROM ingest_runs WHERE file_hash=?", (file_hash,)).fetchone()
+        if run is None:
+            raise ValueError(f"Unknown ingest run: {file_hash}")
+        if run[1] is None:
+            raise ValueError(f"Ingest run {file_hash} predates run tracking; roll back by source_file instead")
+        hist_filter, insert_filter, params = "source_file = ? AND changed_timestamp = ?", "source_file = ? AND ingest_timestamp = ?", run
+        label = f"rollback:{file_hash}"
+    elif source_file is not None:
+        hist_filter, insert_filter, params = "source_file = ?", "source_file = ?", (source_file,)
+        label = f"rollback:{source_file}"
+    else:
+        cutoff = normalize_timestamp(to_timestamp)
+        hist_filter, insert_filter, params = "changed_timestamp > ?", "ingest_timestamp > ?", (cutoff,)
+        label = f"rollback:{cutoff}"
+
+    result = {"restored": 0, "deleted": 0, "conflict_count": 0, "conflicts": []}
+    current_cols = get_table_columns(conn, "records_current")
+    if not current_cols:
+        return result
+    hist_cols = set(get_table_columns(conn, "records_history"))
+    ensure_history_indexes(conn)
+    ensure_changes_table(conn)
+    restore_cols = [c for c in current_cols if c in hist_cols and c not in ("NOP", "ingest_timestamp", "source_file")]
+    # ingest_timestamp tells as_of since when a record the rollback deletes had existed
+    audit_cols = [c for c in current_cols if c in hist_cols and c != "source_file"]
+    ts = datetime.utcnow().isoformat()
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    try:
+        seq_before = get_latest_seq(conn)
+        conn.execute("DROP TABLE IF EXISTS temp.rollback_target")
+        # One row per NOP: the history entry written by the first selected sync holds the values to restore
+        conn.execute(
+            f"""CREATE TEMP TABLE rollback_target AS
+                SELECT "NOP" AS nop, MIN(id) AS hist_id, MIN(changed_timestamp) AS first_ts, 0 AS inserted
+                FROM records_history WHERE change_type = 'sync_update_old' AND {hist_filter} GROUP BY "NOP" """,
+            params,
+        )
+        conn.execute("CREATE UNIQUE INDEX temp.rollback_target_nop ON rollback_target (nop)")
+        # Records the selection inserted did not exist before it: delete rather than restore
+        conn.execute(
+            f"""INSERT INTO rollback_target (nop, hist_id, first_ts, inserted)
+                SELECT "NOP", NULL, ingest_timestamp, 1 FROM records_current WHERE {insert_filter}
+                ON CONFLICT (nop) DO UPDATE SET hist_id = NULL, first_ts = excluded.first_ts, inserted = 1""",
+            params,
+        )
+        # Conflicts: changed later by a sync outside the selection, or the selection reaches back into
+        # history that compact_history already reduced to deltas (the full row to restore is gone)
+        conflict_sql = f"""(EXISTS (SELECT 1 FROM records_history o WHERE o."NOP" = rollback_target.nop
+                            AND o.change_type = 'sync_update_old' AND o.changed_timestamp > rollback_target.first_ts
+                            AND NOT (o.{hist_filter.replace(" AND ", " AND o.")}))
+                         OR (rollback_target.inserted = 0 AND EXISTS (
+                            SELECT 1 FROM records_changes rc WHERE rc."NOP" = rollback_target.nop
+                            AND rc.changed_timestamp < rollback_target.first_ts
+                            AND rc.{hist_filter.replace(" AND ", " AND rc.")})))"""
+        conflicts = [row[0] for row in conn.execute(f"SELECT nop FROM rollback_target WHERE {conflict_sql} ORDER BY nop", params + params)]
+        result["conflict_count"] = len(conflicts)
+        result["conflicts"] = conflicts[:MODIFICATION_SAMPLE_SIZE]
+        conn.execute(f"DELETE FROM rollback_target WHERE {conflict_sql}", params + params)
+
+        quoted = ", ".join(_quote(c) for c in audit_cols)
+        conn.execute(
+            f"""INSERT INTO records_history ({quoted}, change_type, changed_timestamp, source_file)
+                SELECT {quoted}, 'rollback_old', ?, ? FROM records_current
+                WHERE "NOP" IN (SELECT nop FROM rollback_target)""",
+            (ts, label),
+        )
+        delta_sql = " UNION ALL ".join(
+            f"""SELECT t.nop, '{c.replace("'", "''")}', c.{_quote(c)}, h.{_quote(c)}, ?, ?
+                FROM rollback_target t JOIN records_current c ON c."NOP" = t.nop JOIN records_history h ON h.id = t.hist_id
+                WHERE t.inserted = 0 AND c.{_quote(c)} IS NOT h.{_quote(c)}"""
+            for c in restore_cols if c != "row_hash"
+        )
+        if delta_sql:
+            conn.execute(
+                f"""INSERT INTO records_changes ("NOP", field, old_value, new_value, changed_timestamp, source_file)
+                    {delta_sql}""",
+                (ts, label) * (len(restore_cols) - ("row_hash" in restore_cols)),
+            )
+        result["deleted"] = conn.execute(
+            'DELETE FROM records_current WHERE "NOP" IN (SELECT nop FROM rollback_target WHERE inserted = 1)'
+        ).rowcount
+        if restore_cols:
+            targets = ", ".join(_quote(c) for c in restore_cols)
+            sources = ", ".join("h." + _quote(c) for c in restore_cols)
+            result["restored"] = conn.execute(
+                f"""UPDATE records_current SET ({targets}) = (
+                        SELECT {sources} FROM rollback_target t JOIN records_history h ON h.id = t.hist_id
+                        WHERE t.nop = records_current."NOP")
+                    WHERE "NOP" IN (SELECT nop FROM rollback_target WHERE inserted = 0)"""
+            ).rowcount
+        if get_table_columns(conn, "change_log"):
+            conn.execute("UPDATE change_log SET op = 'rollback' WHERE seq > ? AND op = 'update'", (seq_before,))
+        conn.execute("DROP TABLE temp.rollback_target")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logging.info(f"ROLLBACK ({label}): restored={result['restored']}, deleted={result['deleted']}, "
+                 f"conflicts={result['conflict_count']}")
+    return result
+
+
+def as_of(conn: sqlite3.Connection, timestamp: str) -> pd.DataFrame:
+    """
+    records_current as it was at `timestamp` (UTC; changes committed at that moment included).
+    Syncs and rollbacks write a full copy of a record to records_history just before changing it,
+    so for each record the first history row after the timestamp holds its state at that time (one
+    index seek on (NOP, changed_timestamp)); records without a later change are already current.
+    Ranges that compact_history reduced to deltas are filled in from records_changes (the old value
+    of the earliest change after the timestamp, per field); the sync engine stores those values
+    normalised, so there NULL comes back as "" and surrounding whitespace is lost. The cost grows
+    with the number of records, not with the length of their history.
+    Records inserted after the timestamp are left out. Records rollback_batch deleted since are
+    rebuilt from their history the same way: the deletion wrote a final history row carrying the
+    record's ingest_timestamp, so they are included when they had been inserted by then.
+    Raises ValueError when the timestamp is older than the retention horizon (history that
+    compact_history deleted without keeping deltas).
+    """
+    cutoff = normalize_timestamp(timestamp)
+    current_cols = get_table_columns(conn, "records_current")
+    if not current_cols:
+        return pd.DataFrame()
+    horizon = get_retention_horizon(conn)
+    if horizon and cutoff < horizon:
+        raise ValueError(f"History before {horizon} was removed by the retention policy; cannot rebuild {cutoff}")
+    ensure_history_indexes(conn)
+    ensure_changes_table(conn)
+    hist_cols = set(get_table_columns(conn, "records_history"))
+    # Timestamps are recorded per change; which file inserted the record is only known from records_current
+    from_history = [c for c in current_cols if c in hist_cols and c not in ("NOP", "ingest_timestamp", "source_file")]
+
+    def column(c):
+        if c == "NOP":
+            return 'b.nop AS "NOP"'
+        if c == "ingest_timestamp":
+            return 'b.ingest_timestamp AS "ingest_timestamp"'
+        if c in from_history:
+            return f"CASE WHEN b.hist_id IS NULL THEN c.{_quote(c)} ELSE h.{_quote(c)} END AS {_quote(c)}"
+        return f"c.{_quote(c)}"
+
+    select = ", ".join(column(c) for c in current_cols)
+    # A deleted record's last history row is the one rollback_batch wrote when deleting it
+    deleted_ingest = "d.ingest_timestamp" if "ingest_timestamp" in hist_cols else "NULL"
+    first_after = """(SELECT h.id FROM records_history h WHERE h."NOP" = {nop} AND h.changed_timestamp > ?
+                      ORDER BY h.changed_timestamp, h.id LIMIT 1)"""
+    conn.execute("DROP TABLE IF EXISTS temp.as_of_base")
+    conn.execute(
+        f"""CREATE TEMP TABLE as_of_base AS
+            SELECT nop, hist_id, ingest_timestamp,
+                   (SELECT changed_timestamp FROM records_history WHERE id = hist_id) AS hist_ts FROM (
+                SELECT c."NOP" AS nop, {first_after.format(nop='c."NOP"')} AS hist_id, c.ingest_timestamp
+                FROM records_current c WHERE c.ingest_timestamp <= ?
+                UNION ALL
+                SELECT d."NOP", {first_after.format(nop='d."NOP"')}, {deleted_ingest}
+                FROM records_history d
+                WHERE d.id IN (SELECT MAX(id) FROM records_history WHERE changed_timestamp > ? GROUP BY "NOP")
+                  AND NOT EXISTS (SELECT 1 FROM records_current c WHERE c."NOP" = d."NOP")
+                  AND ({deleted_ingest} IS NULL OR {deleted_ingest} <= ?))""",
+        (cutoff, cutoff, cutoff, cutoff, cutoff),
+    )
+    try:
+        df = pd.read_sql_query(
+            f"""SELECT {select} FROM as_of_base b LEFT JOIN records_current c ON c."NOP" = b.nop
+                LEFT JOIN records_history h ON h.id = b.hist_id""",
+            conn,
+        )
+        deltas = pd.read_sql_query(
+            """SELECT rc."NOP" AS nop, rc.field, rc.old_value FROM as_of_base b
+               JOIN records_changes rc ON rc."NOP" = b.nop AND rc.changed_timestamp > ?
+                    AND rc.changed_timestamp < COALESCE(b.hist_ts, '9999')
+               ORDER BY rc.changed_timestamp, rc.id""",
+            conn,
+            params=(cutoff,),
+        )
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.as_of_base")
+    if not deltas.empty and not df.empty:
+        deltas = deltas[deltas["field"].isin(df.columns)].drop_duplicates(["nop", "field"], keep="first")
+        df = df.set_index("NOP", drop=False)
+        for field, group in deltas.groupby("field"):
+            df.loc[group["nop"], field] = group["old_value"].to_numpy()
+        df = df.reset_index(drop=True)
+    df.attrs["as_of"] = cutoff
+    return df
+
+
+def get_retention_horizon(conn: sqlite3.Connection) -> Optional[str]:
+    """Newest change whose record state compact_history discarded; as_of cannot go back past it."""
+    if not get_table_columns(conn, "retention_horizon"):
+        return None
+    row = conn.execute("SELECT horizon FROM retention_horizon WHERE id = 1").fetchone()
+    return row[0] if row else None
+
+
+def _raise_retention_horizon(conn: sqlite3.Connection, timestamp: Optional[str]):
+    if not timestamp:
+        return
+    conn.execute("CREATE TABLE IF NOT EXISTS retention_horizon (id INTEGER PRIMARY KEY CHECK (id = 1), horizon TEXT NOT NULL)")
+    conn.execute(
+        """INSERT INTO retention_horizon (id, horizon) VALUES (1, ?)
+           ON CONFLICT (id) DO UPDATE SET horizon = MAX(horizon, excluded.horizon)""",
+        (timestamp,),
+    )
+
+
+def retention_policy() -> Dict:
+    """compact_history arguments from the PIPELINE_* retention settings."""
+    return {
+        "keep_versions": HISTORY_KEEP_VERSIONS,
+        "max_age_days": HISTORY_MAX_AGE_DAYS,
+        "checkpoint_days": HISTORY_CHECKPOINT_DAYS,
+        "store_deltas": HISTORY_STORE_DELTAS,
+        "changes_max_age_days": CHANGES_MAX_AGE_DAYS,
+        "change_log_max_age_days": CHANGE_LOG_MAX_AGE_DAYS,
+    }
+
+
+def retention_enabled(policy: Dict) -> bool:
+    return any(policy.get(k) for k in ("keep_versions", "max_age_days", "changes_max_age_days", "change_log_max_age_days"))
+
+
+def _cutoff(days: float) -> str:
+    return (datetime.utcnow() - timedelta(days=days)).isoformat()
+
+
+def compact_history(conn: sqlite3.Connection, keep_versions: int = 0, max_age_days: float = 0,
+                    store_deltas: bool = True, changes_max_age_days: float = 0, change_log_max_age_days: float = 0,
+                    checkpoint_days: float = 0, batch_size: int = COMPACT_BATCH_ROWS,
+                    max_seconds: Optional[float] = None, page_size: int = COMPACT_PAGE_NOPS,
+                    start_after: Optional[str] = None) -> Dict:
+    """
+    Apply the history retention policy, batch_size rows per transaction:
+    - records_history keeps the newest keep_versions rows per NOP and/or the rows younger than
+      max_age_days. With checkpoint_days, the oldest row per NOP in every period of that many days
+      survives the keep_versions rule, which bounds the deltas as_of has to replay.
+      With store_deltas, a row is first turned into field-level deltas in
+      records_changes (old value -> value of the next version), unless that sync already wrote them.
+    - records_changes and change_log entries older than their max age are deleted (the newest
+      change_log entry is always kept so the sequence survives).
+    Freed pages are returned to the file system with PRAGMA incremental_vacuum after every batch.
+    History is handled page_size NOPs at a time, in NOP order, and the time budget is checked
+    between batches, so a call never has to rank the whole table first.
+    Stops early once max_seconds have passed; `done` is False when work is left for the next call,
+    which can pick up the history pages at `resume_after` via start_after.
+    """
+    started = time.monotonic()
+    stats = {"history_compacted": 0, "deltas_written": 0, "changes_deleted": 0, "change_log_deleted": 0,
+             "pages_freed": 0, "done": True, "resume_after": None}
+
+    def out_of_time():
+        if max_seconds is not None and time.monotonic() - started >= max_seconds:
+            stats["done"] = False
+            return True
+        return False
+
+    def vacuum_step():
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        conn.execute("PRAGMA incremental_vacuum").fetchall()
+        stats["pages_freed"] += before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    hist_cols = get_table_columns(conn, "records_history")
+    if hist_cols and (keep_versions or max_age_days):
+        ensure_history_indexes(conn)
+        ensure_changes_table(conn)
+        conditions, params = [], []
+        if keep_versions:
+            conditions.append("(version > ? AND in_period > 1)" if checkpoint_days else "version > ?")
+            params.append(int(keep_versions))
+        if max_age_days:
+            conditions.append("changed_timestamp < ?")
+            params.append(_cutoff(max_age_days))
+        # Periods are derived from the timestamp, so the same checkpoints survive every later run
+        period = f"CAST(julianday(changed_timestamp) / {float(checkpoint_days or 1)} AS INTEGER)"
+        doomed_sql = f"""CREATE TEMP TABLE compact_doomed AS SELECT id FROM (
+                             SELECT id, changed_timestamp,
+                                    ROW_NUMBER() OVER (PARTITION BY "NOP" ORDER BY id DESC) AS version,
+                                    ROW_NUMBER() OVER (PARTITION BY "NOP", {period} ORDER BY id) AS in_period
+                             FROM records_history WHERE "NOP" IN (SELECT nop FROM compact_page))
+                         WHERE {" OR ".join(conditions)} ORDER BY id"""
+        current_cols = set(get_table_columns(conn, "records_current"))
+        data_cols = [c for c in hist_cols if c not in ("id", "NOP", "row_hash", "change_type", "changed_timestamp", "source_file",
+                                                       "ingest_timestamp")]
+        delta_sql = " UNION ALL ".join(
+            f"""SELECT h."NOP", '{c.replace("'", "''")}', h.{_quote(c)},
+                       CASE WHEN b.next_id IS NULL THEN {"c." + _quote(c) if c in current_cols else "NULL"} ELSE n.{_quote(c)} END,
+                       h.changed_timestamp, h.source_file
+                FROM compact_batch b JOIN records_history h ON h.id = b.id
+                LEFT JOIN records_history n ON n.id = b.next_id
+                LEFT JOIN records_current c ON c."NOP" = b.nop
+                WHERE b.covered = 0 AND h.{_quote(c)} IS NOT
+                      (CASE WHEN b.next_id IS NULL THEN {"c." + _quote(c) if c in current_cols else "NULL"} ELSE n.{_quote(c)} END)"""
+            for c in data_cols
+        )
+        # Versions are ranked per NOP, so history is paged by NOP (via the "NOP" index) instead of
+        # being ranked as a whole: a page costs the same however long the history has grown
+        page_start = start_after or ""
+        while not out_of_time():
+            conn.execute("DROP TABLE IF EXISTS temp.compact_page")
+            conn.execute(
+                'CREATE TEMP TABLE compact_page AS SELECT DISTINCT "NOP" AS nop FROM records_history '
+                'WHERE "NOP" > ? ORDER BY "NOP" LIMIT ?',
+                (page_start, page_size),
+            )
+            page_end = conn.execute("SELECT MAX(nop) FROM compact_page").fetchone()[0]
+            if page_end is None:
+                break
+            conn.execute("DROP TABLE IF EXISTS temp.compact_doomed")
+            conn.execute(doomed_sql, params)
+            last_id = 0
+            while not out_of_time():
+                conn.execute("DROP TABLE IF EXISTS temp.compact_batch")
+                conn.execute(
+                    """CREATE TEMP TABLE compact_batch AS
+                       SELECT h.id, h."NOP" AS nop,
+                              (SELECT MIN(n.id) FROM records_history n WHERE n."NOP" = h."NOP" AND n.id > h.id) AS next_id,
+                              EXISTS (SELECT 1 FROM records_changes rc
+                                      WHERE rc."NOP" = h."NOP" AND rc.changed_timestamp = h.changed_timestamp) AS covered
+                       FROM compact_doomed d JOIN records_history h ON h.id = d.id
+                       WHERE d.id > ? ORDER BY d.id LIMIT ?""",
+                    (last_id, batch_size),
+                )
+                batch = conn.execute("SELECT COUNT(*), MAX(id) FROM compact_batch").fetchone()
+                if not batch[0]:
+                    # Page finished; an unfinished one is ranked again by the next call
+                    page_start = page_end
+                    break
+                last_id = batch[1]
+                if store_deltas and delta_sql:
+                    stats["deltas_written"] += conn.execute(
+                        f"""INSERT INTO records_changes ("NOP", field, old_value, new_value, changed_timestamp, source_file)
+                            {delta_sql}"""
+                    ).rowcount
+                elif not store_deltas:
+                    _raise_retention_horizon(conn, conn.execute(
+                        "SELECT MAX(h.changed_timestamp) FROM compact_batch b JOIN records_history h ON h.id = b.id").fetchone()[0])
+                stats["history_compacted"] += conn.execute(
+                    "DELETE FROM records_history WHERE id IN (SELECT id FROM compact_batch)"
+                ).rowcount
+                conn.commit()
+                vacuum_step()
+        if not stats["done"]:
+            stats["resume_after"] = page_start
+        for table in ("compact_batch", "compact_doomed", "compact_page"):
+            conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+
+    for table, key, days, stat, keep_latest in (
+        ("records_changes", "id", changes_max_age_days, "changes_deleted", False),
+        ("change_log", "seq", change_log_max_age_days, "change_log_deleted", True),
+    ):
+        if not days or not get_table_columns(conn, table):
+            continue
+        cutoff = _cutoff(days)
+        keep = f" AND {key} < (SELECT MAX({key}) FROM {table})" if keep_latest else ""
+        while not out_of_time():
+            # Entries are appended in time order, so the oldest ones are found at the start of the table
+            oldest = f"SELECT {key} FROM {table} WHERE changed_timestamp < ?{keep} ORDER BY {key} LIMIT ?"
+            if table == "records_changes":
+                # Deltas are the only copy of compacted history: as_of cannot rebuild anything before them
+                _raise_retention_horizon(conn, conn.execute(
+                    f"SELECT MAX(changed_timestamp) FROM {table} WHERE {key} IN ({oldest})", (cutoff, batch_size)).fetchone()[0])
+            deleted = conn.execute(f"DELETE FROM {table} WHERE {key} IN ({oldest})", (cutoff, batch_size)).rowcount
+            conn.commit()
+            stats[stat] += deleted
+            if deleted:
+                vacuum_step()
+            if deleted < batch_size:
+                break
+
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2 and (stats["history_compacted"] or stats["changes_deleted"]):
+        logging.info("History compaction: database is not in incremental auto_vacuum mode; "
+                     "run `python process_export.py --compact --vacuum` once to reclaim the freed space")
+    logging.info(f"History compaction: {stats}")
+    return stats
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection):
+    """Switch an existing database to auto_vacuum=INCREMENTAL (a full VACUUM, run once)."""
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+
+
 def upsert_records(conn: sqlite3.Connection, df_new: pd.DataFrame, source_file: str) -> Tuple[int, int, int]:
     # Reuse detect_and_sync_changes for consistency
     summary = detect_and_sync_changes(conn, df_new, source_file)
@@ -348,29 +1374,286 @@ def export_merged_snapshot(conn: sqlite3.Connection, out_path: str):
     # Only keep visible columns
     df = df[cols_to_use]
     
-    df.to_excel(out_path, index=False, engine="openpyxl")
-    logging.info(f"Merged snapshot exported: {out_path} (rows={len(df)})")
+    started = time.perf_counter()
+    with metrics.timer("snapshot_write"):
+        df.to_excel(out_path, index=False, engine="openpyxl")
+    logging.info(f"Merged snapshot exported: {out_path} (rows={len(df)}, {time.perf_counter() - started:.2f}s)")
 
 
-def process(path: str):
-    setup_logging()
-    logging.info(f"Starting ingestion for file: {path}")
+def load_export(path: str) -> pd.DataFrame:
+    """Parse, normalise and validate one export file. Safe to run in a worker process."""
     df = read_export_file(path)
     ok, missing = validate_schema(df)
     if not ok:
-        logging.error(f"Missing required columns: {missing}")
+        logging.error(f"Missing required columns in {path}: {missing}")
         raise ValueError(f"Missing required columns: {missing}")
+    return df
+
+
+def _load_export_timed(path: str) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """Worker-process entry point: parse an export and return it with its stage timings."""
+    with metrics.collect() as timings:
+        df = load_export(path)
+    return df, timings
+
+
+def ingest_frame(conn: sqlite3.Connection, df: pd.DataFrame, path: str, file_hash: str, started: float,
+                 parse_timings: Optional[Dict[str, float]] = None) -> Dict:
+    """Apply a parsed export through the sync engine and record it in the ingest_runs ledger."""
+    with metrics.collect() as sync_timings:
+        ensure_schema(conn, list(df.columns))
+        summary = detect_and_sync_changes(conn, df, source_file=path)
+    summary["timings"] = {**(parse_timings or {}), **sync_timings}
+    duration = time.perf_counter() - started
+    record_ingest_run(conn, file_hash, path, row_count=len(df), summary=summary, duration_seconds=duration)
+    logging.info(f"Ingestion summary for {path}: new={summary['new_records']}, updated={summary['updated_records']}, "
+                 f"unchanged={summary['unchanged_records']} ({len(df)} rows in {duration:.2f}s; "
+                 f"{metrics.format_timings(summary['timings'])})")
+    result = {"file": path, "file_hash": file_hash, "row_count": len(df), "duration_seconds": duration}
+    result.update(summarize_sync(summary))
+    return result
+
+
+def process(path: str, force: bool = False) -> Dict:
+    setup_logging()
+    logging.info(f"Starting ingestion for file: {path}")
+    started = time.perf_counter()
+    source_file = os.path.abspath(path)
+    file_hash = compute_file_hash(source_file)
     conn = connect_db()
-    ensure_schema(conn, list(df.columns))
-    new_count, updated_count, unchanged_count = upsert_records(conn, df, source_file=os.path.abspath(path))
-    logging.info(f"Ingestion summary: new={new_count}, updated={updated_count}, unchanged={unchanged_count}")
-    out_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "merged_current.xlsx")
-    export_merged_snapshot(conn, out_file)
+    try:
+        if not force and is_file_ingested(conn, file_hash):
+            logging.info(f"File content already ingested, skipping (use --force to re-ingest): {path}")
+            return {"file": source_file, "file_hash": file_hash, "skipped": True}
+        with metrics.collect() as parse_timings:
+            df = load_export(path)
+        result = ingest_frame(conn, df, source_file, file_hash, started, parse_timings)
+        export_merged_snapshot(conn, SNAPSHOT_FILE)
+    finally:
+        conn.close()
     logging.info("Processing finished successfully")
+    return result
+
+
+def expand_export_paths(targets: List[str]) -> List[str]:
+    """
+    Resolve files, directories and glob patterns into a sorted, de-duplicated list of export files.
+    Excel lock files (~$name.xlsx) are ignored.
+    """
+    found = set()
+    for target in targets:
+        if os.path.isdir(target):
+            candidates = [os.path.join(target, name) for name in os.listdir(target)]
+        elif glob.has_magic(target):
+            candidates = glob.glob(target)
+        else:
+            candidates = [target]
+        for path in candidates:
+            name = os.path.basename(path)
+            if name.startswith("~$") or os.path.splitext(name)[1].lower() not in EXPORT_EXTENSIONS:
+                continue
+            if os.path.isfile(path):
+                found.add(os.path.abspath(path))
+    return sorted(found)
+
+
+def process_batch(targets: List[str], workers: Optional[int] = None, force: bool = False) -> List[Dict]:
+    """
+    Ingest many export files at once.
+    Files are parsed and normalised in parallel on a process pool, then applied to SQLite
+    one by one in sorted path order by this (single writer) process. Files whose content hash
+    is already in the ingest_runs ledger are skipped before parsing unless `force` is set.
+    The merged snapshot is written once at the end.
+    """
+    setup_logging()
+    paths = expand_export_paths(targets)
+    if not paths:
+        raise FileNotFoundError(f"No export files found in: {targets}")
+    logging.info(f"Starting batch ingestion of {len(paths)} files with workers={workers or 'auto'}")
+
+    results = []
+    conn = connect_db()
+    try:
+        hashes = {path: compute_file_hash(path) for path in paths}
+        todo = [p for p in paths if force or not is_file_ingested(conn, hashes[p])]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {path: pool.submit(_load_export_timed, path) for path in todo}
+            for path in paths:
+                if path not in futures:
+                    logging.info(f"Batch ingestion: skipping already ingested file {path}")
+                    results.append({"file": path, "file_hash": hashes[path], "skipped": True})
+                    continue
+                started = time.perf_counter()
+                try:
+                    df, parse_timings = futures[path].result()
+                except Exception as e:
+                    logging.error(f"Batch ingestion: failed to parse {path}: {e}")
+                    results.append({"file": path, "file_hash": hashes[path], "error": str(e)})
+                    continue
+                metrics.record_timings(parse_timings)
+                results.append(ingest_frame(conn, df, path, hashes[path], started, parse_timings))
+        if any("new_records" in r for r in results):
+            export_merged_snapshot(conn, SNAPSHOT_FILE)
+    finally:
+        conn.close()
+    failed = sum(1 for r in results if "error" in r)
+    skipped = sum(1 for r in results if r.get("skipped"))
+    logging.info(f"Batch ingestion finished: {len(results) - failed - skipped} ingested, {skipped} skipped, {failed} failed")
+    return results
+
+
+def ingest_ready_files(conn: sqlite3.Connection, paths: List[str]) -> List[Dict]:
+    """
+    Ingest settled files through the sync engine, skipping any whose content hash is already in
+    the ingest_runs ledger. Returns one result per path; the snapshot is refreshed once if anything changed.
+    """
+    results = []
+    for path in paths:
+        started = time.perf_counter()
+        try:
+            file_hash = compute_file_hash(path)
+            if is_file_ingested(conn, file_hash):
+                logging.info(f"Watcher: skipping already ingested file {path}")
+                results.append({"file": path, "file_hash": file_hash, "skipped": True})
+                continue
+            with metrics.collect() as parse_timings:
+                df = load_export(path)
+            results.append(ingest_frame(conn, df, path, file_hash, started, parse_timings))
+        except Exception as e:
+            logging.error(f"Watcher: failed to ingest {path}: {e}")
+            results.append({"file": path, "error": str(e)})
+    if any("new_records" in r for r in results):
+        export_merged_snapshot(conn, SNAPSHOT_FILE)
+    return results
+
+
+def watch_folder(directory: str, interval: float = WATCH_INTERVAL_SECONDS,
+                 settle_seconds: float = WATCH_SETTLE_SECONDS, max_cycles: Optional[int] = None,
+                 retention: Optional[Dict] = None, compact_interval: float = COMPACT_INTERVAL_SECONDS,
+                 retry_seconds: float = WATCH_RETRY_SECONDS):
+    """
+    Poll a drop directory and ingest new export files as they appear.
+    A file is only picked up once its size and mtime have been unchanged for `settle_seconds`,
+    so exports that are still being copied or written are not read half-way. Files already
+    handled (same size/mtime) are not re-hashed; the ingest_runs ledger guarantees that the
+    same content is never ingested twice, even across restarts.
+    A file that fails to ingest (locked, database busy, bad content) stays pending and is retried
+    after `retry_seconds`, doubling per failure up to WATCH_RETRY_MAX_SECONDS; a new version of
+    the file starts over.
+    When a retention policy is configured (see retention_policy), history is compacted every
+    `compact_interval` seconds in slices of COMPACT_BUDGET_SECONDS between polls.
+    """
+    if retention is None:
+        retention = retention_policy()
+    setup_logging()
+    if not os.path.isdir(directory):
+        raise NotADirectoryError(f"Watch directory not found: {directory}")
+    logging.info(f"Watching {directory} (interval={interval}s, settle={settle_seconds}s)")
+
+    pending: Dict[str, Tuple[int, int, float]] = {}
+    handled: Dict[str, Tuple[int, int]] = {}
+    # path -> (failed attempts, monotonic time of the next attempt)
+    retries: Dict[str, Tuple[int, float]] = {}
+    cycles = 0
+    next_compaction = time.monotonic() if retention_enabled(retention) else None
+    compact_resume = None
+    conn = connect_db()
+    try:
+        while max_cycles is None or cycles < max_cycles:
+            cycles += 1
+            now = time.monotonic()
+            ready = []
+            for path in expand_export_paths([directory]):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                sig = (st.st_size, st.st_mtime_ns)
+                if handled.get(path) == sig:
+                    continue
+                seen = pending.get(path)
+                if seen is None or seen[:2] != sig:
+                    pending[path] = (sig[0], sig[1], now)
+                    retries.pop(path, None)
+                elif now - seen[2] >= settle_seconds and now >= retries.get(path, (0, now))[1]:
+                    ready.append(path)
+            if ready:
+                for result in ingest_ready_files(conn, ready):
+                    path = result["file"]
+                    if "error" in result:
+                        attempts = retries.get(path, (0, now))[0] + 1
+                        delay = min(retry_seconds * 2 ** (attempts - 1), WATCH_RETRY_MAX_SECONDS)
+                        retries[path] = (attempts, now + delay)
+                        logging.warning(f"Watcher: attempt {attempts} for {path} failed, retrying in {delay:.0f}s")
+                        continue
+                    retries.pop(path, None)
+                    handled[path] = pending.pop(path)[:2]
+            elif next_compaction is not None and now >= next_compaction:
+                stats = compact_history(conn, max_seconds=COMPACT_BUDGET_SECONDS, start_after=compact_resume, **retention)
+                # Unfinished work continues on the next idle poll, from the history page it stopped at
+                compact_resume = stats["resume_after"]
+                next_compaction = now if not stats["done"] else now + compact_interval
+            if max_cycles is not None and cycles >= max_cycles:
+                break
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        logging.info("Watcher stopped")
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None):
+    global SYNC_MODE
+    parser = argparse.ArgumentParser(description="Ingest export files into the SQLite pipeline and refresh the merged snapshot.")
+    parser.add_argument("paths", nargs="*", help="Export file(s) (.xlsx|.xls|.csv), directories or glob patterns")
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes for batch mode (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Re-ingest files even if their content hash is in the ledger")
+    parser.add_argument("--watch", metavar="DIR", help="Keep running and ingest new files dropped into DIR")
+    parser.add_argument("--interval", type=float, default=WATCH_INTERVAL_SECONDS, help="Watch polling interval in seconds")
+    parser.add_argument("--settle", type=float, default=WATCH_SETTLE_SECONDS,
+                        help="Seconds a file must stay unchanged before it is ingested")
+    parser.add_argument("--sync-mode", choices=SYNC_MODES, default=None,
+                        help=f"Diff engine: in-memory pandas or set-based SQL (default: {SYNC_MODE}, env PIPELINE_SYNC_MODE)")
+    parser.add_argument("--compact", action="store_true", help="Apply the history retention policy and exit")
+    parser.add_argument("--keep-versions", type=int, default=None,
+                        help="Keep this many history rows per NOP (env PIPELINE_HISTORY_KEEP_VERSIONS, 0 = all)")
+    parser.add_argument("--max-age-days", type=float, default=None,
+                        help="Compact history older than this many days (env PIPELINE_HISTORY_MAX_AGE_DAYS, 0 = never)")
+    parser.add_argument("--no-deltas", action="store_true", help="Drop compacted history rows without keeping field deltas")
+    parser.add_argument("--vacuum", action="store_true",
+                        help="With --compact: switch the database to incremental auto_vacuum first (one full VACUUM)")
+    args = parser.parse_args(argv)
+
+    if args.sync_mode:
+        SYNC_MODE = args.sync_mode
+    retention = retention_policy()
+    if args.keep_versions is not None:
+        retention["keep_versions"] = args.keep_versions
+    if args.max_age_days is not None:
+        retention["max_age_days"] = args.max_age_days
+    if args.no_deltas:
+        retention["store_deltas"] = False
+
+    if args.compact:
+        setup_logging()
+        conn = connect_db()
+        try:
+            if args.vacuum:
+                enable_incremental_vacuum(conn)
+            compact_history(conn, **retention)
+        finally:
+            conn.close()
+    elif args.watch:
+        watch_folder(args.watch, interval=args.interval, settle_seconds=args.settle, retention=retention)
+    elif not args.paths:
+        parser.error("provide export file(s) or --watch DIR")
+    elif len(args.paths) == 1 and os.path.isfile(args.paths[0]):
+        process(args.paths[0], force=args.force)
+    else:
+        results = process_batch(args.paths, workers=args.workers, force=args.force)
+        if any("error" in r for r in results):
+            sys.exit(1)
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python process_export.py <path_to_export_file.xlsx|.csv>")
-        sys.exit(1)
-    process(sys.argv[1])
+    main()
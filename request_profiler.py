@@ -0,0 +1,161 @@
+"""
+Opt-in cProfile hook for dashboard requests.
+
+Nothing is registered unless install_profiler() is called (web_app does this only when
+DASHBOARD_PROFILE_DIR is set), so there is no per-request cost when profiling is off.
+
+Once installed, a request is profiled when
+- an admin sends the header "X-Profile: 1" or the query flag "?_profile=1", or
+- it is picked by random sampling (sample_rate, 0.0-1.0).
+Sampled profiles faster than slow_ms are discarded; explicit ones are always kept.
+
+Each profile is saved as <name>.prof (pstats format, e.g. for snakeviz) with a <name>.json
+sidecar, and only the newest `keep` profiles are retained. /admin/profiles lists them,
+slowest first.
+"""
+import os
+import io
+import json
+import time
+import random
+import pstats
+import cProfile
+from datetime import datetime
+
+from flask import request, g, jsonify, send_file, render_template_string, abort
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_QUERY_ARG = "_profile"
+DEFAULT_KEEP = 200
+
+PROFILES_TEMPLATE = """
+<!doctype html>
+<html lang="id">
+<head>
+    <meta charset="utf-8">
+    <title>Request Profiles</title>
+    <style>
+        body { font-family: system-ui, sans-serif; background: #020617; color: #e2e8f0; padding: 24px; }
+        table { border-collapse: collapse; width: 100%; font-size: 14px; }
+        th, td { padding: 6px 10px; border-bottom: 1px solid #1e293b; text-align: left; }
+        a { color: #38bdf8; }
+        .num { text-align: right; font-variant-numeric: tabular-nums; }
+    </style>
+</head>
+<body>
+    <h2>Request Profiles ({{ profiles|length }})</h2>
+    <table>
+        <thead><tr><th>Waktu (UTC)</th><th>Method</th><th>Path</th><th class="num">Durasi (ms)</th><th>Status</th><th>Trigger</th><th></th></tr></thead>
+        <tbody>
+        {% for p in profiles %}
+            <tr>
+                <td>{{ p.timestamp }}</td>
+                <td>{{ p.method }}</td>
+                <td>{{ p.path }}</td>
+                <td class="num">{{ "%.1f"|format(p.duration_ms) }}</td>
+                <td>{{ p.status }}</td>
+                <td>{{ p.trigger }}</td>
+                <td><a href="{{ p.name }}">stats</a> · <a href="{{ p.name }}?download=1">.prof</a></td>
+            </tr>
+        {% else %}
+            <tr><td colspan="7">Belum ada profile.</td></tr>
+        {% endfor %}
+        </tbody>
+    </table>
+</body>
+</html>
+"""
+
+
+def list_profiles(profile_dir):
+    profiles = []
+    for name in os.listdir(profile_dir):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(profile_dir, name), "r", encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return profiles
+
+
+def _prune(profile_dir, keep):
+    names = sorted(n[:-5] for n in os.listdir(profile_dir) if n.endswith(".json"))
+    for name in names[:-keep] if len(names) > keep else []:
+        for ext in (".json", ".prof"):
+            try:
+                os.remove(os.path.join(profile_dir, name + ext))
+            except OSError:
+                pass
+
+
+def install_profiler(app, profile_dir, sample_rate=0.0, slow_ms=0.0, keep=DEFAULT_KEEP,
+                     is_admin=lambda: False, view_decorator=lambda view: view):
+    os.makedirs(profile_dir, exist_ok=True)
+
+    @app.before_request
+    def start_profile():
+        explicit = request.headers.get(PROFILE_HEADER) == "1" or request.args.get(PROFILE_QUERY_ARG) == "1"
+        if explicit and not is_admin():
+            explicit = False
+        if not explicit and not (sample_rate > 0 and random.random() < sample_rate):
+            return None
+        profiler = cProfile.Profile()
+        g.profile_request = (profiler, time.perf_counter(), "explicit" if explicit else "sampled")
+        profiler.enable()
+        return None
+
+    @app.after_request
+    def stop_profile(response):
+        state = g.pop("profile_request", None)
+        if state is None:
+            return response
+        profiler, started, trigger = state
+        profiler.disable()
+        duration_ms = (time.perf_counter() - started) * 1000
+        if trigger == "sampled" and duration_ms < slow_ms:
+            return response
+        now = datetime.utcnow()
+        name = f"{now.strftime('%Y%m%dT%H%M%S%f')}_{request.endpoint or 'unknown'}"
+        try:
+            profiler.dump_stats(os.path.join(profile_dir, name + ".prof"))
+            meta = {
+                "name": name,
+                "timestamp": now.isoformat(timespec="seconds"),
+                "method": request.method,
+                "path": request.full_path.rstrip("?"),
+                "endpoint": request.endpoint,
+                "status": response.status_code,
+                "duration_ms": duration_ms,
+                "trigger": trigger,
+            }
+            with open(os.path.join(profile_dir, name + ".json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            _prune(profile_dir, keep)
+            response.headers["X-Profile-Id"] = name
+        except OSError as e:
+            print(f"[web_app] Could not save request profile: {e}", flush=True)
+        return response
+
+    def profiles_index():
+        if not is_admin():
+            return jsonify({"error": "Not allowed"}), 403
+        profiles = sorted(list_profiles(profile_dir), key=lambda p: p.get("duration_ms", 0), reverse=True)
+        return render_template_string(PROFILES_TEMPLATE, profiles=profiles)
+
+    def profile_detail(name):
+        if not is_admin():
+            return jsonify({"error": "Not allowed"}), 403
+        path = os.path.join(profile_dir, os.path.basename(name) + ".prof")
+        if not os.path.exists(path):
+            abort(404)
+        if request.args.get("download") == "1":
+            return send_file(path, as_attachment=True, download_name=os.path.basename(path))
+        out = io.StringIO()
+        stats = pstats.Stats(path, stream=out)
+        stats.sort_stats("cumulative").print_stats(40)
+        return app.response_class(out.getvalue(), mimetype="text/plain")
+
+    app.add_url_rule("/admin/profiles/", "profiles_index", view_decorator(profiles_index))
+    app.add_url_rule("/admin/profiles/<name>", "profile_detail", view_decorator(profile_detail))
@@ -0,0 +1,102 @@
+"""
+Accept-Encoding negotiated response compression for the dashboard.
+
+install_compression(app) registers an after_request hook that compresses text-like
+responses (JSON, CSV, HTML, ...) with brotli (when the optional `brotli` package is
+installed and the client accepts it) or gzip.
+- Buffered responses are only compressed when they are at least `min_size` bytes.
+- Streamed responses are compressed chunk by chunk while they are sent.
+- Binary formats (xlsx, parquet, arrow) and Server-Sent Events are left alone.
+Compressed responses get a weak ETag and "Vary: Accept-Encoding".
+"""
+import zlib
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_BROTLI_QUALITY = 4
+COMPRESSIBLE_PREFIXES = ("text/", "application/json", "application/javascript", "image/svg+xml")
+SKIP_MIMETYPES = ("text/event-stream",)
+
+
+class _Compressor:
+    def __init__(self, encoding, gzip_level, brotli_quality):
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=brotli_quality)
+            self._compress = self._obj.process
+            self._flush = self._obj.finish
+        else:
+            # wbits=31 -> gzip container
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+            self._compress = self._obj.compress
+            self._flush = self._obj.flush
+
+    def compress(self, data):
+        return self._compress(data)
+
+    def flush(self):
+        return self._flush()
+
+
+def choose_encoding(accept_encodings):
+    if brotli is not None and accept_encodings["br"]:
+        return "br"
+    if accept_encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def _compress_stream(chunks, compressor):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            out = compressor.compress(chunk)
+            if out:
+                yield out
+        yield compressor.flush()
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+
+
+def install_compression(app, min_size=DEFAULT_MIN_SIZE, gzip_level=DEFAULT_GZIP_LEVEL,
+                        brotli_quality=DEFAULT_BROTLI_QUALITY):
+
+    @app.after_request
+    def compress_response(response):
+        if request.method == "HEAD" or response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if "Content-Encoding" in response.headers:
+            return response
+        mimetype = response.mimetype or ""
+        if mimetype in SKIP_MIMETYPES or not mimetype.startswith(COMPRESSIBLE_PREFIXES):
+            return response
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        compressor = _Compressor(encoding, gzip_level, brotli_quality)
+        if response.is_streamed:
+            response.direct_passthrough = False
+            response.response = _compress_stream(response.response, compressor)
+            response.headers.pop("Content-Length", None)
+        else:
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            response.set_data(compressor.compress(data) + compressor.flush())
+
+        response.headers["Content-Encoding"] = encoding
+        response.vary.add("Accept-Encoding")
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
@@ -8,7 +8,7 @@ import os
 # Add the current directory to Python path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from excel_importer import ExcelImporterApp
+from excel_importer import ExcelImporterApp, profile_dataframe
 
 class TestExcelImporter(unittest.TestCase):
     
@@ -176,5 +176,34 @@ class TestExcelImporter(unittest.TestCase):
         app.sort_treeview('Usia')
         self.assertEqual(app.current_sort_order, 'asc', "Third sort should be ascending again")
 
+    def test_profile_dataframe(self):
+        """Test chunked profiling matches per-column pandas statistics"""
+        data = self.test_data_with_nan.copy()
+        data['Campur'] = ['a', 1, 'b', None, 2.5]
+        progress = []
+        profile = profile_dataframe(data, chunk_size=2, progress_callback=lambda done, total: progress.append(done))
+        
+        self.assertEqual(profile['rows'], 5)
+        self.assertEqual(progress, [2, 4, 5], "Progress should be reported per chunk")
+        self.assertEqual(profile['columns']['Usia']['missing'], 1)
+        self.assertEqual(profile['columns']['Kota']['missing'], 1)
+        self.assertAlmostEqual(profile['columns']['Usia']['mean'], data['Usia'].mean())
+        self.assertEqual(profile['columns']['Gaji']['min'], data['Gaji'].min())
+        self.assertEqual(profile['columns']['Gaji']['max'], data['Gaji'].max())
+        self.assertFalse(profile['columns']['Kota']['mixed'], "NaN in a text column is not a type mix")
+        self.assertTrue(profile['columns']['Campur']['mixed'], "Mixed data types not detected")
+
+    def test_profile_dataframe_categorical(self):
+        """Categorical columns are checked for mixed types through their categories"""
+        data = pd.DataFrame({
+            'Status': pd.Categorical(['Open', 1, 'Open', 2, None]),
+            'Kota': pd.Categorical(['Jakarta', 'Bandung', 'Jakarta', None, 'Bandung']),
+        })
+        profile = profile_dataframe(data, chunk_size=2)
+        self.assertTrue(profile['columns']['Status']['mixed'], "Mixed categories not detected")
+        self.assertFalse(profile['columns']['Kota']['mixed'])
+        self.assertEqual(profile['columns']['Kota']['inferred'], ['string'])
+        self.assertEqual(profile['columns']['Status']['missing'], 1)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
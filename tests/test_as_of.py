@@ -0,0 +1,104 @@
+import os
+import sys
+import unittest
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import process_export
+from web_app import app
+
+
+class TestAsOf(unittest.TestCase):
+    def setUp(self):
+        self.db_path = "test_sync.sqlite"
+        self.original_db = process_export.DB_FILE
+        process_export.DB_FILE = self.db_path
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+        self.conn = process_export.connect_db()
+        process_export.ensure_schema(self.conn, ["NOP", "PROGRAM", "KATEGORI"])
+        self.t1 = self.sync({"a": ("1", "x"), "b": ("1", "x")}, "f1.xlsx")["sync_timestamp"]
+        self.t2 = self.sync({"a": ("2", "x"), "c": ("2", "x")}, "f2.xlsx")["sync_timestamp"]
+        self.t3 = self.sync({"a": ("3", "y"), "b": ("3", "x")}, "f3.xlsx")["sync_timestamp"]
+
+    def tearDown(self):
+        self.conn.close()
+        process_export.DB_FILE = self.original_db
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def sync(self, rows, source):
+        df = pd.DataFrame([{"NOP": nop, "PROGRAM": p, "KATEGORI": k} for nop, (p, k) in rows.items()])
+        return process_export.detect_and_sync_changes(self.conn, df, source)
+
+    def state(self, timestamp):
+        df = process_export.as_of(self.conn, timestamp)
+        return {row["NOP"]: (row["PROGRAM"], row["KATEGORI"]) for row in df.to_dict(orient="records")}
+
+    def test_reconstructs_each_point_in_time(self):
+        self.assertEqual(self.state("2000-01-01"), {})
+        self.assertEqual(self.state(self.t1), {"a": ("1", "x"), "b": ("1", "x")})
+        self.assertEqual(self.state(self.t2), {"a": ("2", "x"), "b": ("1", "x"), "c": ("2", "x")})
+        self.assertEqual(self.state(self.t3), {"a": ("3", "y"), "b": ("3", "x"), "c": ("2", "x")})
+        df = process_export.as_of(self.conn, self.t1)
+        self.assertEqual(set(df.loc[df["NOP"] == "a", "source_file"]), {"f1.xlsx"})
+
+    def test_compacted_history_is_replayed_from_deltas(self):
+        expected = {t: self.state(t) for t in (self.t1, self.t2)}
+        process_export.compact_history(self.conn, keep_versions=1)
+        self.conn.execute("DELETE FROM records_changes WHERE changed_timestamp = ?", (self.t3,))
+        self.conn.commit()
+        # t2 -> t3 still has its full row; t1 -> t2 of "a" only survives as a delta
+        self.assertEqual(self.state(self.t1), expected[self.t1])
+        self.assertEqual(self.state(self.t2), expected[self.t2])
+
+    def test_single_record_rollback_keeps_replaced_state(self):
+        self.assertTrue(process_export.rollback_record(self.conn, "a"))
+        self.assertEqual(self.state(self.t3)["a"], ("3", "y"))
+        self.assertEqual(process_export.as_of(self.conn, "9999-01-01").set_index("NOP").loc["a", "PROGRAM"], "2")
+        # Also once the full rows are compacted into deltas
+        process_export.compact_history(self.conn, keep_versions=0, max_age_days=-1)
+        self.assertEqual(self.state(self.t3)["a"], ("3", "y"))
+
+    def test_records_deleted_by_batch_rollback_stay_in_the_past(self):
+        expected = {t: self.state(t) for t in (self.t1, self.t2, self.t3)}
+        result = process_export.rollback_batch(self.conn, source_file="f2.xlsx")
+        self.assertEqual(result["deleted"], 1)
+        self.assertNotIn("c", self.state("9999-01-01"))
+        for t, state in expected.items():
+            self.assertEqual(self.state(t), state)
+        df = process_export.as_of(self.conn, self.t2).set_index("NOP")
+        self.assertEqual(df.loc["c", "ingest_timestamp"], self.t2)
+        # Also once the full rows are compacted into deltas
+        process_export.compact_history(self.conn, keep_versions=1)
+        self.assertEqual(self.state(self.t2), expected[self.t2])
+
+    def test_deleted_deltas_set_a_horizon(self):
+        self.conn.execute("UPDATE records_changes SET changed_timestamp = '2000-01-01T00:00:00' WHERE changed_timestamp = ?", (self.t2,))
+        self.conn.commit()
+        process_export.compact_history(self.conn, changes_max_age_days=1)
+        self.assertEqual(process_export.get_retention_horizon(self.conn), "2000-01-01T00:00:00")
+        with self.assertRaises(ValueError):
+            process_export.as_of(self.conn, "1999-12-31")
+        self.assertEqual(self.state(self.t3)["a"], ("3", "y"))
+
+    def test_endpoint(self):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["logged_in"] = True
+            sess["username"] = "admin"
+        response = client.get(f"/api/data?as_of={self.t1}")
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body["as_of"], self.t1)
+        self.assertEqual(sorted(r["NOP"] for r in body["rows"]), ["a", "b"])
+        self.assertNotIn("source_file", body["columns"])
+        again = client.get(f"/api/data?as_of={self.t1}", headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(client.get("/api/data?as_of=kemarin").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
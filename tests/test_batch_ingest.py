@@ -0,0 +1,157 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import process_export
+
+COLUMNS = [
+    "NOP", "PROGRAM", "KATEGORI", "JUSTIFIKASI", "PROPOSAL", "BUDGET", "REVENUE", "COST", "PROFIT",
+    "INCREMENTAL 1", "INCREMENTAL 2", "INCREMENTAL 3", "STATUS", "PILOT", "DRIVEN PROGRAM",
+    "ASSIGN BY", "APPROVED BY",
+]
+
+
+def write_export(path, rows):
+    df = pd.DataFrame([{c: f"{c.lower()}-{nop}" for c in COLUMNS} for nop in rows])
+    df["NOP"] = [str(nop) for nop in rows]
+    df.to_csv(path, index=False)
+    return df
+
+
+class TestBatchIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.drop_dir = os.path.join(self.tmp_dir, "drop")
+        os.makedirs(self.drop_dir)
+        self.orig_db, self.orig_snapshot = process_export.DB_FILE, process_export.SNAPSHOT_FILE
+        process_export.DB_FILE = os.path.join(self.tmp_dir, "batch.sqlite")
+        process_export.SNAPSHOT_FILE = os.path.join(self.tmp_dir, "merged.xlsx")
+
+    def tearDown(self):
+        process_export.DB_FILE, process_export.SNAPSHOT_FILE = self.orig_db, self.orig_snapshot
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_expand_export_paths(self):
+        write_export(os.path.join(self.drop_dir, "b.csv"), [1])
+        write_export(os.path.join(self.drop_dir, "a.csv"), [2])
+        open(os.path.join(self.drop_dir, "notes.txt"), "w").close()
+        open(os.path.join(self.drop_dir, "~$a.xlsx"), "w").close()
+
+        by_dir = process_export.expand_export_paths([self.drop_dir])
+        by_glob = process_export.expand_export_paths([os.path.join(self.drop_dir, "*.csv")])
+        self.assertEqual([os.path.basename(p) for p in by_dir], ["a.csv", "b.csv"])
+        self.assertEqual(by_dir, by_glob)
+
+    def test_batch_applies_files_in_order(self):
+        write_export(os.path.join(self.drop_dir, "01.csv"), [1, 2])
+        later = write_export(os.path.join(self.drop_dir, "02.csv"), [2, 3])
+        later.loc[later["NOP"] == "2", "STATUS"] = "changed"
+        later.to_csv(os.path.join(self.drop_dir, "02.csv"), index=False)
+
+        results = process_export.process_batch([self.drop_dir], workers=2)
+        self.assertEqual([r["new_records"] for r in results], [2, 1])
+        self.assertEqual(results[1]["updated_records"], 1)
+        self.assertTrue(os.path.exists(process_export.SNAPSHOT_FILE))
+
+        conn = process_export.connect_db()
+        df = process_export.load_current(conn)
+        conn.close()
+        self.assertEqual(sorted(df["NOP"]), ["1", "2", "3"])
+        self.assertEqual(df.loc[df["NOP"] == "2", "STATUS"].iloc[0], "changed")
+
+    def test_batch_reports_invalid_files(self):
+        write_export(os.path.join(self.drop_dir, "ok.csv"), [1])
+        pd.DataFrame({"NOP": ["9"]}).to_csv(os.path.join(self.drop_dir, "bad.csv"), index=False)
+
+        results = process_export.process_batch([self.drop_dir], workers=1)
+        errors = {os.path.basename(r["file"]): r.get("error") for r in results}
+        self.assertIn("Missing required columns", errors["bad.csv"])
+        self.assertIsNone(errors["ok.csv"])
+
+    def test_watch_folder_debounces_and_skips_known_content(self):
+        write_export(os.path.join(self.drop_dir, "01.csv"), [1, 2])
+        # First cycle only records the file; it is ingested once it has settled.
+        process_export.watch_folder(self.drop_dir, interval=0, settle_seconds=0, max_cycles=1)
+        self.assertFalse(os.path.exists(process_export.SNAPSHOT_FILE))
+
+        process_export.watch_folder(self.drop_dir, interval=0, settle_seconds=0, max_cycles=2)
+        self.assertTrue(os.path.exists(process_export.SNAPSHOT_FILE))
+
+        # Same content under another name is recognised by hash and not reprocessed.
+        shutil.copy(os.path.join(self.drop_dir, "01.csv"), os.path.join(self.drop_dir, "copy.csv"))
+        conn = process_export.connect_db()
+        try:
+            results = process_export.ingest_ready_files(conn, [os.path.join(self.drop_dir, "copy.csv")])
+            runs = conn.execute("SELECT COUNT(*) FROM ingest_runs").fetchone()[0]
+        finally:
+            conn.close()
+        self.assertTrue(results[0]["skipped"])
+        self.assertEqual(runs, 1)
+
+    def test_watch_folder_retries_failed_files(self):
+        write_export(os.path.join(self.drop_dir, "01.csv"), [1, 2])
+        load_export = process_export.load_export
+        calls = []
+
+        def flaky_load(path):
+            calls.append(path)
+            if len(calls) == 1:
+                raise PermissionError("file is locked by another process")
+            return load_export(path)
+
+        with mock.patch.object(process_export, "load_export", side_effect=flaky_load):
+            with self.assertLogs(level="WARNING") as logs:
+                # Cycle 1 records the file, cycle 2 fails, cycle 3 retries and ingests it
+                process_export.watch_folder(self.drop_dir, interval=0, settle_seconds=0, max_cycles=3, retry_seconds=0)
+        self.assertEqual(len(calls), 2)
+        self.assertTrue(any("attempt 1" in line and "01.csv" in line for line in logs.output))
+        self.assertTrue(os.path.exists(process_export.SNAPSHOT_FILE))
+        conn = process_export.connect_db()
+        try:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM records_current").fetchone()[0], 2)
+        finally:
+            conn.close()
+
+        # Backoff: a failing file is not retried before its delay has passed
+        write_export(os.path.join(self.drop_dir, "02.csv"), [3])
+        calls.clear()
+        with mock.patch.object(process_export, "load_export", side_effect=PermissionError("locked")) as failing:
+            with self.assertLogs(level="WARNING"):
+                process_export.watch_folder(self.drop_dir, interval=0, settle_seconds=0, max_cycles=5, retry_seconds=60)
+        self.assertEqual(failing.call_count, 1)
+
+    def test_process_skips_repeated_file_unless_forced(self):
+        path = os.path.join(self.drop_dir, "01.csv")
+        write_export(path, [1, 2, 3])
+
+        first = process_export.process(path)
+        self.assertEqual(first["new_records"], 3)
+        os.remove(process_export.SNAPSHOT_FILE)
+
+        again = process_export.process(path)
+        self.assertTrue(again["skipped"])
+        self.assertFalse(os.path.exists(process_export.SNAPSHOT_FILE), "Skipped runs must not touch the snapshot")
+
+        forced = process_export.process(path, force=True)
+        self.assertEqual(forced["unchanged_records"], 3)
+
+        conn = process_export.connect_db()
+        try:
+            runs = process_export.get_ingest_runs(conn)
+        finally:
+            conn.close()
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(runs[0]["row_count"], 3)
+        self.assertEqual(runs[0]["summary"]["unchanged_records"], 3)
+        self.assertIsNotNone(runs[0]["duration_seconds"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import os
+import sys
+import unittest
+from unittest import mock
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import process_export
+from web_app import app
+
+
+class TestBatchRollback(unittest.TestCase):
+    def setUp(self):
+        self.db_path = "test_sync.sqlite"
+        self.original_db = process_export.DB_FILE
+        process_export.DB_FILE = self.db_path
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+        self.conn = process_export.connect_db()
+        process_export.ensure_schema(self.conn, ["NOP", "PROGRAM"])
+
+    def tearDown(self):
+        self.conn.close()
+        process_export.DB_FILE = self.original_db
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def sync(self, rows, source, mode="pandas"):
+        df = pd.DataFrame([{"NOP": nop, "PROGRAM": program} for nop, program in rows.items()])
+        return process_export.detect_and_sync_changes(self.conn, df, source, mode=mode)
+
+    def current(self):
+        return dict(self.conn.execute('SELECT "NOP", "PROGRAM" FROM records_current').fetchall())
+
+    def test_rollback_by_source_file(self):
+        for mode in process_export.SYNC_MODES:
+            self.conn.execute("DELETE FROM records_current")
+            self.conn.execute("DELETE FROM records_history")
+            self.conn.execute("DELETE FROM records_changes")
+            self.conn.commit()
+            self.sync({"a": "1", "b": "1"}, "f1.xlsx", mode)
+            self.sync({"a": "2", "c": "2"}, "f2.xlsx", mode)
+            self.sync({"b": "3"}, "f3.xlsx", mode)
+            self.sync({"a": "4"}, "f2.xlsx", mode)
+
+            result = process_export.rollback_batch(self.conn, source_file="f2.xlsx")
+            self.assertEqual((result["restored"], result["deleted"], result["conflict_count"]), (1, 1, 0), mode)
+            self.assertEqual(self.current(), {"a": "1", "b": "3"}, mode)
+            audit = self.conn.execute(
+                "SELECT COUNT(*) FROM records_history WHERE change_type = 'rollback_old'").fetchone()[0]
+            self.assertEqual(audit, 2)
+
+    def test_later_changes_from_other_files_are_conflicts(self):
+        self.sync({"a": "1", "b": "1"}, "f1.xlsx")
+        self.sync({"a": "2", "b": "2"}, "f2.xlsx")
+        self.sync({"a": "3"}, "f3.xlsx")
+        result = process_export.rollback_batch(self.conn, source_file="f2.xlsx")
+        self.assertEqual(result["conflicts"], ["a"])
+        self.assertEqual(self.current(), {"a": "3", "b": "1"})
+
+    def test_rollback_to_timestamp_and_ingest_run(self):
+        first = self.sync({"a": "1", "b": "1"}, "f1.xlsx")
+        second = self.sync({"a": "2", "c": "2"}, "f2.xlsx")
+        process_export.record_ingest_run(self.conn, "hash-2", "f2.xlsx", summary=second)
+        self.sync({"b": "3"}, "f3.xlsx")
+        seq = process_export.get_latest_seq(self.conn)
+
+        result = process_export.rollback_batch(self.conn, file_hash="hash-2")
+        self.assertEqual((result["restored"], result["deleted"]), (1, 1))
+        self.assertEqual(self.current(), {"a": "1", "b": "3"})
+
+        process_export.rollback_batch(self.conn, to_timestamp=first["sync_timestamp"])
+        self.assertEqual(self.current(), {"a": "1", "b": "1"})
+        ops = {op for (op,) in self.conn.execute("SELECT op FROM change_log WHERE seq > ?", (seq,))}
+        self.assertEqual(ops, {"rollback", "delete"})
+
+        with self.assertRaises(ValueError):
+            process_export.rollback_batch(self.conn, file_hash="unknown")
+        with self.assertRaises(ValueError):
+            process_export.rollback_batch(self.conn, source_file="f1.xlsx", to_timestamp=first["sync_timestamp"])
+
+    def test_endpoint_rolls_back_batch_and_writes_snapshot_once(self):
+        self.sync({"a": "1"}, "f1.xlsx")
+        self.sync({"a": "2", "b": "2"}, "f2.xlsx")
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["logged_in"] = True
+            sess["username"] = "admin"
+        with mock.patch.object(process_export, "export_merged_snapshot") as snapshot:
+            response = client.post("/api/sync/rollback", json={"source_file": "f2.xlsx"})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.get_json()["restored"], 1)
+            self.assertEqual(snapshot.call_count, 1)
+            self.assertEqual(client.post("/api/sync/rollback", json={"source_file": "f9.xlsx"}).status_code, 404)
+            self.assertEqual(client.post("/api/sync/rollback", json={"to_timestamp": "yesterday"}).status_code, 400)
+        self.assertEqual(self.current(), {"a": "1"})
+
+
+if __name__ == "__main__":
+    unittest.main()
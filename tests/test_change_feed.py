@@ -0,0 +1,121 @@
+import os
+import sys
+import unittest
+import pandas as pd
+from unittest import mock
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import process_export
+import web_app
+from web_app import app
+
+
+class TestChangeFeed(unittest.TestCase):
+    def setUp(self):
+        self.db_path = "test_sync.sqlite"
+        self.original_db = process_export.DB_FILE
+        process_export.DB_FILE = self.db_path
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def tearDown(self):
+        process_export.DB_FILE = self.original_db
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def sync(self, rows, source, mode="pandas"):
+        conn = process_export.connect_db()
+        try:
+            process_export.ensure_schema(conn, ["NOP", "PROGRAM"])
+            return process_export.detect_and_sync_changes(conn, pd.DataFrame(rows), source, mode=mode)
+        finally:
+            conn.close()
+
+    def test_inserts_updates_and_rollbacks_are_logged(self):
+        for mode in process_export.SYNC_MODES:
+            if os.path.exists(self.db_path):
+                os.remove(self.db_path)
+            self.sync([{"NOP": "a", "PROGRAM": "1"}, {"NOP": "b", "PROGRAM": "1"}], "f1", mode)
+            conn = process_export.connect_db()
+            try:
+                seq = process_export.get_latest_seq(conn)
+            finally:
+                conn.close()
+            self.sync([{"NOP": "a", "PROGRAM": "2"}, {"NOP": "b", "PROGRAM": "1"}, {"NOP": "c", "PROGRAM": "1"}], "f2", mode)
+            conn = process_export.connect_db()
+            try:
+                process_export.rollback_record(conn, "a")
+                feed = process_export.get_changes_since(conn, seq)
+            finally:
+                conn.close()
+            ops = [(c["nop"], c["op"]) for c in feed["changes"]]
+            self.assertEqual(sorted(ops[:2]), [("a", "update"), ("c", "insert")], mode)
+            self.assertEqual(ops[2:], [("a", "rollback")])
+            self.assertEqual(feed["changes"][-1]["record"]["PROGRAM"], "1")
+            self.assertEqual(feed["last_seq"], feed["latest_seq"])
+            self.assertFalse(feed["has_more"])
+            self.assertFalse(feed["reset"])
+
+    def test_endpoint_pages_and_reports_reset(self):
+        self.sync([{"NOP": str(i), "PROGRAM": "x"} for i in range(5)], "f1")
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["logged_in"] = True
+            sess["username"] = "admin"
+        page = client.get("/api/changes?since=0&limit=3").get_json()
+        self.assertEqual(len(page["changes"]), 3)
+        self.assertTrue(page["has_more"])
+        rest = client.get(f"/api/changes?since={page['last_seq']}").get_json()
+        self.assertEqual([c["nop"] for c in rest["changes"]], ["3", "4"])
+
+        conn = process_export.connect_db()
+        try:
+            conn.execute("DELETE FROM records_current")
+            process_export.log_reset(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        after_reset = client.get(f"/api/changes?since={rest['last_seq']}").get_json()
+        self.assertTrue(after_reset["reset"])
+        self.assertEqual(len(after_reset["changes"]), 1)
+        self.assertGreater(after_reset["last_seq"], rest["last_seq"])
+
+    def test_delta_endpoint_returns_latest_row_state(self):
+        self.sync([{"NOP": "a", "PROGRAM": "1"}, {"NOP": "b", "PROGRAM": "1"}], "f1")
+        conn = process_export.connect_db()
+        try:
+            seq = process_export.get_latest_seq(conn)
+        finally:
+            conn.close()
+        self.sync([{"NOP": "a", "PROGRAM": "2"}, {"NOP": "c", "PROGRAM": "3"}], "f2")
+        self.sync([{"NOP": "a", "PROGRAM": "4"}], "f3")
+        conn = process_export.connect_db()
+        try:
+            conn.execute("DELETE FROM records_current WHERE \"NOP\" = 'b'")
+            conn.commit()
+        finally:
+            conn.close()
+
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["logged_in"] = True
+            sess["username"] = "admin"
+        served = pd.DataFrame({"NOP": ["a", "b"], "PROGRAM": [1, 1]})
+        with mock.patch.object(web_app, "get_dataframe", return_value=served):
+            delta = client.get(f"/api/data/delta?since={seq}").get_json()
+        self.assertFalse(delta["full_reload"])
+        self.assertEqual(delta["deletes"], ["b"])
+        # Numeric like the served frame, internal columns hidden
+        self.assertEqual(sorted(delta["upserts"], key=lambda r: r["NOP"]),
+                         [{"NOP": "a", "PROGRAM": 4}, {"NOP": "c", "PROGRAM": 3}])
+        self.assertGreater(delta["seq"], seq)
+
+        with mock.patch.object(web_app, "DELTA_MAX_CHANGES", 1):
+            self.assertTrue(client.get(f"/api/data/delta?since={seq}").get_json()["full_reload"])
+        self.assertEqual(client.get("/api/data/delta").status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import sys
+import gzip
+import json
+import unittest
+from unittest import mock
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import web_app
+from web_app import app
+
+
+class TestConditionalRequests(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        with self.client.session_transaction() as sess:
+            sess["logged_in"] = True
+            sess["username"] = "admin"
+        self.db_path = web_app.get_data_sources()[0]
+
+    def test_api_data_etag_roundtrip(self):
+        resp = self.client.get("/api/data")
+        self.assertEqual(resp.status_code, 200)
+        etag = resp.headers.get("ETag")
+        self.assertTrue(etag)
+        self.assertIn("no-cache", resp.headers.get("Cache-Control", ""))
+
+        cached = self.client.get("/api/data", headers={"If-None-Match": etag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.data, b"")
+        self.assertEqual(cached.headers.get("ETag"), etag)
+
+    def test_etag_changes_when_data_changes(self):
+        if not os.path.exists(self.db_path):
+            self.skipTest("No SQLite database")
+        etag_before, _ = web_app.get_data_version()
+        st = os.stat(self.db_path)
+        try:
+            os.utime(self.db_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+            etag_after, _ = web_app.get_data_version()
+            self.assertNotEqual(etag_before, etag_after)
+            resp = self.client.get("/api/data", headers={"If-None-Match": f'"{etag_before}"'})
+            self.assertEqual(resp.status_code, 200)
+        finally:
+            os.utime(self.db_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    def test_etag_follows_change_log_when_file_stat_is_unchanged(self):
+        etag_before, _ = web_app.get_data_version()
+        seq = web_app.get_change_seq()
+        with mock.patch.object(web_app, "get_change_seq", return_value=seq + 1):
+            etag_after, _ = web_app.get_data_version()
+            self.assertNotEqual(etag_before, etag_after)
+            resp = self.client.get("/api/data", headers={"If-None-Match": f'"{etag_before}"'})
+            self.assertEqual(resp.status_code, 200)
+
+    def test_dataframe_cache_follows_data_version(self):
+        if not os.path.exists(self.db_path):
+            self.skipTest("No SQLite database")
+        first = web_app.get_dataframe()
+        self.assertIs(web_app.get_dataframe(), first)
+        st = os.stat(self.db_path)
+        try:
+            os.utime(self.db_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+            self.assertIsNot(web_app.get_dataframe(), first)
+        finally:
+            os.utime(self.db_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    def test_if_modified_since(self):
+        resp = self.client.get("/api/data")
+        last_modified = resp.headers.get("Last-Modified")
+        if not last_modified:
+            self.skipTest("No data source present")
+        cached = self.client.get("/api/data", headers={"If-Modified-Since": last_modified})
+        self.assertEqual(cached.status_code, 304)
+
+    def test_gzip_compression_negotiated(self):
+        plain = self.client.get("/api/data", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("Content-Encoding", plain.headers)
+        if len(plain.data) < 1024:
+            self.skipTest("Payload below compression threshold")
+
+        resp = self.client.get("/api/data", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(resp.headers.get("Content-Encoding"), "gzip")
+        self.assertIn("Accept-Encoding", resp.headers.get("Vary", ""))
+        self.assertLess(len(resp.data), len(plain.data))
+        self.assertEqual(json.loads(gzip.decompress(resp.data)), plain.get_json())
+
+        # Weak ETag of the compressed variant still validates
+        cached = self.client.get("/api/data", headers={"Accept-Encoding": "gzip", "If-None-Match": resp.headers["ETag"]})
+        self.assertEqual(cached.status_code, 304)
+
+
+if __name__ == "__main__":
+    unittest.main()
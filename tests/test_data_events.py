@@ -0,0 +1,118 @@
+import os
+import sys
+import json
+import unittest
+from unittest import mock
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import data_events
+import process_export
+import web_app
+from web_app import app
+
+
+def parse_events(chunks):
+    events = []
+    for chunk in chunks:
+        fields = dict(line.split(": ", 1) for line in chunk.strip().splitlines() if line.startswith(("event", "data")))
+        if "event" in fields:
+            events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+class TestDataEventHub(unittest.TestCase):
+    def setUp(self):
+        self.state = {"seq": 3, "version": "a"}
+        self.counted = []
+        self.hub = data_events.DataEventHub(lambda: dict(self.state), self.count, interval=0.01, max_streams=2)
+
+    def count(self, since):
+        self.counted.append(since)
+        return {"insert": 1, "update": 1}
+
+    def test_one_poll_fans_out_to_every_stream(self):
+        streams = [self.hub.stream(max_seconds=5) for _ in range(2)]
+        chunks = [[next(stream), next(stream)] for stream in streams]
+        self.assertTrue(chunks[0][0].startswith("retry:"))
+        self.assertEqual(parse_events(chunks[0]), [("hello", {"seq": 3, "version": "a"})])
+        self.assertEqual(self.hub.stream_count, 2)
+
+        self.state = {"seq": 5, "version": "b"}
+        expected = ("data", {"seq": 5, "version": "b", "previous_seq": 3, "counts": {"insert": 1, "update": 1}})
+        for stream in streams:
+            self.assertEqual(parse_events([next(stream)]), [expected])
+        # Counted once for both clients
+        self.assertEqual(self.counted, [3])
+        for stream in streams:
+            stream.close()
+        self.assertEqual(self.hub.stream_count, 0)
+
+    def test_streams_beyond_the_limit_are_told_to_poll(self):
+        streams = [self.hub.stream(max_seconds=5) for _ in range(2)]
+        for stream in streams:
+            next(stream), next(stream)
+        busy = list(self.hub.stream(max_seconds=5))
+        self.assertEqual(parse_events(busy), [("busy", {"max_streams": 2})])
+        streams[0].close()
+        accepted = self.hub.stream(max_seconds=5)
+        next(accepted)
+        self.assertEqual(parse_events([next(accepted)])[0][0], "hello")
+        accepted.close()
+        streams[1].close()
+
+
+class TestDataEventEndpoint(unittest.TestCase):
+    def setUp(self):
+        self.db_path = "test_sync.sqlite"
+        self.original_db = process_export.DB_FILE
+        process_export.DB_FILE = self.db_path
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def tearDown(self):
+        process_export.DB_FILE = self.original_db
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def test_counts_cover_sync_rollback_and_reset(self):
+        conn = process_export.connect_db()
+        try:
+            process_export.ensure_schema(conn, ["NOP", "PROGRAM"])
+            process_export.detect_and_sync_changes(conn, pd.DataFrame({"NOP": ["a", "b"], "PROGRAM": ["1", "1"]}), "f1")
+            process_export.detect_and_sync_changes(conn, pd.DataFrame({"NOP": ["a"], "PROGRAM": ["2"]}), "f2")
+            process_export.rollback_record(conn, "a")
+            self.assertEqual(process_export.count_changes_since(conn, 0), {"insert": 2, "update": 1, "rollback": 1})
+            seq = process_export.get_latest_seq(conn)
+            conn.execute("DELETE FROM records_current")
+            process_export.log_reset(conn)
+            conn.commit()
+            self.assertEqual(process_export.count_changes_since(conn, seq), {"reset": 1})
+        finally:
+            conn.close()
+
+    def test_endpoint_streams_hello_with_current_seq(self):
+        conn = process_export.connect_db()
+        try:
+            process_export.ensure_schema(conn, ["NOP", "PROGRAM"])
+            process_export.detect_and_sync_changes(conn, pd.DataFrame({"NOP": ["a"], "PROGRAM": ["1"]}), "f1")
+            seq = process_export.get_latest_seq(conn)
+        finally:
+            conn.close()
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess["logged_in"] = True
+            sess["username"] = "admin"
+        with mock.patch.object(web_app, "DATA_EVENTS_MAX_SECONDS", 0):
+            response = client.get("/api/events")
+            body = response.get_data(as_text=True)
+        self.assertEqual(response.mimetype, "text/event-stream")
+        events = parse_events(body.split("\n\n"))
+        self.assertEqual(events[0][0], "hello")
+        self.assertEqual(events[0][1]["seq"], seq)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import io
+import os
+import sys
+import unittest
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import export_formats
+import process_export
+import web_app
+
+
+class TestDtypeOptimization(unittest.TestCase):
+    def setUp(self):
+        n = 200
+        self.df = pd.DataFrame({
+            "NOP": [f"{i:05d}" for i in range(n)],
+            "KATEGORI": ["Cat A", "Cat B"] * (n // 2),
+            "BUDGET": [str(i * 10) for i in range(n)],
+            "COST": ["1.5", None] * (n // 2),
+            "PROGRAM": [f"Program {i}" for i in range(n)],
+        })
+
+    def test_low_cardinality_text_becomes_category(self):
+        out, report = process_export.optimize_dtypes(self.df)
+        self.assertEqual(str(out["KATEGORI"].dtype), "category")
+        self.assertEqual(out["PROGRAM"].dtype, object)
+        self.assertGreater(report["saved_bytes"], 0)
+        self.assertEqual(report["before_bytes"] - report["after_bytes"], report["saved_bytes"])
+
+    def test_numeric_text_is_downcast(self):
+        out, report = process_export.optimize_dtypes(self.df)
+        self.assertEqual(str(out["BUDGET"].dtype), "int16")
+        self.assertEqual(str(out["COST"].dtype), "float32")
+        self.assertTrue(pd.isna(out["COST"].iloc[1]))
+        self.assertEqual(out["BUDGET"].iloc[3], 30)
+
+    def test_numeric_text_keeps_its_string_form(self):
+        df = pd.DataFrame({"NOP": ["1", "2", "3"], "BUDGET": ["100", None, "300"], "COST": ["2", "1.5", "3"]})
+        out, _ = process_export.optimize_dtypes(df, category_ratio=0)
+        # 100 with a missing value would print as "100.0" and look like a change to the sync engine
+        self.assertEqual(out["BUDGET"].dtype, object)
+        self.assertEqual(out["COST"].dtype, object)
+
+    def test_mixed_type_columns_stay_exportable(self):
+        df = pd.DataFrame({"NOP": [str(i) for i in range(60)], "STATUS": ["Open", 1, "Open", 1, "Closed", 2] * 10})
+        out, _ = process_export.optimize_dtypes(df)
+        self.assertEqual(out["STATUS"].dtype, object)
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+        table = pq.read_table(io.BytesIO(export_formats.to_parquet_bytes(out)))
+        self.assertEqual(table.column("STATUS").to_pylist()[:2], ["Open", "1"])
+        self.assertTrue(web_app.dataframe_to_arrow_ipc(out))
+
+    def test_identifier_columns_are_untouched(self):
+        out, _ = process_export.optimize_dtypes(self.df)
+        self.assertEqual(out["NOP"].dtype, object)
+        self.assertEqual(out["NOP"].iloc[1], "00001")
+
+
+if __name__ == "__main__":
+    unittest.main()
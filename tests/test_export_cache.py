@@ -0,0 +1,84 @@
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import export_cache
+import web_app
+from web_app import app
+
+
+class TestExportCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_lru_eviction_by_total_bytes(self):
+        cache = export_cache.ExportCache(self.tmpdir, max_bytes=250)
+        past = time.time() - 100
+        for i in range(2):
+            path = cache.put({"k": i}, b"x" * 100)
+            os.utime(path, (past + i, past + i))
+        # Reading entry 0 makes entry 1 the least recently used one
+        self.assertIsNotNone(cache.get({"k": 0}))
+        cache.put({"k": 2}, b"x" * 100)
+        self.assertIsNone(cache.get({"k": 1}))
+        self.assertIsNotNone(cache.get({"k": 0}))
+        self.assertIsNotNone(cache.get({"k": 2}))
+        self.assertLessEqual(cache.total_bytes(), 250)
+
+    def test_disabled_cache_stores_nothing(self):
+        cache = export_cache.ExportCache(self.tmpdir, max_bytes=0)
+        self.assertIsNone(cache.put({"k": 1}, b"data"))
+        self.assertIsNone(cache.get({"k": 1}))
+
+
+class TestExportCacheEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        with self.client.session_transaction() as sess:
+            sess["logged_in"] = True
+            sess["username"] = "admin"
+        self.tmpdir = tempfile.mkdtemp()
+        df = pd.DataFrame({"NOP": ["001", "002", "003"], "PROGRAM": ["Alpha", "Beta", "Gamma"]})
+        self.patches = [
+            mock.patch.object(web_app, "export_artifacts", export_cache.ExportCache(self.tmpdir)),
+            mock.patch.object(web_app, "get_dataframe", return_value=df),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_repeat_export_is_served_from_cache(self):
+        first = self.client.get("/export?q=beta")
+        self.assertEqual(first.status_code, 200)
+        out = pd.read_excel(io.BytesIO(first.data), sheet_name="Data", dtype=str)
+        self.assertEqual(list(out["PROGRAM"]), ["Beta"])
+        self.assertEqual(len(web_app.export_artifacts.entries()), 1)
+
+        with mock.patch.object(web_app.pd, "ExcelWriter", side_effect=AssertionError("rebuilt")):
+            second = self.client.get("/export?q=beta")
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+
+        self.client.get("/export?q=gamma")
+        self.client.get("/api/export-excel")
+        self.assertEqual(len(web_app.export_artifacts.entries()), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import export_cache
+import export_formats
+import web_app
+from web_app import app
+
+
+class TestExportFormats(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({"NOP": [f"{i:03d}" for i in range(7)], "BUDGET": range(7)})
+
+    def test_csv_chunks_have_a_single_header(self):
+        text = "".join(export_formats.iter_csv(self.df, chunk_rows=3))
+        out = pd.read_csv(io.StringIO(text), dtype=str)
+        self.assertEqual(list(out["NOP"]), list(self.df["NOP"]))
+
+    def test_format_selection(self):
+        self.assertEqual(export_formats.normalize_format(None), "xlsx")
+        self.assertEqual(export_formats.normalize_format("CSV"), "csv")
+        self.assertEqual(export_formats.format_for_path("out/data.parquet"), "parquet")
+        with self.assertRaises(ValueError):
+            export_formats.normalize_format("pdf")
+
+
+class TestExportFormatEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        with self.client.session_transaction() as sess:
+            sess["logged_in"] = True
+            sess["username"] = "admin"
+        self.tmpdir = tempfile.mkdtemp()
+        self.df = pd.DataFrame({"NOP": ["001", "002", "003"], "PROGRAM": ["Alpha", "Beta", "Gamma"]})
+        self.patches = [
+            mock.patch.object(web_app, "export_artifacts", export_cache.ExportCache(self.tmpdir)),
+            mock.patch.object(web_app, "get_dataframe", return_value=self.df),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_csv_export_is_streamed(self):
+        resp = self.client.get("/export?format=csv", headers={"Accept-Encoding": "identity"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.is_streamed)
+        self.assertEqual(resp.mimetype, "text/csv")
+        self.assertIn(".csv", resp.headers["Content-Disposition"])
+        out = pd.read_csv(io.BytesIO(resp.data), dtype=str)
+        self.assertEqual(list(out["NOP"]), ["001", "002", "003"])
+
+    def test_parquet_export(self):
+        if not export_formats.parquet_available():
+            self.skipTest("pyarrow not installed")
+        resp = self.client.get("/api/export-excel?format=parquet")
+        self.assertEqual(resp.status_code, 200)
+        out = pd.read_parquet(io.BytesIO(resp.data))
+        self.assertEqual(list(out["PROGRAM"]), ["Alpha", "Beta", "Gamma"])
+
+    def test_unknown_format_is_rejected(self):
+        resp = self.client.get("/export?format=pdf")
+        self.assertEqual(resp.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import io
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import export_jobs
+import web_app
+from web_app import app
+
+
+def wait_for(manager, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        state = manager.get(job_id)
+        if state and state["status"] in ("done", "error"):
+            return state
+        time.sleep(0.05)
+    raise AssertionError("export job did not finish")
+
+
+class TestExportJobManager(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.manager = export_jobs.ExportJobManager(cache_dir=self.tmpdir, ttl_seconds=60)
+        self.df = pd.DataFrame({"NOP": [f"{i:04d}" for i in range(25)], "BUDGET": range(25)})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_job_reports_progress_and_is_reused(self):
+        builds = []
+
+        def build(path, progress):
+            builds.append(path)
+            export_jobs.write_xlsx(self.df, path, progress=progress, every=10)
+
+        state, reused = self.manager.submit({"v": 1}, len(self.df), build)
+        self.assertFalse(reused)
+        done = wait_for(self.manager, state["job_id"])
+        self.assertEqual(done["status"], "done")
+        self.assertEqual(done["rows_written"], 25)
+        out = pd.read_excel(self.manager.file_path(done), sheet_name="Data", dtype=str)
+        self.assertEqual(list(out["NOP"]), list(self.df["NOP"]))
+
+        again, reused = self.manager.submit({"v": 1}, len(self.df), build)
+        self.assertTrue(reused)
+        self.assertEqual(again["job_id"], state["job_id"])
+        self.assertEqual(len(builds), 1)
+
+        events = list(export_jobs.stream_events(self.manager, state["job_id"]))
+        self.assertTrue(events[-1].startswith("event: done"))
+
+    def test_expired_files_are_purged(self):
+        self.manager.ttl_seconds = 0
+        state, _ = self.manager.submit({"v": 2}, 1, lambda path, progress: export_jobs.write_xlsx(self.df.head(1), path, progress))
+        done = wait_for(self.manager, state["job_id"])
+        self.manager.purge_expired()
+        self.assertIsNone(self.manager.get(state["job_id"]))
+        self.assertFalse(os.path.exists(self.manager.file_path(done)))
+
+    def test_heartbeat_keeps_a_silent_build_alive(self):
+        release = threading.Event()
+        builds = []
+
+        def build(path, progress):
+            # Like a Parquet write: no progress until it is done
+            builds.append(path)
+            release.wait(10)
+            export_jobs.write_xlsx(self.df, path)
+
+        with mock.patch.object(export_jobs, "STALE_SECONDS", 0.3), \
+                mock.patch.object(export_jobs, "STATE_HEARTBEAT_SECONDS", 0.05):
+            state, _ = self.manager.submit({"v": 3}, len(self.df), build)
+            time.sleep(0.6)
+            self.manager.purge_expired()
+            self.assertEqual(self.manager.get(state["job_id"])["status"], "running")
+            _, reused = self.manager.submit({"v": 3}, len(self.df), build)
+            self.assertTrue(reused)
+            release.set()
+            self.assertEqual(wait_for(self.manager, state["job_id"])["status"], "done")
+        self.assertEqual(len(builds), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir, state["job_id"] + ".lock")))
+
+    def test_job_is_claimed_with_a_lock_file(self):
+        builds = []
+
+        def build(path, progress):
+            builds.append(path)
+            export_jobs.write_xlsx(self.df, path)
+
+        # Another process holds the lock and has not saved its state yet
+        lock = os.path.join(self.tmpdir, export_jobs.job_id_for({"v": 4}) + ".lock")
+        open(lock, "w").close()
+        state, reused = self.manager.submit({"v": 4}, len(self.df), build)
+        self.assertTrue(reused)
+        self.assertEqual(state["status"], "queued")
+        time.sleep(0.1)
+        self.assertEqual(builds, [])
+
+        # Its owner died: the stale lock is taken over
+        stale = time.time() - export_jobs.STALE_SECONDS - 1
+        os.utime(lock, (stale, stale))
+        state, reused = self.manager.submit({"v": 4}, len(self.df), build)
+        self.assertFalse(reused)
+        self.assertEqual(wait_for(self.manager, state["job_id"])["status"], "done")
+        self.assertEqual(len(builds), 1)
+
+
+class TestExportJobEndpoints(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+        with self.client.session_transaction() as sess:
+            sess["logged_in"] = True
+            sess["username"] = "admin"
+        self.tmpdir = tempfile.mkdtemp()
+        df = pd.DataFrame({"NOP": [f"{i:04d}" for i in range(12)], "KATEGORI": ["A", "B"] * 6})
+        self.patches = [
+            mock.patch.object(web_app, "export_job_manager", export_jobs.ExportJobManager(cache_dir=self.tmpdir)),
+            mock.patch.object(web_app, "get_dataframe", return_value=df),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in self.patches:
+            p.stop()
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_async_export_roundtrip(self):
+        resp = self.client.post("/api/export-jobs?page=1&page_size=5")
+        self.assertIn(resp.status_code, (200, 202))
+        job_id = resp.get_json()["job_id"]
+
+        events = self.client.get(f"/api/export-jobs/{job_id}/events")
+        self.assertEqual(events.mimetype, "text/event-stream")
+        self.assertIn(b"event: done", events.get_data())
+
+        download = self.client.get(f"/api/export-jobs/{job_id}/download")
+        self.assertEqual(download.status_code, 200)
+        out = pd.read_excel(io.BytesIO(download.data), sheet_name="Data")
+        self.assertEqual(list(out["NOP"].astype(str).str.zfill(4)), [f"{i:04d}" for i in range(5)])
+
+        again = self.client.post("/api/export-jobs?page=1&page_size=5")
+        self.assertEqual(again.status_code, 200)
+        self.assertTrue(again.get_json()["reused"])
+
+
+if __name__ == "__main__":
+    unittest.main()
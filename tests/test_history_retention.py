@@ -0,0 +1,112 @@
+import os
+import sys
+import unittest
+import pandas as pd
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import process_export
+
+
+class TestHistoryRetention(unittest.TestCase):
+    def setUp(self):
+        self.db_path = "test_sync.sqlite"
+        self.original_db = process_export.DB_FILE
+        process_export.DB_FILE = self.db_path
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+        self.conn = process_export.connect_db()
+        process_export.ensure_schema(self.conn, ["NOP", "PROGRAM", "KATEGORI"])
+        for program in ("1", "2", "3", "4"):
+            self.sync({"a": program, "b": "x"}, f"f{program}.xlsx")
+
+    def tearDown(self):
+        self.conn.close()
+        process_export.DB_FILE = self.original_db
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def sync(self, rows, source):
+        df = pd.DataFrame([{"NOP": nop, "PROGRAM": program, "KATEGORI": "k"} for nop, program in rows.items()])
+        return process_export.detect_and_sync_changes(self.conn, df, source)
+
+    def history(self):
+        return [row[0] for row in self.conn.execute('SELECT "PROGRAM" FROM records_history ORDER BY id')]
+
+    def test_new_database_uses_incremental_vacuum(self):
+        self.assertEqual(self.conn.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+
+    def test_keep_versions_per_nop(self):
+        stats = process_export.compact_history(self.conn, keep_versions=1, batch_size=1)
+        self.assertEqual(stats["history_compacted"], 2)
+        # The sync already wrote these changes to records_changes
+        self.assertEqual(stats["deltas_written"], 0)
+        self.assertTrue(stats["done"])
+        self.assertEqual(self.history(), ["3"])
+
+    def test_checkpoints_survive_version_limit(self):
+        stats = process_export.compact_history(self.conn, keep_versions=1, checkpoint_days=3650)
+        self.assertEqual(stats["history_compacted"], 1)
+        # Oldest row of the period stays as a checkpoint, and stays on the next run too
+        self.assertEqual(self.history(), ["1", "3"])
+        process_export.compact_history(self.conn, keep_versions=1, checkpoint_days=3650)
+        self.assertEqual(self.history(), ["1", "3"])
+
+    def test_full_rows_become_field_deltas(self):
+        self.conn.execute("DELETE FROM records_changes")
+        self.conn.commit()
+        stats = process_export.compact_history(self.conn, keep_versions=1)
+        self.assertEqual(stats["deltas_written"], 2)
+        deltas = self.conn.execute(
+            'SELECT "NOP", field, old_value, new_value FROM records_changes ORDER BY changed_timestamp').fetchall()
+        self.assertEqual(deltas, [("a", "PROGRAM", "1", "2"), ("a", "PROGRAM", "2", "3")])
+
+        process_export.compact_history(self.conn, keep_versions=0, max_age_days=1, store_deltas=True)
+        self.assertEqual(self.history(), ["3"])
+        self.conn.execute("UPDATE records_history SET changed_timestamp = '2000-01-01T00:00:00'")
+        self.conn.commit()
+        process_export.compact_history(self.conn, max_age_days=1)
+        self.assertEqual(self.history(), [])
+        # Last version compared against the current row
+        self.assertEqual(self.conn.execute(
+            "SELECT old_value, new_value FROM records_changes ORDER BY id DESC LIMIT 1").fetchone(), ("3", "4"))
+
+    def test_compacted_history_blocks_partial_rollback(self):
+        self.sync({"a": "5"}, "f2.xlsx")
+        process_export.compact_history(self.conn, keep_versions=2)
+        result = process_export.rollback_batch(self.conn, source_file="f2.xlsx")
+        self.assertEqual(result["conflicts"], ["a"])
+        self.assertEqual(result["restored"], 0)
+
+    def test_change_log_retention_forces_reload(self):
+        latest = process_export.get_latest_seq(self.conn)
+        self.conn.execute("UPDATE change_log SET changed_timestamp = '2000-01-01T00:00:00'")
+        self.conn.commit()
+        stats = process_export.compact_history(self.conn, change_log_max_age_days=1)
+        self.assertEqual(stats["change_log_deleted"], latest - 1)
+        self.assertEqual(process_export.get_latest_seq(self.conn), latest)
+        self.assertTrue(process_export.get_changes_since(self.conn, 1)["reset"])
+        self.assertFalse(process_export.get_changes_since(self.conn, latest - 1)["reset"])
+
+    def test_time_budget_leaves_work_for_next_call(self):
+        stats = process_export.compact_history(self.conn, keep_versions=1, max_seconds=0)
+        self.assertFalse(stats["done"])
+        self.assertEqual(stats["resume_after"], "")
+        self.assertEqual(len(self.history()), 3)
+
+    def test_history_is_paged_by_nop(self):
+        self.sync({"a": "5", "b": "y"}, "f5.xlsx")
+        self.sync({"a": "5", "b": "z"}, "f6.xlsx")
+        # Resuming after "a" only looks at the later pages
+        stats = process_export.compact_history(self.conn, keep_versions=1, page_size=1, start_after="a")
+        self.assertEqual(stats["history_compacted"], 1)
+        self.assertEqual(len(self.history()), 5)
+        stats = process_export.compact_history(self.conn, keep_versions=1, page_size=1)
+        self.assertEqual(stats["history_compacted"], 3)
+        self.assertTrue(stats["done"])
+        self.assertIsNone(stats["resume_after"])
+
+
+if __name__ == "__main__":
+    unittest.main()
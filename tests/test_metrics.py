@@ -0,0 +1,47 @@
+import os
+import sys
+import unittest
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import metrics
+from web_app import app
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_timer_and_collect(self):
+        with metrics.collect() as timings:
+            with metrics.timer("parse"):
+                pass
+            metrics.observe(metrics.STAGE_METRIC, 0.5, stage="hash")
+        with metrics.timer("parse"):
+            pass
+        self.assertEqual(sorted(timings), ["hash", "parse"])
+        self.assertEqual(timings["hash"], 0.5)
+
+        text = metrics.render_prometheus()
+        self.assertIn('pipeline_stage_seconds_count{stage="parse"} 2', text)
+        self.assertIn('pipeline_stage_seconds_bucket{stage="hash",le="0.5"} 1', text)
+        self.assertIn('pipeline_stage_seconds_bucket{stage="hash",le="0.25"} 0', text)
+        self.assertIn("# TYPE pipeline_stage_seconds histogram", text)
+
+    def test_counters(self):
+        metrics.inc("pipeline_rows_total", 10, stage="parse")
+        metrics.inc("pipeline_rows_total", 5, stage="parse")
+        self.assertIn('pipeline_rows_total{stage="parse"} 15', metrics.render_prometheus())
+
+    def test_metrics_endpoint(self):
+        metrics.observe(metrics.STAGE_METRIC, 0.1, stage="json_encode")
+        client = app.test_client()
+        resp = client.get("/metrics")
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn("text/plain", resp.content_type)
+        self.assertIn('stage="json_encode"', resp.get_data(as_text=True))
+
+
+if __name__ == "__main__":
+    unittest.main()
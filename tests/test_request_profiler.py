@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from flask import Flask
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import request_profiler
+import web_app
+
+
+class TestRequestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profile_dir = tempfile.mkdtemp()
+        env = mock.patch.dict(os.environ, {"DASHBOARD_ADMIN_USERS": "admin"})
+        env.start()
+        self.addCleanup(env.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+
+    def make_client(self, username="admin", **options):
+        # Hooks cannot be added to web_app.app once it has served a request, so the profiler is
+        # installed on a small app wired like web_app does it
+        app = Flask(__name__)
+        app.secret_key = "test"
+
+        @app.route("/login")
+        def login():
+            return "login"
+
+        @app.route("/fast")
+        def fast():
+            return "ok"
+
+        @app.route("/slow")
+        def slow():
+            time.sleep(0.1)
+            return "ok"
+
+        request_profiler.install_profiler(app, self.profile_dir, is_admin=web_app.is_admin,
+                                          view_decorator=web_app.login_required, **options)
+        client = app.test_client()
+        if username:
+            with client.session_transaction() as sess:
+                sess["logged_in"] = True
+                sess["username"] = username
+        return client
+
+    def saved(self):
+        return sorted(os.listdir(self.profile_dir))
+
+    def test_admin_triggers_profile_by_header_or_query(self):
+        client = self.make_client()
+        resp = client.get("/fast", headers={"X-Profile": "1"})
+        name = resp.headers["X-Profile-Id"]
+        self.assertTrue(name.endswith("_fast"))
+        self.assertEqual(self.saved(), [name + ".json", name + ".prof"])
+
+        resp = client.get("/fast?_profile=1")
+        self.assertIn("X-Profile-Id", resp.headers)
+        meta = {p["name"]: p for p in request_profiler.list_profiles(self.profile_dir)}[resp.headers["X-Profile-Id"]]
+        self.assertEqual((meta["path"], meta["status"], meta["trigger"]), ("/fast?_profile=1", 200, "explicit"))
+
+        self.assertNotIn("X-Profile-Id", client.get("/fast").headers)
+        self.assertEqual(len(self.saved()), 4)
+
+    def test_non_admin_cannot_trigger_profiling(self):
+        client = self.make_client(username="viewer")
+        self.assertNotIn("X-Profile-Id", client.get("/fast", headers={"X-Profile": "1"}).headers)
+        self.assertNotIn("X-Profile-Id", client.get("/fast?_profile=1").headers)
+        self.assertEqual(self.saved(), [])
+        self.assertEqual(client.get("/admin/profiles/").status_code, 403)
+
+        anonymous = self.make_client(username=None)
+        self.assertNotIn("X-Profile-Id", anonymous.get("/fast", headers={"X-Profile": "1"}).headers)
+        self.assertEqual(anonymous.get("/admin/profiles/").status_code, 302)
+
+    def test_sampled_profiles_faster_than_slow_ms_are_discarded(self):
+        client = self.make_client(username="viewer", sample_rate=0.5, slow_ms=50)
+        with mock.patch.object(request_profiler.random, "random", return_value=0.9):
+            self.assertNotIn("X-Profile-Id", client.get("/slow").headers)
+        with mock.patch.object(request_profiler.random, "random", return_value=0.1):
+            self.assertNotIn("X-Profile-Id", client.get("/fast").headers)
+            name = client.get("/slow").headers["X-Profile-Id"]
+        self.assertEqual(self.saved(), [name + ".json", name + ".prof"])
+        meta = request_profiler.list_profiles(self.profile_dir)[0]
+        self.assertEqual(meta["trigger"], "sampled")
+        self.assertGreaterEqual(meta["duration_ms"], 50)
+
+    def test_explicit_profiles_ignore_slow_ms(self):
+        client = self.make_client(slow_ms=10000)
+        self.assertIn("X-Profile-Id", client.get("/fast", headers={"X-Profile": "1"}).headers)
+
+    def test_only_the_newest_profiles_are_kept(self):
+        client = self.make_client(keep=3)
+        names = [client.get("/fast?_profile=1").headers["X-Profile-Id"] for _ in range(5)]
+        self.assertEqual(self.saved(), sorted(n + ext for n in names[-3:] for ext in (".json", ".prof")))
+
+    def test_profiles_index_lists_slowest_first(self):
+        client = self.make_client()
+        fast = client.get("/fast?_profile=1").headers["X-Profile-Id"]
+        slow = client.get("/slow?_profile=1").headers["X-Profile-Id"]
+
+        resp = client.get("/admin/profiles/")
+        self.assertEqual(resp.status_code, 200)
+        html = resp.get_data(as_text=True)
+        self.assertIn("Request Profiles (2)", html)
+        self.assertLess(html.index(slow), html.index(fast))
+
+        detail = client.get(f"/admin/profiles/{slow}")
+        self.assertEqual(detail.mimetype, "text/plain")
+        self.assertIn("cumulative", detail.get_data(as_text=True))
+        download = client.get(f"/admin/profiles/{slow}?download=1")
+        self.assertIn("attachment", download.headers["Content-Disposition"])
+        self.assertEqual(client.get("/admin/profiles/missing").status_code, 404)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import sqlite3
+import unittest
+
+# Add project root to path
+sys.path.append(os.getcwd())
+
+import process_export
+
+
+class TestSchemaCatalogue(unittest.TestCase):
+    def setUp(self):
+        self.db_path = "test_sync.sqlite"
+        self.original_db = process_export.DB_FILE
+        process_export.DB_FILE = self.db_path
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+        self.conn = process_export.connect_db()
+        process_export.ensure_schema(self.conn, ["NOP", "PROGRAM"])
+        self.statements = []
+        self.conn.set_trace_callback(self.statements.append)
+
+    def tearDown(self):
+        self.conn.close()
+        process_export.DB_FILE = self.original_db
+        if os.path.exists(self.db_path):
+            os.remove(self.db_path)
+
+    def catalogue_reads(self):
+        return sum("pragma_table_info(" in s for s in self.statements)
+
+    def test_columns_are_read_once_per_schema_version(self):
+        process_export.get_table_columns(self.conn, "records_current")
+        self.statements.clear()
+        for _ in range(3):
+            self.assertEqual(process_export.get_table_columns(self.conn, "records_current")[:2], ["NOP", "PROGRAM"])
+            process_export.get_table_columns(self.conn, "records_history")
+        self.assertEqual(self.catalogue_reads(), 0)
+        self.assertEqual(process_export.get_table_columns(self.conn, "missing"), [])
+
+        # A schema change from another connection invalidates the catalogue
+        other = sqlite3.connect(self.db_path)
+        other.execute('ALTER TABLE records_current ADD COLUMN "EXTRA" TEXT')
+        other.commit()
+        other.close()
+        self.assertIn("EXTRA", process_export.get_table_columns(self.conn, "records_current"))
+        self.assertEqual(self.catalogue_reads(), 1)
+
+    def test_connections_share_one_catalogue_read(self):
+        process_export._schema_catalogues.clear()
+        for _ in range(2):
+            conn = process_export.connect_db()
+            conn.set_trace_callback(self.statements.append)
+            try:
+                self.assertEqual(process_export.get_table_columns(conn, "records_current")[:2], ["NOP", "PROGRAM"])
+            finally:
+                conn.close()
+        self.assertEqual(self.catalogue_reads(), 1)
+
+    def test_recreated_database_is_not_served_stale_columns(self):
+        self.assertNotIn("KATEGORI", process_export.get_table_columns(self.conn, "records_current"))
+        self.conn.close()
+        os.remove(self.db_path)
+        self.conn = process_export.connect_db()
+        process_export.ensure_schema(self.conn, ["NOP", "KATEGORI"])
+        other = process_export.connect_db()
+        try:
+            self.assertEqual(process_export.get_table_columns(other, "records_current")[:2], ["NOP", "KATEGORI"])
+        finally:
+            other.close()
+
+    def test_ensure_schema_adds_columns_in_one_transaction(self):
+        process_export.ensure_schema(self.conn, ["NOP", "PROGRAM", "KATEGORI", "STATUS"])
+        alters = [i for i, s in enumerate(self.statements) if s.startswith("ALTER TABLE")]
+        self.assertEqual(len(alters), 4)
+        commits = [i for i, s in enumerate(self.statements) if s == "COMMIT"]
+        self.assertFalse([i for i in commits if alters[0] < i < alters[-1]])
+        self.assertIn("STATUS", process_export.get_table_columns(self.conn, "records_history"))
+
+        self.statements.clear()
+        process_export.ensure_schema(self.conn, ["NOP", "PROGRAM", "KATEGORI", "STATUS"])
+        self.assertFalse([s for s in self.statements if s.startswith("ALTER TABLE")])
+
+
+if __name__ == "__main__":
+    unittest.main()
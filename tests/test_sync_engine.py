@@ -64,5 +64,98 @@ class TestSyncEngine(unittest.TestCase):
         finally:
             conn.close()
 
+    def test_sql_mode_matches_pandas_mode(self):
+        cols = ["NOP", "PROGRAM", "KATEGORI"]
+        df1 = pd.DataFrame([
+            {"NOP": "nop-001", "PROGRAM": "Prog A", "KATEGORI": "Cat 1"},
+            {"NOP": "nop-002", "PROGRAM": "Prog B", "KATEGORI": None},
+        ])
+        df2 = pd.DataFrame([
+            {"NOP": "nop-001", "PROGRAM": "Prog A", "KATEGORI": "Cat 2"},  # changed
+            {"NOP": "nop-002", "PROGRAM": "Prog B ", "KATEGORI": ""},  # only whitespace/empty differences
+            {"NOP": "nop-003", "PROGRAM": "Prog C", "KATEGORI": "Cat 3"},  # new
+        ])
+        results = {}
+        for mode in process_export.SYNC_MODES:
+            if os.path.exists(self.db_path):
+                os.remove(self.db_path)
+            conn = process_export.connect_db()
+            try:
+                process_export.ensure_schema(conn, cols)
+                process_export.detect_and_sync_changes(conn, df1, "file1.xlsx", mode=mode)
+                summary = process_export.detect_and_sync_changes(conn, df2, "file2.xlsx", mode=mode)
+                current = pd.read_sql_query('SELECT "NOP", PROGRAM, KATEGORI, row_hash FROM records_current ORDER BY "NOP"', conn)
+                history = pd.read_sql_query('SELECT "NOP", KATEGORI, change_type FROM records_history', conn)
+                self.assertTrue(process_export.rollback_record(conn, "nop-001"))
+                rolled_back = conn.execute('SELECT KATEGORI FROM records_current WHERE "NOP"=?', ("nop-001",)).fetchone()[0]
+            finally:
+                conn.close()
+            counts = (summary["new_records"], summary["updated_records"], summary["unchanged_records"])
+            results[mode] = (counts, summary["modifications"], current, history, rolled_back)
+
+        pandas_result, sql_result = results["pandas"], results["sql"]
+        self.assertEqual(sql_result[0], (1, 1, 1))
+        self.assertEqual(sql_result[0], pandas_result[0])
+        self.assertEqual(sql_result[1], pandas_result[1])
+        pd.testing.assert_frame_equal(sql_result[2], pandas_result[2])
+        pd.testing.assert_frame_equal(sql_result[3], pandas_result[3])
+        self.assertEqual(sql_result[4], "Cat 1")
+
+    def test_sql_mode_strips_unicode_whitespace_like_pandas(self):
+        cols = ["NOP", "PROGRAM", "KATEGORI"]
+        df1 = pd.DataFrame([
+            {"NOP": "nop-001", "PROGRAM": "A", "KATEGORI": "x\u2003"},
+            {"NOP": "nop-002", "PROGRAM": "B", "KATEGORI": "y"},
+        ])
+        df2 = pd.DataFrame([
+            {"NOP": "nop-001", "PROGRAM": "A\xa0", "KATEGORI": "\x0bx\x0c"},  # NBSP / vertical tab / form feed only
+            {"NOP": "nop-002", "PROGRAM": "B\u2009", "KATEGORI": "z\u3000"},  # thin space, real change
+        ])
+        results = {}
+        for mode in process_export.SYNC_MODES:
+            if os.path.exists(self.db_path):
+                os.remove(self.db_path)
+            conn = process_export.connect_db()
+            try:
+                process_export.ensure_schema(conn, cols)
+                process_export.detect_and_sync_changes(conn, df1, "file1.xlsx", mode=mode)
+                summary = process_export.detect_and_sync_changes(conn, df2, "file2.xlsx", mode=mode)
+            finally:
+                conn.close()
+            results[mode] = ((summary["new_records"], summary["updated_records"], summary["unchanged_records"]),
+                             summary["modifications"])
+
+        self.assertEqual(results["pandas"][0], (0, 1, 1))
+        self.assertEqual(results["pandas"][1], [{"nop": "nop-002", "field": "KATEGORI", "old": "y", "new": "z"}])
+        self.assertEqual(results["sql"], results["pandas"])
+
+    def test_modifications_are_streamed_to_changes_table(self):
+        cols = ["NOP", "PROGRAM", "KATEGORI"]
+        df1 = pd.DataFrame({"NOP": [f"n{i}" for i in range(10)], "PROGRAM": "A", "KATEGORI": "x"})
+        df2 = pd.DataFrame({"NOP": [f"n{i}" for i in range(10)], "PROGRAM": "B", "KATEGORI": ["y"] * 4 + ["x"] * 6})
+        original_sample = process_export.MODIFICATION_SAMPLE_SIZE
+        process_export.MODIFICATION_SAMPLE_SIZE = 3
+        try:
+            for mode in process_export.SYNC_MODES:
+                if os.path.exists(self.db_path):
+                    os.remove(self.db_path)
+                conn = process_export.connect_db()
+                try:
+                    process_export.ensure_schema(conn, cols)
+                    process_export.detect_and_sync_changes(conn, df1, "file1.xlsx", mode=mode)
+                    summary = process_export.detect_and_sync_changes(conn, df2, "file2.xlsx", mode=mode)
+                    stored = conn.execute('SELECT "NOP", field, old_value, new_value FROM records_changes ORDER BY id').fetchall()
+                finally:
+                    conn.close()
+                self.assertEqual(summary["modification_count"], 14)
+                self.assertEqual(summary["field_change_counts"], {"PROGRAM": 10, "KATEGORI": 4})
+                self.assertEqual(len(summary["modifications"]), 3)
+                self.assertEqual(len(stored), 14)
+                self.assertEqual(stored[:2], [("n0", "PROGRAM", "A", "B"), ("n0", "KATEGORI", "x", "y")])
+                self.assertEqual(process_export.summarize_sync(summary)["modifications"], 14)
+        finally:
+            process_export.MODIFICATION_SAMPLE_SIZE = original_sample
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -58,6 +58,22 @@ class TestUIColumnExclusion(unittest.TestCase):
             for col in self.exclude_cols:
                 self.assertNotIn(col, data["rows"][0], f"Column {col} should be excluded from api_data row data")
 
+    def test_arrow_data_excludes_internal_cols(self):
+        """Verify /api/data.arrow matches /api/data and excludes the columns."""
+        try:
+            import pyarrow as pa
+        except ImportError:
+            self.skipTest("pyarrow not installed")
+        resp = self.client.get("/api/data.arrow")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, "application/vnd.apache.arrow.stream")
+        table = pa.ipc.open_stream(resp.data).read_all()
+        json_data = self.client.get("/api/data").get_json()
+        self.assertEqual(table.schema.names, json_data["columns"])
+        self.assertEqual(table.num_rows, len(json_data["rows"]))
+        for col in self.exclude_cols:
+            self.assertNotIn(col, table.schema.names)
+
     def test_excel_export_excludes_internal_cols(self):
         """Verify Excel export files exclude the columns."""
         endpoints = ["/export", "/api/export-excel", "/export-to-excel"]
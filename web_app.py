@@ -1,21 +1,59 @@
-from flask import Flask, jsonify, render_template_string, request, redirect, url_for, session, send_file
+from flask import Flask, jsonify, render_template_string, request, redirect, url_for, session, send_file, g, Response
 import pandas as pd
 import os
 import math
 import sqlite3
 import io
-from datetime import datetime
+import time
+import hashlib
+import threading
+from datetime import datetime, timezone
 import shutil
 
+import metrics
+import export_cache
+import export_formats
+import export_jobs
+import data_events
+import request_profiler
+import response_compression
+
 try:
     import process_export
 except ImportError:
     process_export = None
 
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
 app = Flask(__name__)
 app.secret_key = os.environ.get("DASHBOARD_SECRET_KEY", "change-this-key")
 
 DATA_FILE_ENV = "EXCEL_DASHBOARD_FILE"
+PROFILE_DIR_ENV = "DASHBOARD_PROFILE_DIR"
+OPTIMIZE_DTYPES_ENV = "DASHBOARD_OPTIMIZE_DTYPES"
+EXPORT_JOB_DIR_ENV = "DASHBOARD_EXPORT_JOB_DIR"
+EXPORT_FILTER_PARAMS = ("q", "from", "to", "page", "page_size")
+# More pending changes than this and /api/data/delta asks the dashboard for a full reload
+DELTA_MAX_CHANGES = int(os.environ.get("DASHBOARD_DELTA_MAX_CHANGES", "5000"))
+DATA_EVENTS_INTERVAL = float(os.environ.get("DASHBOARD_EVENTS_INTERVAL", data_events.DEFAULT_INTERVAL_SECONDS))
+DATA_EVENTS_MAX_SECONDS = float(os.environ.get("DASHBOARD_EVENTS_MAX_SECONDS", data_events.DEFAULT_MAX_SECONDS))
+# Open SSE streams per server process; each holds a thread (wsgi.py reserves that many extra)
+DATA_EVENTS_MAX_STREAMS = int(os.environ.get("DASHBOARD_EVENTS_MAX_STREAMS", data_events.DEFAULT_MAX_STREAMS))
+
+export_job_manager = export_jobs.ExportJobManager(
+    cache_dir=os.environ.get(EXPORT_JOB_DIR_ENV) or None,
+    ttl_seconds=int(os.environ.get("DASHBOARD_EXPORT_TTL", export_jobs.DEFAULT_TTL_SECONDS)),
+    max_workers=int(os.environ.get("DASHBOARD_EXPORT_WORKERS", export_jobs.DEFAULT_WORKERS)),
+)
+
+# Generated export files, reused while the data version and filters stay the same
+export_artifacts = export_cache.ExportCache(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "export", "cache"),
+    max_bytes=int(os.environ.get("DASHBOARD_EXPORT_CACHE_BYTES", export_cache.DEFAULT_MAX_BYTES)),
+)
 
 
 def get_data_file():
@@ -31,9 +69,100 @@ def get_data_file():
     return os.path.join(base_dir, "export", "dashboard_export.xlsx")
 
 
-def load_dataframe():
+def get_data_sources():
     base_dir = os.path.dirname(os.path.abspath(__file__))
     db_path = os.path.join(base_dir, "data_pipeline.sqlite")
+    return [db_path, db_path + "-wal", os.path.join(base_dir, "merged_current.xlsx"), get_data_file()]
+
+
+def get_data_version():
+    """
+    Versi data yang disajikan dashboard: (etag, last_modified).
+    Dihitung dari mtime/ukuran sumber data (SQLite, snapshot, file Excel) ditambah seq terakhir
+    change_log: mtime bisa tidak berubah bila dua penulisan jatuh dalam granularitas timestamp
+    file system (dan ukuran SQLite hanya berubah per halaman), seq selalu naik setiap sync,
+    rollback atau reset.
+    """
+    parts = [os.environ.get(OPTIMIZE_DTYPES_ENV, "1"), f"seq:{get_change_seq()}"]
+    latest = 0.0
+    for path in get_data_sources():
+        try:
+            st = os.stat(path)
+        except OSError:
+            parts.append(f"{path}:-")
+            continue
+        parts.append(f"{path}:{st.st_mtime_ns}:{st.st_size}")
+        latest = max(latest, st.st_mtime)
+    etag = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:20]
+    last_modified = datetime.fromtimestamp(int(latest), tz=timezone.utc) if latest else None
+    return etag, last_modified
+
+
+def not_modified_response(etag, last_modified):
+    """Return a 304 response when the client's cached copy is still current, otherwise None."""
+    if request.if_none_match:
+        # Weak comparison: compressed variants carry W/"<etag>"
+        fresh = request.if_none_match.contains_weak(etag)
+    elif request.if_modified_since and last_modified:
+        fresh = last_modified <= request.if_modified_since
+    else:
+        fresh = False
+    if not fresh:
+        return None
+    response = Response(status=304)
+    return add_validators(response, etag, last_modified)
+
+
+def add_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    # Browser may keep the copy but must revalidate it (cheap 304) on every use.
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
+def shape_dashboard_frame(df, verbose=True):
+    """Columns as the dashboard shows them: legacy columns dropped/renamed, fixed order, internal columns hidden."""
+    # 1. Clean up "REVENUE (ACTUAL)" column - REMOVE PERMANENTLY
+    if "REVENUE (ACTUAL)" in df.columns:
+        if verbose:
+            print("[web_app] Removing 'REVENUE (ACTUAL)' column from dataframe", flush=True)
+        df = df.drop(columns=["REVENUE (ACTUAL)"])
+
+    # 2. Rename column "REVENUE INCREMENTAL 1" to "INCREMENTAL 1" if exists
+    if "REVENUE INCREMENTAL 1" in df.columns:
+        if verbose:
+            print("[web_app] Found 'REVENUE INCREMENTAL 1', renaming to 'INCREMENTAL 1'", flush=True)
+        if "INCREMENTAL 1" in df.columns:
+            df["INCREMENTAL 1"] = df["INCREMENTAL 1"].fillna(df["REVENUE INCREMENTAL 1"])
+            df = df.drop(columns=["REVENUE INCREMENTAL 1"])
+        else:
+            df = df.rename(columns={"REVENUE INCREMENTAL 1": "INCREMENTAL 1"})
+    
+    # 3. Reorder and Filter Columns
+    desired_order = [
+        "NOP", "PROGRAM", "KATEGORI", "JUSTIFIKASI", "PROPOSAL", "BUDGET", 
+        "REVENUE", "COST", "PROFIT", "INCREMENTAL 1", "INCREMENTAL 2", 
+        "INCREMENTAL 3", "STATUS", "PILOT", "DRIVEN PROGRAM", "ASSIGN BY", 
+        "APPROVED BY"
+    ]
+    
+    # Internal columns to hide from UI and Exports
+    exclude_cols = ["row_hash", "ingest_timestamp", "source_file", "ExportSource", "ExportTimestamp", "ExportUser"]
+    
+    cols_to_use = [c for c in desired_order if c in df.columns]
+    # Any other columns that are not internal
+    other_cols = [c for c in df.columns if c not in cols_to_use and c not in exclude_cols]
+    df = df[cols_to_use + other_cols]
+    return df
+
+
+@metrics.timed("dataframe_load")
+def load_dataframe(db_path=None):
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    if db_path is None:
+        db_path = os.path.join(base_dir, "data_pipeline.sqlite")
     merged_path = os.path.join(base_dir, "merged_current.xlsx")
     
     df = pd.DataFrame()
@@ -41,12 +170,16 @@ def load_dataframe():
     if os.path.exists(db_path):
         try:
             print(f"[web_app] Loading from SQLite: {db_path}", flush=True)
-            conn = sqlite3.connect(db_path)
+            conn = process_export.connect_db(db_path) if process_export is not None else sqlite3.connect(db_path)
             # Get all columns but filter out internal ones in the query if possible, 
             # but pandas read_sql_query is easier with * and we filter later in this function.
             # To strictly follow "hide from query", we can fetch columns first.
-            cursor = conn.execute("SELECT * FROM records_current LIMIT 0")
-            all_cols = [description[0] for description in cursor.description]
+            if process_export is not None:
+                all_cols = process_export.get_table_columns(conn, "records_current")
+            else:
+                all_cols = [d[0] for d in conn.execute("SELECT * FROM records_current LIMIT 0").description]
+            if not all_cols:
+                raise sqlite3.OperationalError("no such table: records_current")
             exclude_cols = ["row_hash", "ingest_timestamp", "source_file", "ExportSource", "ExportTimestamp", "ExportUser"]
             select_cols = [f'"{c}"' for c in all_cols if c not in exclude_cols]
             query = f"SELECT {', '.join(select_cols)} FROM records_current"
@@ -92,39 +225,96 @@ def load_dataframe():
                 print(f"[web_app] Error reading Excel file: {e}", flush=True)
 
     if not df.empty:
-        # 1. Clean up "REVENUE (ACTUAL)" column - REMOVE PERMANENTLY
-        if "REVENUE (ACTUAL)" in df.columns:
-            print("[web_app] Removing 'REVENUE (ACTUAL)' column from dataframe", flush=True)
-            df = df.drop(columns=["REVENUE (ACTUAL)"])
+        df = shape_dashboard_frame(df)
 
-        # 2. Rename column "REVENUE INCREMENTAL 1" to "INCREMENTAL 1" if exists
-        if "REVENUE INCREMENTAL 1" in df.columns:
-            print("[web_app] Found 'REVENUE INCREMENTAL 1', renaming to 'INCREMENTAL 1'", flush=True)
-            if "INCREMENTAL 1" in df.columns:
-                df["INCREMENTAL 1"] = df["INCREMENTAL 1"].fillna(df["REVENUE INCREMENTAL 1"])
-                df = df.drop(columns=["REVENUE INCREMENTAL 1"])
-            else:
-                df = df.rename(columns={"REVENUE INCREMENTAL 1": "INCREMENTAL 1"})
-        
-        # 3. Reorder and Filter Columns
-        desired_order = [
-            "NOP", "PROGRAM", "KATEGORI", "JUSTIFIKASI", "PROPOSAL", "BUDGET", 
-            "REVENUE", "COST", "PROFIT", "INCREMENTAL 1", "INCREMENTAL 2", 
-            "INCREMENTAL 3", "STATUS", "PILOT", "DRIVEN PROGRAM", "ASSIGN BY", 
-            "APPROVED BY"
-        ]
-        
-        # Internal columns to hide from UI and Exports
-        exclude_cols = ["row_hash", "ingest_timestamp", "source_file", "ExportSource", "ExportTimestamp", "ExportUser"]
-        
-        cols_to_use = [c for c in desired_order if c in df.columns]
-        # Any other columns that are not internal
-        other_cols = [c for c in df.columns if c not in cols_to_use and c not in exclude_cols]
-        df = df[cols_to_use + other_cols]
+        # 4. Compact dtypes (category for low-cardinality text, smallest numeric dtype)
+        if process_export is not None and os.environ.get(OPTIMIZE_DTYPES_ENV, "1") != "0":
+            df, report = process_export.optimize_dtypes(df)
+            print(f"[web_app] dtype optimisation saved {report['saved_bytes']} bytes "
+                  f"({report['before_bytes']} -> {report['after_bytes']})", flush=True)
         
     return df
 
 
+_data_cache = {"version": None, "df": None, "payloads": {}}
+_data_cache_lock = threading.RLock()
+
+
+def get_dataframe():
+    """
+    load_dataframe() yang di-cache per versi data (lihat get_data_version).
+    Frame yang dikembalikan dipakai bersama antar request, jangan diubah in-place.
+    """
+    version, _ = get_data_version()
+    with _data_cache_lock:
+        if _data_cache["version"] == version and _data_cache["df"] is not None:
+            return _data_cache["df"]
+        # Read before loading: a sync committing in between is then replayed by the next delta
+        # (upserts are idempotent) instead of being skipped.
+        seq = get_change_seq()
+        df = load_dataframe()
+        df.attrs["seq"] = seq
+        _data_cache.update(version=version, df=df, payloads={})
+        return df
+
+
+def get_change_seq():
+    """Latest change_log sequence of the pipeline database (0 when there is none yet)."""
+    if process_export is None or not os.path.exists(process_export.DB_FILE):
+        return 0
+    try:
+        conn = process_export.connect_db()
+    except sqlite3.Error:
+        return 0
+    try:
+        return process_export.get_latest_seq(conn)
+    except sqlite3.Error:
+        return 0
+    finally:
+        conn.close()
+
+
+def get_cached_payload(name, build):
+    """Encoded form of the current frame (JSON body, Arrow stream, ...), built once per data version."""
+    df = get_dataframe()
+    with _data_cache_lock:
+        payload = _data_cache["payloads"].get(name)
+        if payload is None:
+            payload = build(df)
+            if _data_cache["df"] is df:
+                _data_cache["payloads"][name] = payload
+    return payload
+
+
+def build_json_payload(df):
+    with metrics.timer("json_encode"):
+        return app.json.dumps(
+            {
+                "columns": list(df.columns),
+                # change_log position of this snapshot, the starting point for /api/data/delta
+                "seq": df.attrs.get("seq", 0),
+                "as_of": df.attrs.get("as_of"),
+                # Gunakan konversi manual agar tidak ada NaN/Infinity di JSON
+                "rows": dataframe_to_json_rows(df),
+            }
+        )
+
+
+def build_arrow_payload(df):
+    with metrics.timer("arrow_encode"):
+        return dataframe_to_arrow_ipc(df)
+
+
+def warm_cache():
+    """Load the frame and its encoded payloads up front (e.g. before forking server workers)."""
+    started = time.perf_counter()
+    df = get_dataframe()
+    get_cached_payload("json", build_json_payload)
+    if pa is not None:
+        get_cached_payload("arrow", build_arrow_payload)
+    print(f"[web_app] Cache warmed: {len(df)} rows in {time.perf_counter() - started:.2f}s", flush=True)
+
+
 def merge_to_dashboard_excel_web(df_new, user_id: str):
     base_dir = os.path.dirname(os.path.abspath(__file__))
     export_dir = os.path.join(base_dir, "export")
@@ -154,8 +344,9 @@ def merge_to_dashboard_excel_web(df_new, user_id: str):
             sync_results = process_export.detect_and_sync_changes(conn, df_new, source_file=f"web_export_{user_id}")
             conn.close()
             
-            if sync_results["modifications"]:
-                print(f"[web_app] SYNC: {len(sync_results['modifications'])} modifications detected.", flush=True)
+            if sync_results["modification_count"]:
+                print(f"[web_app] SYNC: {sync_results['modification_count']} modifications detected "
+                      f"(per field: {sync_results['field_change_counts']}).", flush=True)
         except Exception as e:
             print(f"[web_app] Sync Engine failed: {e}", flush=True)
 
@@ -202,6 +393,19 @@ def merge_to_dashboard_excel_web(df_new, user_id: str):
     return dashboard_path, sync_results
 
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+
+@app.after_request
+def record_request_timing(response):
+    started = g.get("request_started")
+    if started is not None:
+        metrics.observe("http_request_seconds", time.perf_counter() - started, endpoint=request.endpoint or "unknown")
+    return response
+
+
 def login_required(view):
     def wrapped(*args, **kwargs):
         if not session.get("logged_in"):
@@ -219,6 +423,13 @@ def can_export():
     return user in allowed_list
 
 
+def is_admin():
+    user = session.get("username")
+    allowed = os.environ.get("DASHBOARD_ADMIN_USERS", "admin")
+    allowed_list = [x.strip() for x in allowed.split(",") if x.strip()]
+    return user in allowed_list
+
+
 @app.route("/api/sync/rollback", methods=["POST"])
 @login_required
 def rollback_sync():
@@ -227,12 +438,16 @@ def rollback_sync():
         
     data = request.json
     nop = data.get("nop")
-    if not nop:
-        return jsonify({"error": "NOP is required"}), 400
+    batch = {k: data.get(k) for k in ("source_file", "file_hash", "to_timestamp") if data.get(k)}
+    if not nop and not batch:
+        return jsonify({"error": "NOP is required (or one of source_file, file_hash, to_timestamp)"}), 400
         
     if process_export is None:
         return jsonify({"error": "Sync engine not available"}), 500
-        
+
+    if batch:
+        return rollback_sync_batch(batch)
+
     try:
         conn = process_export.connect_db()
         success = process_export.rollback_record(conn, str(nop))
@@ -251,6 +466,41 @@ def rollback_sync():
         return jsonify({"error": str(e)}), 500
 
 
+def rollback_sync_batch(selection):
+    """Batch rollback (see process_export.rollback_batch); the Excel snapshot is regenerated once."""
+    conn = process_export.connect_db()
+    try:
+        result = process_export.rollback_batch(conn, **selection)
+    except ValueError as e:
+        conn.close()
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        conn.close()
+        return jsonify({"error": str(e)}), 500
+    try:
+        if not result["restored"] and not result["deleted"]:
+            if result["conflict_count"]:
+                return jsonify(dict(result, error="All selected records were changed by later syncs")), 409
+            return jsonify({"error": "No rollback data found for the selection"}), 404
+        out_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "export", "dashboard_export.xlsx")
+        process_export.export_merged_snapshot(conn, out_file)
+    finally:
+        conn.close()
+    message = f"Rollback successful: {result['restored']} restored, {result['deleted']} deleted"
+    return jsonify(dict(result, message=message)), 200
+
+
+def dataframe_to_arrow_ipc(df: pd.DataFrame) -> bytes:
+    """Serialise the frame as an Arrow IPC stream (typed columns, nulls instead of NaN)."""
+    exclude_cols = ["row_hash", "ingest_timestamp", "source_file", "ExportSource", "ExportTimestamp", "ExportUser"]
+    df = export_formats.arrow_safe_frame(df[[c for c in df.columns if c not in exclude_cols]])
+    table = pa.Table.from_pandas(df, preserve_index=False).replace_schema_metadata(None)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
 def dataframe_to_json_rows(df: pd.DataFrame):
     # Columns to exclude from JSON output
     exclude_cols = ["row_hash", "ingest_timestamp", "source_file", "ExportSource", "ExportTimestamp", "ExportUser"]
@@ -1090,6 +1340,7 @@ DASHBOARD_TEMPLATE = """
     <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
     <script src="https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js"></script>
     <script src="https://cdnjs.cloudflare.com/ajax/libs/jspdf/2.5.1/jspdf.umd.min.js"></script>
+    <script src="https://cdn.jsdelivr.net/npm/apache-arrow@14.0.2/Arrow.es2015.min.js"></script>
     <script>
         let originalData = [];
         let filteredData = [];
@@ -1097,6 +1348,9 @@ DASHBOARD_TEMPLATE = """
         let currentSortColumn = null;
         let currentSortDirection = "asc";
         let chartInstance = null;
+        let lastSeq = 0;
+        let deltaInFlight = false;
+        const DELTA_POLL_MS = 15000;
 
         const navToggle = document.getElementById("navToggle");
         const navMobileMenu = document.getElementById("navMobileMenu");
@@ -1106,21 +1360,78 @@ DASHBOARD_TEMPLATE = """
             });
         }
 
-        function fetchData() {
-            const statusText = document.getElementById("statusText");
-            const resetBtn = document.getElementById("resetDataBtn");
-            statusText.textContent = "Memuat data dari server...";
-            fetch("/api/data")
-                .then(function (response) {
+        // Decode each column once (vector.get(i) per cell looks up the chunk on every call)
+        function arrowColumnValues(vector) {
+            const isNumber = window.Arrow.DataType.isInt(vector.type) || window.Arrow.DataType.isFloat(vector.type);
+            // Int/Float: the typed array of the data buffer; it knows nothing about nulls
+            const values = isNumber ? vector.toArray() : Array.from(vector);
+            const out = new Array(values.length);
+            const checkValid = isNumber && vector.nullCount > 0;
+            for (let i = 0; i < values.length; i++) {
+                let value = values[i];
+                if (typeof value === "bigint") value = Number(value);
+                if (value === undefined || (checkValid && !vector.isValid(i)) ||
+                    (typeof value === "number" && !isFinite(value))) value = null;
+                out[i] = value;
+            }
+            return out;
+        }
+
+        function arrowTableToRows(table) {
+            const names = table.schema.fields.map(function (f) { return f.name; });
+            const columns = names.map(function (name) { return arrowColumnValues(table.getChild(name)); });
+            const rows = new Array(table.numRows);
+            for (let i = 0; i < table.numRows; i++) {
+                const row = {};
+                for (let j = 0; j < names.length; j++) {
+                    row[names[j]] = columns[j][i];
+                }
+                rows[i] = row;
+            }
+            return { columns: names, rows: rows };
+        }
+
+        // /dashboard?as_of=<timestamp> shows the data as it was at that time (read-only, no live refresh)
+        const asOf = new URLSearchParams(window.location.search).get("as_of");
+
+        function loadDataset() {
+            // Arrow IPC (typed, compact) when the decoder is loaded and the server supports it; JSON otherwise
+            const jsonRequest = function () {
+                const url = asOf ? "/api/data?as_of=" + encodeURIComponent(asOf) : "/api/data";
+                return fetch(url).then(function (response) {
                     if (!response.ok) {
                         throw new Error("HTTP status " + response.status);
                     }
                     return response.json();
+                });
+            };
+            if (!window.Arrow || asOf) return jsonRequest();
+            return fetch("/api/data.arrow")
+                .then(function (response) {
+                    if (!response.ok) throw new Error("HTTP status " + response.status);
+                    const seq = parseInt(response.headers.get("X-Data-Seq") || "0", 10);
+                    return response.arrayBuffer().then(function (buffer) {
+                        const data = arrowTableToRows(window.Arrow.tableFromIPC(new Uint8Array(buffer)));
+                        data.seq = seq;
+                        return data;
+                    });
                 })
+                .catch(function (error) {
+                    console.warn("Arrow transport gagal, memakai JSON:", error);
+                    return jsonRequest();
+                });
+        }
+
+        function fetchData() {
+            const statusText = document.getElementById("statusText");
+            const resetBtn = document.getElementById("resetDataBtn");
+            statusText.textContent = "Memuat data dari server...";
+            loadDataset()
                 .then(function (data) {
                     columns = data.columns || [];
                     originalData = data.rows || [];
                     filteredData = originalData.slice();
+                    lastSeq = data.seq || 0;
                     
                     // Update reset button state
                     if (resetBtn) {
@@ -1140,6 +1451,58 @@ DASHBOARD_TEMPLATE = """
                 });
         }
 
+        function refreshDelta() {
+            // Patch originalData with the rows changed since lastSeq; full reload when the server says so
+            if (deltaInFlight || document.hidden || !columns.length || asOf) return Promise.resolve();
+            deltaInFlight = true;
+            return fetch("/api/data/delta?since=" + lastSeq)
+                .then(function (response) {
+                    if (!response.ok) throw new Error("HTTP status " + response.status);
+                    return response.json();
+                })
+                .then(function (delta) {
+                    if (delta.full_reload) {
+                        fetchData();
+                        return;
+                    }
+                    lastSeq = delta.seq;
+                    if (!delta.upserts.length && !delta.deletes.length) return;
+                    applyDelta(delta.upserts, delta.deletes);
+                })
+                .catch(function (error) {
+                    console.warn("Delta refresh gagal:", error);
+                })
+                .finally(function () {
+                    deltaInFlight = false;
+                });
+        }
+
+        function applyDelta(upserts, deletes) {
+            const removed = new Set(deletes.map(String));
+            const changed = new Map();
+            upserts.forEach(function (row) { changed.set(String(row.NOP), row); });
+            const patched = [];
+            originalData.forEach(function (row) {
+                const key = String(row.NOP);
+                if (removed.has(key)) return;
+                if (changed.has(key)) {
+                    patched.push(changed.get(key));
+                    changed.delete(key);
+                } else {
+                    patched.push(row);
+                }
+            });
+            changed.forEach(function (row) { patched.push(row); });
+            originalData = patched;
+
+            const resetBtn = document.getElementById("resetDataBtn");
+            if (resetBtn) resetBtn.disabled = originalData.length === 0;
+            applyGlobalFilter();
+            renderRows();
+            renderChart();
+            updateFooter();
+        }
+
         function buildTable() {
             const thead = document.querySelector("#dataTable thead");
             const tbody = document.querySelector("#dataTable tbody");
@@ -1507,19 +1870,26 @@ DASHBOARD_TEMPLATE = """
                 const params = new URLSearchParams();
                 const term = document.getElementById("globalSearch").value;
                 if (term) params.append("q", term);
-                const response = await fetch("/export-to-excel?" + params.toString(), { method: "GET" });
+                const response = await fetch("/api/export-jobs?" + params.toString(), { method: "POST" });
                 if (!response.ok) {
                     throw new Error("HTTP " + response.status);
                 }
-                const blob = await response.blob();
-                const url = window.URL.createObjectURL(blob);
+                const job = await response.json();
+                if (job.status !== "done") {
+                    await waitForExportJob(job.job_id, function (progress) {
+                        let label = "Mengekspor... " + Math.floor(progress.percent) + "%";
+                        if (progress.eta_seconds !== null && progress.eta_seconds !== undefined) {
+                            label += " (sisa ±" + Math.ceil(progress.eta_seconds) + " dtk)";
+                        }
+                        btn.textContent = label;
+                    });
+                }
                 const a = document.createElement("a");
-                a.href = url;
+                a.href = "/api/export-jobs/" + job.job_id + "/download";
                 a.download = "dashboard_export.xlsx";
                 document.body.appendChild(a);
                 a.click();
                 a.remove();
-                window.URL.revokeObjectURL(url);
                 showToast("Export berhasil. File berhasil diunduh.", false);
             } catch (error) {
                 console.error("Export error:", error);
@@ -1530,6 +1900,23 @@ DASHBOARD_TEMPLATE = """
             }
         }
 
+        function waitForExportJob(jobId, onProgress) {
+            return new Promise(function (resolve, reject) {
+                const source = new EventSource("/api/export-jobs/" + jobId + "/events");
+                source.addEventListener("progress", function (event) {
+                    onProgress(JSON.parse(event.data));
+                });
+                source.addEventListener("done", function (event) {
+                    source.close();
+                    resolve(JSON.parse(event.data));
+                });
+                source.addEventListener("error", function (event) {
+                    source.close();
+                    reject(new Error(event.data ? JSON.parse(event.data).error : "Koneksi progress terputus"));
+                });
+            });
+        }
+
         function resetView() {
             const globalSearch = document.getElementById("globalSearch");
             if (globalSearch) globalSearch.value = "";
@@ -1590,10 +1977,41 @@ DASHBOARD_TEMPLATE = """
         function updateFooter() {
             const footerInfo = document.getElementById("footerInfo");
             const now = new Date();
-            footerInfo.textContent = "Data dimuat: " + now.toLocaleString();
+            footerInfo.textContent = "Data dimuat: " + now.toLocaleString() + (asOf ? " (kondisi per " + asOf + " UTC)" : "");
+        }
+
+        function subscribeDataEvents() {
+            // The server pushes an event after every sync, rollback or reset; poll only without SSE support
+            if (asOf) return;
+            if (!window.EventSource) {
+                setInterval(refreshDelta, DELTA_POLL_MS);
+                return;
+            }
+            const source = new EventSource("/api/events");
+            source.addEventListener("hello", function (event) {
+                // (Re)connected: catch up on anything missed while disconnected
+                const state = JSON.parse(event.data);
+                if (columns.length && state.seq !== lastSeq) refreshDelta();
+            });
+            source.addEventListener("busy", function () {
+                // Server already serves its maximum number of streams: poll instead
+                source.close();
+                setInterval(refreshDelta, DELTA_POLL_MS);
+            });
+            source.addEventListener("data", function (event) {
+                const state = JSON.parse(event.data);
+                if (state.seq !== lastSeq) {
+                    refreshDelta();
+                } else if (!lastSeq && columns.length) {
+                    // No change log (data served from an Excel file): only a full reload picks it up
+                    fetchData();
+                }
+            });
         }
 
         document.addEventListener("DOMContentLoaded", fetchData);
+        document.addEventListener("DOMContentLoaded", subscribeDataEvents);
+        document.addEventListener("visibilitychange", refreshDelta);
     </script>
 </body>
 </html>
@@ -1633,92 +2051,281 @@ def dashboard():
 @app.route("/api/data")
 @login_required
 def api_data():
-    df = load_dataframe()
-    return jsonify(
-        {
-            "columns": list(df.columns),
-            # Gunakan konversi manual agar tidak ada NaN/Infinity di JSON
-            "rows": dataframe_to_json_rows(df),
-        }
-    )
+    if request.args.get("as_of"):
+        return api_data_as_of(request.args["as_of"])
+    etag, last_modified = get_data_version()
+    cached = not_modified_response(etag, last_modified)
+    if cached is not None:
+        return cached
+    response = Response(get_cached_payload("json", build_json_payload), mimetype="application/json")
+    return add_validators(response, etag, last_modified)
+
+
+def api_data_as_of(timestamp):
+    """Dataset as it was at ?as_of=<timestamp> (see process_export.as_of); not cached server-side."""
+    if process_export is None:
+        return jsonify({"error": "Sync engine not available"}), 500
+    try:
+        cutoff = process_export.normalize_timestamp(timestamp)
+    except ValueError:
+        return jsonify({"error": "Parameter as_of harus berupa timestamp ISO 8601, mis. 2024-05-01T08:00:00"}), 400
+    version, last_modified = get_data_version()
+    etag = hashlib.sha1(f"{version}|as_of={cutoff}".encode("utf-8")).hexdigest()[:20]
+    cached = not_modified_response(etag, last_modified)
+    if cached is not None:
+        return cached
+    conn = process_export.connect_db()
+    try:
+        df = process_export.as_of(conn, cutoff)
+    except ValueError:
+        horizon = process_export.get_retention_horizon(conn)
+        return jsonify({"error": f"Riwayat sebelum {horizon} sudah dihapus oleh kebijakan retensi"}), 400
+    finally:
+        conn.close()
+    if not df.empty:
+        df = shape_dashboard_frame(df, verbose=False)
+        if os.environ.get(OPTIMIZE_DTYPES_ENV, "1") != "0":
+            df, _ = process_export.optimize_dtypes(df)
+    body = build_json_payload(df)
+    response = Response(body, mimetype="application/json")
+    return add_validators(response, etag, last_modified)
+
+
+@app.route("/api/data.arrow")
+@login_required
+def api_data_arrow():
+    if pa is None:
+        return jsonify({"error": "Arrow transport not available (pip install pyarrow)"}), 501
+    etag, last_modified = get_data_version()
+    cached = not_modified_response(etag, last_modified)
+    if cached is not None:
+        return cached
+    payload = get_cached_payload("arrow", build_arrow_payload)
+    response = Response(payload, mimetype="application/vnd.apache.arrow.stream")
+    response.headers["X-Data-Seq"] = str(get_dataframe().attrs.get("seq", 0))
+    return add_validators(response, etag, last_modified)
+
+
+@app.route("/api/changes")
+@login_required
+def api_changes():
+    """Change-data-capture feed: entries of the change log after ?since=<seq> (see process_export.get_changes_since)."""
+    if process_export is None:
+        return jsonify({"error": "Sync engine not available"}), 500
+    since = request.args.get("since", 0, type=int)
+    limit = max(1, min(request.args.get("limit", 1000, type=int), 10000))
+    conn = process_export.connect_db()
+    try:
+        return jsonify(process_export.get_changes_since(conn, since, limit))
+    finally:
+        conn.close()
+
+
+@app.route("/api/data/delta")
+@login_required
+def api_data_delta():
+    """
+    Rows upserted/deleted since ?since=<seq>, shaped like /api/data rows, so the dashboard can
+    patch its copy instead of reloading. full_reload=true when that is not possible (data was
+    reset, the gap exceeds DASHBOARD_DELTA_MAX_CHANGES, or the columns changed).
+    """
+    if process_export is None:
+        return jsonify({"error": "Sync engine not available"}), 500
+    since = request.args.get("since", type=int)
+    if since is None or since < 0:
+        return jsonify({"error": "Parameter since wajib diisi (bilangan bulat >= 0)"}), 400
+    conn = process_export.connect_db()
+    try:
+        feed = process_export.get_changes_since(conn, since, DELTA_MAX_CHANGES)
+    finally:
+        conn.close()
+    result = {"since": since, "seq": feed["latest_seq"], "full_reload": False, "upserts": [], "deletes": []}
+    if feed["reset"] or feed["has_more"] or since > feed["latest_seq"]:
+        result["full_reload"] = True
+        return jsonify(result)
+    result["seq"] = feed["last_seq"]
+
+    # Only the latest state of each NOP matters
+    latest = {}
+    for change in feed["changes"]:
+        latest.pop(change["nop"], None)
+        latest[change["nop"]] = change["record"]
+    result["deletes"] = [nop for nop, record in latest.items() if record is None]
+    records = [record for record in latest.values() if record is not None]
+    if records:
+        reference = get_dataframe()
+        delta = shape_dashboard_frame(pd.DataFrame(records), verbose=False)
+        if list(delta.columns) != list(reference.columns):
+            result["full_reload"] = True
+            return jsonify(result)
+        result["upserts"] = dataframe_to_json_rows(match_dtypes(delta, reference))
+    return jsonify(result)
+
+
+def match_dtypes(df, reference):
+    """Give delta rows the numeric types of the served frame (optimize_dtypes turns numeric text into numbers)."""
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(reference[col].dtype):
+            converted = pd.to_numeric(df[col], errors="coerce")
+            # Keep text that is not a number as is rather than blanking it
+            if converted.notna().sum() == df[col].notna().sum():
+                df[col] = converted.astype(object).where(converted.notna(), None)
+    return df
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    # Optional shared secret for scrapers: DASHBOARD_METRICS_TOKEN + "Authorization: Bearer <token>"
+    token = os.environ.get("DASHBOARD_METRICS_TOKEN")
+    if token and request.headers.get("Authorization") != f"Bearer {token}":
+        return jsonify({"error": "Not allowed"}), 403
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/api/export-excel")
 @login_required
 def export_excel_api():
-    df = load_dataframe()
-    if df.empty:
+    fmt, error = requested_export_format()
+    if error is not None:
+        return error
+    etag, last_modified = get_data_version()
+    cached = not_modified_response(etag, last_modified)
+    if cached is not None:
+        return cached
+    if get_dataframe().empty:
         return jsonify({"error": "No data available to export"}), 400
-    
-    df_export = df
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df_export.to_excel(writer, sheet_name='Merged Data', index=False)
-        metadata = {
-            'Export Information': [
-                f'Export Date: {pd.Timestamp.now()}',
-                f'Total Rows Exported: {len(df_export)}',
-                f'Source: SQLite Database (records_current) or Merged Snapshot'
-            ]
-        }
-        pd.DataFrame(metadata).to_excel(writer, sheet_name='Metadata', index=False)
-    output.seek(0)
-    return send_file(
-        output,
-        mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-        as_attachment=True,
-        download_name=f'merged_data_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
-    )
+
+    stem = f'merged_data_export_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+    if fmt == "csv":
+        df_export = filter_export_frame(get_dataframe(), request.args)
+        return add_validators(csv_download(df_export, stem + ".csv"), etag, last_modified)
+
+    def build():
+        df_export = filter_export_frame(get_dataframe(), request.args)
+        if fmt == "parquet":
+            return export_formats.to_parquet_bytes(df_export)
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            df_export.to_excel(writer, sheet_name='Merged Data', index=False)
+            metadata = {
+                'Export Information': [
+                    f'Export Date: {pd.Timestamp.now()}',
+                    f'Total Rows Exported: {len(df_export)}',
+                    f'Source: SQLite Database (records_current) or Merged Snapshot'
+                ]
+            }
+            pd.DataFrame(metadata).to_excel(writer, sheet_name='Metadata', index=False)
+        return output.getvalue()
+
+    return send_export(export_cache_key("api_export_excel", etag, request.args), build, stem, fmt, etag, last_modified)
 
 
 @app.route("/export")
 @login_required
 def export_excel():
-    df = load_dataframe()
-    if df.empty:
+    fmt, error = requested_export_format()
+    if error is not None:
+        return error
+    etag, last_modified = get_data_version()
+    cached = not_modified_response(etag, last_modified)
+    if cached is not None:
+        return cached
+    if get_dataframe().empty:
         return jsonify({"error": "No data to export"}), 404
-    
-    df_export = df
-    
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine="openpyxl") as writer:
-        df_export.to_excel(writer, index=False, sheet_name="Data")
-    output.seek(0)
-    filename = "dashboard_export_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".xlsx"
-    return send_file(
-        output,
-        as_attachment=True,
-        download_name=filename,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-    )
 
+    stem = "dashboard_export_" + datetime.now().strftime("%Y%m%d_%H%M%S")
+    if fmt == "csv":
+        df_export = filter_export_frame(get_dataframe(), request.args)
+        return add_validators(csv_download(df_export, stem + ".csv"), etag, last_modified)
 
-@app.route("/export-to-excel", methods=["GET"])
-@login_required
-def export_to_excel():
-    if not can_export():
-        return jsonify({"error": "Not allowed to export"}), 403
-    df = load_dataframe()
-    if df.empty:
-        return jsonify({"error": "No data to export"}), 404
-    q = request.args.get("q", "").strip()
+    def build():
+        df_export = filter_export_frame(get_dataframe(), request.args)
+        if fmt == "parquet":
+            return export_formats.to_parquet_bytes(df_export)
+        output = io.BytesIO()
+        with pd.ExcelWriter(output, engine="openpyxl") as writer:
+            df_export.to_excel(writer, index=False, sheet_name="Data")
+        return output.getvalue()
+
+    return send_export(export_cache_key("export", etag, request.args), build, stem, fmt, etag, last_modified)
+
+
+def filter_export_frame(df, args):
+    """Apply the dashboard export filters (q, from/to, page/page_size) from the query string."""
+    q = args.get("q", "").strip()
     if q:
         df = df[df.apply(lambda row: q.lower() in " ".join(row.astype(str)).lower(), axis=1)]
-    date_from = request.args.get("from")
-    date_to = request.args.get("to")
+    date_from = args.get("from")
+    date_to = args.get("to")
     if "ExportTimestamp" in df.columns and (date_from or date_to):
         df_ts = pd.to_datetime(df["ExportTimestamp"], errors="coerce")
         if date_from:
             df = df[df_ts >= pd.to_datetime(date_from, errors="coerce")]
         if date_to:
             df = df[df_ts <= pd.to_datetime(date_to, errors="coerce")]
-    page_size = int(request.args.get("page_size", "0") or "0")
-    page = int(request.args.get("page", "1") or "1")
+    page_size = int(args.get("page_size", "0") or "0")
+    page = int(args.get("page", "1") or "1")
     if page_size > 0:
         start = (page - 1) * page_size
         end = start + page_size
         df = df.iloc[start:end]
+    return df
+
+
+def requested_export_format():
+    """format= query parameter (xlsx default, csv, parquet) as (format, error_response)."""
+    try:
+        fmt = export_formats.normalize_format(request.args.get("format"))
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    if fmt == "parquet" and not export_formats.parquet_available():
+        return None, (jsonify({"error": "Parquet export not available (pip install pyarrow)"}), 501)
+    return fmt, None
+
+
+def csv_download(df, filename):
+    """Stream df as CSV, chunk by chunk, without building the whole file in memory."""
+    response = Response(export_formats.iter_csv(df), mimetype="text/csv")
+    response.headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+def export_cache_key(route, version, args):
+    return {
+        "version": version,
+        "route": route,
+        "format": export_formats.normalize_format(args.get("format")),
+        "params": {k: args.get(k, "") for k in EXPORT_FILTER_PARAMS},
+    }
+
+
+def send_export(key, build, stem, fmt, etag, last_modified):
+    """
+    Serve an export from the artifact cache, calling build() -> bytes only on a miss.
+    Hits are streamed straight from disk.
+    """
+    ext, mimetype = export_formats.FORMATS[fmt]
+    source = export_artifacts.get(key, ext)
+    if source is None:
+        data = build()
+        source = export_artifacts.put(key, data, ext) or io.BytesIO(data)
+    response = send_file(source, as_attachment=True, download_name=stem + ext, mimetype=mimetype, etag=False)
+    return add_validators(response, etag, last_modified)
+
+
+@app.route("/export-to-excel", methods=["GET"])
+@login_required
+def export_to_excel():
+    if not can_export():
+        return jsonify({"error": "Not allowed to export"}), 403
+    fmt, error = requested_export_format()
+    if error is not None:
+        return error
+    df = get_dataframe()
+    if df.empty:
+        return jsonify({"error": "No data to export"}), 404
+    df = filter_export_frame(df, request.args)
     
     df_export = df
     
@@ -1726,6 +2333,16 @@ def export_to_excel():
     # merge_to_dashboard_excel_web still needs 'df' with NOP for synchronization logic
     dashboard_path, sync_results = merge_to_dashboard_excel_web(df, user_id)
     
+    if fmt == "csv":
+        return csv_download(df_export, "dashboard_export.csv")
+    if fmt == "parquet":
+        return send_file(
+            io.BytesIO(export_formats.to_parquet_bytes(df_export)),
+            as_attachment=True,
+            download_name="dashboard_export.parquet",
+            mimetype=export_formats.FORMATS["parquet"][1],
+        )
+
     # Generate direct download from df_export (without metadata)
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine="openpyxl") as writer:
@@ -1740,6 +2357,108 @@ def export_to_excel():
     )
 
 
+@app.route("/api/export-jobs", methods=["POST"])
+@login_required
+def start_export_job():
+    """
+    Start building the dashboard export in the background and return its job id right away.
+    Progress: /api/export-jobs/<id>/events (SSE); file: /api/export-jobs/<id>/download.
+    An identical export (same data version and filters) that is still cached is reused.
+    """
+    if not can_export():
+        return jsonify({"error": "Not allowed to export"}), 403
+    fmt, error = requested_export_format()
+    if error is not None:
+        return error
+    etag, _ = get_data_version()
+    df = get_dataframe()
+    if df.empty:
+        return jsonify({"error": "No data to export"}), 404
+    df = filter_export_frame(df, request.args)
+    key = export_cache_key("export_job", etag, request.args)
+    ext = export_formats.FORMATS[fmt][0]
+    state, reused = export_job_manager.submit(
+        key,
+        len(df),
+        lambda path, progress: export_jobs.write_export(df, path, fmt, progress=progress),
+        ext=ext,
+        filename="dashboard_export" + ext,
+    )
+    body = export_jobs.public_state(state)
+    body["reused"] = reused
+    return jsonify(body), 200 if state["status"] == "done" else 202
+
+
+@app.route("/api/export-jobs/<job_id>")
+@login_required
+def export_job_status(job_id):
+    state = export_job_manager.get(job_id)
+    if state is None:
+        return jsonify({"error": "Unknown export job"}), 404
+    return jsonify(export_jobs.public_state(state))
+
+
+@app.route("/api/export-jobs/<job_id>/events")
+@login_required
+def export_job_events(job_id):
+    if export_job_manager.get(job_id) is None:
+        return jsonify({"error": "Unknown export job"}), 404
+    return Response(
+        export_jobs.stream_events(export_job_manager, job_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/api/events")
+@login_required
+def data_event_stream():
+    """SSE stream of data changes (sync, rollback, reset), see data_events.DataEventHub."""
+    return Response(
+        data_event_hub.stream(max_seconds=DATA_EVENTS_MAX_SECONDS),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def read_data_state():
+    return {"seq": get_change_seq(), "version": get_data_version()[0]}
+
+
+def count_data_changes(since):
+    if process_export is None or not os.path.exists(process_export.DB_FILE):
+        return {}
+    conn = process_export.connect_db()
+    try:
+        return process_export.count_changes_since(conn, since)
+    finally:
+        conn.close()
+
+
+data_event_hub = data_events.DataEventHub(
+    read_data_state, count_data_changes, interval=DATA_EVENTS_INTERVAL, max_streams=DATA_EVENTS_MAX_STREAMS
+)
+
+
+@app.route("/api/export-jobs/<job_id>/download")
+@login_required
+def export_job_download(job_id):
+    if not can_export():
+        return jsonify({"error": "Not allowed to export"}), 403
+    state = export_job_manager.get(job_id)
+    if state is None:
+        return jsonify({"error": "Unknown export job"}), 404
+    path = export_job_manager.file_path(state)
+    if state["status"] != "done" or not os.path.exists(path):
+        return jsonify(export_jobs.public_state(state)), 409
+    return send_file(
+        path,
+        as_attachment=True,
+        download_name=state["filename"],
+        mimetype=export_formats.FORMATS[export_formats.format_for_path(state["filename"])][1],
+    )
+
+
 @app.route("/api/data/reset", methods=["POST"])
 @login_required
 def reset_data():
@@ -1754,7 +2473,7 @@ def reset_data():
         
         # 1. Reset SQLite within a transaction
         if os.path.exists(db_path):
-            conn = sqlite3.connect(db_path)
+            conn = process_export.connect_db(db_path) if process_export is not None else sqlite3.connect(db_path)
             conn.execute("BEGIN TRANSACTION")
             try:
                 # Get table list to ensure we clean everything
@@ -1764,6 +2483,9 @@ def reset_data():
                 for table in tables:
                     print(f"[web_app] Clearing table: {table}", flush=True)
                     conn.execute(f"DELETE FROM {table}")
+                if "change_log" in tables and process_export is not None:
+                    # The deletes above fired the change_log triggers; keep a single reset marker instead
+                    process_export.log_reset(conn)
                 
                 conn.commit()
                 print("[web_app] SQLite data cleared successfully", flush=True)
@@ -1791,6 +2513,26 @@ def reset_data():
         return jsonify({"error": f"Gagal mereset data: {str(e)}"}), 500
 
 
+if os.environ.get("DASHBOARD_COMPRESSION", "1") != "0":
+    response_compression.install_compression(
+        app,
+        min_size=int(os.environ.get("DASHBOARD_COMPRESS_MIN_BYTES", response_compression.DEFAULT_MIN_SIZE)),
+        gzip_level=int(os.environ.get("DASHBOARD_COMPRESS_LEVEL", response_compression.DEFAULT_GZIP_LEVEL)),
+        brotli_quality=int(os.environ.get("DASHBOARD_BROTLI_QUALITY", response_compression.DEFAULT_BROTLI_QUALITY)),
+    )
+
+if os.environ.get(PROFILE_DIR_ENV):
+    # Request profiling is opt-in: without DASHBOARD_PROFILE_DIR no hooks are registered at all.
+    request_profiler.install_profiler(
+        app,
+        os.environ[PROFILE_DIR_ENV],
+        sample_rate=float(os.environ.get("DASHBOARD_PROFILE_SAMPLE_RATE", "0") or "0"),
+        slow_ms=float(os.environ.get("DASHBOARD_PROFILE_SLOW_MS", "500") or "0"),
+        is_admin=is_admin,
+        view_decorator=login_required,
+    )
+
+
 def main():
     port = int(os.environ.get("DASHBOARD_PORT", "5000"))
     app.run(host="127.0.0.1", port=port, debug=False)
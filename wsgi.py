@@ -0,0 +1,120 @@
+"""
+Production entry point for the dashboard.
+
+    python wsgi.py
+
+Server selection (DASHBOARD_SERVER=auto|gunicorn|waitress|flask, default auto):
+- gunicorn (Linux/macOS): DASHBOARD_WORKERS processes x DASHBOARD_THREADS threads. The app and
+  its data cache are loaded once in the master before forking (preload), and gc.freeze() keeps
+  the preloaded objects out of garbage collection so workers share those pages copy-on-write.
+- waitress (Windows, or when gunicorn is missing): one process with DASHBOARD_THREADS threads.
+- flask: threaded development server, last-resort fallback (a warning is printed when auto
+  selection ends up here: `pip install -r requirements.txt` installs the right server).
+
+Every open dashboard keeps one thread busy with its /api/events stream, so each process gets
+DASHBOARD_THREADS threads for requests plus DASHBOARD_EVENTS_MAX_STREAMS (default 8) for SSE;
+dashboards beyond that limit poll instead of streaming.
+
+Other settings: DASHBOARD_HOST (default 127.0.0.1; use 0.0.0.0 to serve the network),
+DASHBOARD_PORT (default 5000), DASHBOARD_TIMEOUT (gunicorn worker timeout, default 120s).
+"""
+import gc
+import os
+import sys
+
+from web_app import DATA_EVENTS_MAX_STREAMS, app, warm_cache
+
+try:
+    import gunicorn.app.base as gunicorn_base
+except ImportError:
+    gunicorn_base = None
+
+try:
+    import waitress
+except ImportError:
+    waitress = None
+
+
+def get_settings():
+    cpu = os.cpu_count() or 1
+    return {
+        "server": os.environ.get("DASHBOARD_SERVER", "auto").lower(),
+        "host": os.environ.get("DASHBOARD_HOST", "127.0.0.1"),
+        "port": int(os.environ.get("DASHBOARD_PORT", "5000")),
+        "workers": int(os.environ.get("DASHBOARD_WORKERS", str(min(cpu * 2 + 1, 9)))),
+        "threads": int(os.environ.get("DASHBOARD_THREADS", "8")) + DATA_EVENTS_MAX_STREAMS,
+        "timeout": int(os.environ.get("DASHBOARD_TIMEOUT", "120")),
+    }
+
+
+def choose_server(requested):
+    if requested != "auto":
+        return requested
+    if gunicorn_base is not None and os.name != "nt":
+        return "gunicorn"
+    if waitress is not None:
+        return "waitress"
+    return "flask"
+
+
+def preload():
+    warm_cache()
+    # Move everything loaded so far into the permanent generation: the GC then never
+    # touches (and dirties) these pages in forked workers.
+    gc.freeze()
+
+
+if gunicorn_base is not None:
+    class DashboardApplication(gunicorn_base.BaseApplication):
+        def __init__(self, application, options):
+            self.application = application
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return self.application
+
+
+def run_gunicorn(settings):
+    options = {
+        "bind": f"{settings['host']}:{settings['port']}",
+        "workers": settings["workers"],
+        "threads": settings["threads"],
+        "worker_class": "gthread",
+        "timeout": settings["timeout"],
+        "preload_app": True,
+        "accesslog": "-",
+    }
+    print(f"[wsgi] gunicorn on {options['bind']} with {settings['workers']} workers x {settings['threads']} threads", flush=True)
+    DashboardApplication(app, options).run()
+
+
+def run_waitress(settings):
+    print(f"[wsgi] waitress on {settings['host']}:{settings['port']} with {settings['threads']} threads", flush=True)
+    waitress.serve(app, host=settings["host"], port=settings["port"], threads=settings["threads"])
+
+
+def main():
+    settings = get_settings()
+    server = choose_server(settings["server"])
+    preload()
+    if server == "gunicorn" and gunicorn_base is not None:
+        run_gunicorn(settings)
+    elif server == "waitress" and waitress is not None:
+        run_waitress(settings)
+    else:
+        if settings["server"] == "auto":
+            print("[wsgi] WARNING: neither gunicorn nor waitress is installed, falling back to Flask's development "
+                  "server; run `pip install -r requirements.txt` for production", file=sys.stderr, flush=True)
+        elif server != "flask":
+            print(f"[wsgi] WARNING: {server} is not installed, falling back to Flask's development server",
+                  file=sys.stderr, flush=True)
+        app.run(host=settings["host"], port=settings["port"], debug=False, threaded=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())